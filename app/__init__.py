@@ -1,44 +1,100 @@
 from flask import Flask, render_template
-from .extensions import db, login_manager
-from .config import Config
+from werkzeug.middleware.proxy_fix import ProxyFix
+from .extensions import db, login_manager, migrate, init_sqlite_pragmas
+from .config import get_config
+from .warmup import StartupTimer, init_bytecode_cache
 
 import os
 
 
 
-def create_app() :
+def create_app(config_class=None) :
+    startup = StartupTimer()
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_object(Config)
+    app.config.from_object(config_class or get_config())
     
     #instance folder creator
     os.makedirs(os.path.join(app.root_path, "..", "instance"), exist_ok=True)
     
+    #compiled templates persist across processes
+    init_bytecode_cache(app)
+    
+    #client address and scheme from the trusted reverse proxies in front of the app
+    trusted_proxies = app.config.get('TRUSTED_PROXIES', 0)
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+    
     
     #initializers
-    db.init_app(app)
-    login_manager.init_app(app)
-    login_manager.login_view = 'auth.login'
-    login_manager.login_message = 'Please log in to access this page'
+    with startup.phase('extensions'):
+        db.init_app(app)
+        init_sqlite_pragmas(app)
+        migrate.init_app(app, db)
+        login_manager.init_app(app)
+        login_manager.login_view = 'auth.login'
+        login_manager.login_message = 'Please log in to access this page'
     
     #importing models
-    from app import models
+    with startup.phase('models'):
+        from app import models
     
     
-    #user loader
+    #user loader, served from the principal cache when possible
+    from app.auth.session_cache import init_principal_cache, load_principal
+    init_principal_cache(app)
+    
     @login_manager.user_loader
     def load_user(user_id):
-        return models.User.query.get(int(user_id))
-    
-    
-    from app.auth import auth_bp
-    from app.admin import admin_bp
-    from app.user import user_bp
-    
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(admin_bp)
-    app.register_blueprint(user_bp)
-    
-    
+        return load_principal(int(user_id))
+    
+    
+    with startup.phase('blueprints'):
+        from app.auth import auth_bp
+        from app.admin import admin_bp
+        from app.user import user_bp
+        from app.api import api_bp
+        
+        app.register_blueprint(auth_bp)
+        app.register_blueprint(admin_bp)
+        app.register_blueprint(user_bp)
+        app.register_blueprint(api_bp)
+    
+    #free-spot index for auto-assign and the booking picker
+    with startup.phase('spot_index'):
+        from app.spot_index import init_spot_index
+        init_spot_index(app)
+    
+    with startup.phase('services'):
+        #thread pool the password hashing runs in
+        from app.passwords import init_passwords
+        init_passwords(app)
+        
+        #pub/sub hub behind the live grid and dashboard updates
+        from app.events import init_event_hub
+        init_event_hub(app)
+        
+        #rendered lot cards and dashboard headers, keyed by lot version
+        from app.fragments import init_fragment_cache
+        init_fragment_cache(app)
+        
+        #background job workers
+        from app.jobs import init_jobs
+        init_jobs(app)
+        
+        #concurrency caps, wait queue and rate limits on the write endpoints
+        from app.admission import init_admission
+        init_admission(app)
+        
+        #per-request sql profiling, opt-in through SQL_INSTRUMENTATION
+        from app.instrumentation import init_instrumentation
+        init_instrumentation(app)
+    
+    #templates, mappers and pool ready before the first request (and before a fork)
+    app.extensions['startup'] = startup
+    if app.config.get('WARMUP_ON_START'):
+        from app.warmup import warmup
+        with startup.phase('warmup'):
+            app.extensions['warmup'] = warmup(app, startup)
     
     
     
@@ -55,13 +111,7 @@ def create_app() :
     def forbidden(e):
         return render_template('403.html'), 403
     
-    
-    
-    
-    
-    
-    
-    
+    startup.finish()
     return app
     
     
\ No newline at end of file
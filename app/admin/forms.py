@@ -1,13 +1,39 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, IntegerField, FloatField, SubmitField
-from wtforms.validators import DataRequired, NumberRange
+from wtforms import StringField, IntegerField, FloatField, SubmitField, TextAreaField
+from wtforms.validators import DataRequired, NumberRange, Optional, ValidationError
+from app.config import Config
+from app.tariffs import compile_spec
 
 class ParkingLotForm(FlaskForm):
     name = StringField('Parking Lot Name', validators=[DataRequired()])
-    total_spots = IntegerField('Total Spots', validators=[DataRequired(), NumberRange(min=1, max=500)])
+    total_spots = IntegerField('Total Spots', validators=[DataRequired(), NumberRange(min=1, max=Config.MAX_SPOTS_PER_LOT)])
     price_per_hour = FloatField('Price Per Hour ($)', validators=[DataRequired(), NumberRange(min=0.1)])
     submit = SubmitField('Add Parking Lot')
 
 class UpdateSpotsForm(FlaskForm):
-    total_spots = IntegerField('Total Spots', validators=[DataRequired(), NumberRange(min=1, max=500)])
-    submit = SubmitField('Update Spots')
\ No newline at end of file
+    total_spots = IntegerField('Total Spots', validators=[DataRequired(), NumberRange(min=1, max=Config.MAX_SPOTS_PER_LOT)])
+    submit = SubmitField('Update Spots')
+
+class TariffForm(FlaskForm):
+    name = StringField('Tariff Name', validators=[DataRequired()])
+    bands = TextAreaField('Rate Bands (one per line: HH:MM-HH:MM rate)', validators=[Optional()])
+    daily_cap = FloatField('Daily Cap ($)', validators=[Optional(), NumberRange(min=0)])
+    grace_minutes = IntegerField('Grace Period (minutes)', validators=[Optional(), NumberRange(min=0, max=1440)])
+    submit = SubmitField('Save Tariff')
+    
+    def parsed_bands(self):
+        bands = []
+        for line in (self.bands.data or '').splitlines():
+            if not line.strip():
+                continue
+            period, rate = line.split()
+            start, end = period.split('-')
+            bands.append({'start': start, 'end': end, 'rate': float(rate)})
+        return bands
+    
+    def validate_bands(self, bands):
+        try:
+            compile_spec({'default_rate': 0, 'bands': self.parsed_bands()})
+        except (ValueError, KeyError):
+            raise ValidationError('Each line must look like "07:00-19:00 3.50", with bands that do not overlap.')
+
@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, current_app, stream_template, jsonify, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
+import json
 from app.extensions import db
-from app.models import ParkingLot, ParkingSpot, Reservation, Payment, User
-from .forms import ParkingLotForm, UpdateSpotsForm
+from app.models import ParkingLot, ParkingSpot, Reservation, Payment, User, Tariff, loaders
+from app import reports, allocation, rollups, exports, events, spot_index, jobs, archive, fragments, warmup, admission, occupancy
+from app.billing import apply_billing
+from .forms import ParkingLotForm, UpdateSpotsForm, TariffForm
+from . import provisioning
 
 from . import admin_bp
 
@@ -21,46 +25,35 @@ def admin_required(f):
 @admin_required
 def dashboard():
     try:
+        since = events.last_event_id()
         lots = ParkingLot.query.all()
-        total_lots = len(lots)
-        total_spots = sum(lot.total_spots for lot in lots)
-        active_bookings = Reservation.query.filter_by(is_active=True).count()
+        active_bookings = sum(lot.get_booked_spots_count() for lot in lots)
         
-        # Calculate total earnings (paid)
-        paid_payments = Payment.query.filter_by(is_paid=True).all()
-        total_earnings = sum(p.amount for p in paid_payments)
-        
-        # Calculate total due (unpaid completed + active reservations)
-        unpaid_payments = Payment.query.filter_by(is_paid=False).all()
-        total_due_completed = sum(p.amount for p in unpaid_payments)
-        
-        # Active reservations ongoing cost
-        active_reservations = Reservation.query.filter_by(is_active=True).all()
-        total_due_active = 0
-        for res in active_reservations:
-            try:
-                total_due_active += res.calculate_cost()
-            except:
-                pass
-        
-        total_due = total_due_completed + total_due_active
+        # Paid, unpaid and ongoing totals are aggregated in the database, only when
+        # the cached header has expired or a lot changed
+        def summary_values():
+            summary = reports.financial_summary()
+            return {
+                'total_lots': len(lots),
+                'total_spots': sum(lot.total_spots for lot in lots),
+                'total_earnings': summary['total_earnings'],
+                'total_due': summary['total_due'],
+            }
+        summary = fragments.summary_header('admin_summary.html', lots, summary_values)
         
         return render_template('admin_dashboard.html', 
+                             since=since,
                              lots=lots,
-                             total_lots=total_lots,
-                             total_spots=total_spots,
-                             active_bookings=active_bookings,
-                             total_earnings=total_earnings,
-                             total_due=total_due)
+                             summary=summary,
+                             active_bookings=active_bookings)
     except Exception as e:
         flash(f'An error occurred: {str(e)}', 'danger')
         return render_template('admin_dashboard.html', 
+                             since=None,
                              lots=[], 
-                             total_lots=0, 
-                             total_spots=0, 
-                             active_bookings=0,
-                             total_earnings=0,
-                             total_due=0)
+                             summary=render_template('admin_summary.html', total_lots=0, total_spots=0,
+                                                     total_earnings=0, total_due=0),
+                             active_bookings=0)
 
 @admin_bp.route('/add_lot', methods=['GET', 'POST'])
 @login_required
@@ -72,15 +65,14 @@ def add_lot():
             lot = ParkingLot(
                 name=form.name.data,
                 total_spots=form.total_spots.data,
-                price_per_hour=form.price_per_hour.data
+                price_per_hour=form.price_per_hour.data,
+                booked_spots=0
             )
             db.session.add(lot)
             db.session.flush()  # Get the lot ID
             
             # Create parking spots
-            for i in range(1, form.total_spots.data + 1):
-                spot = ParkingSpot(spot_number=i, lot_id=lot.id)
-                db.session.add(spot)
+            provisioning.provision_lot(lot.id, form.total_spots.data)
             
             db.session.commit()
             flash(f'Parking lot "{lot.name}" added successfully!', 'success')
@@ -99,7 +91,7 @@ def delete_lot(lot_id):
         lot = ParkingLot.query.get_or_404(lot_id)
         
         # Check if any spot is currently booked
-        booked_count = sum(1 for spot in lot.spots if spot.is_booked)
+        booked_count = lot.get_booked_spots_count()
         if booked_count > 0:
             flash(f'Cannot delete lot. {booked_count} spot(s) are currently booked.', 'danger')
             return redirect(url_for('admin.dashboard'))
@@ -114,6 +106,8 @@ def delete_lot(lot_id):
         
         # Now safe to delete
         db.session.delete(lot)
+        events.lot_changed(lot_id, deleted=True)
+        spot_index.lot_changed(lot_id)
         db.session.commit()
         flash(f'Parking lot "{lot.name}" deleted successfully!', 'success')
     except Exception as e:
@@ -138,20 +132,11 @@ def update_spots(lot_id):
                 flash(f'Cannot reduce spots below {current_booked} (currently booked).', 'danger')
                 return redirect(url_for('admin.update_spots', lot_id=lot_id))
             
-            if new_total > lot.total_spots:
-                # Add new spots
-                for i in range(lot.total_spots + 1, new_total + 1):
-                    spot = ParkingSpot(spot_number=i, lot_id=lot.id)
-                    db.session.add(spot)
-            elif new_total < lot.total_spots:
-                # Remove spots (from the end, unbooked only)
-                spots_to_remove = ParkingSpot.query.filter_by(lot_id=lot.id, is_booked=False)\
-                    .order_by(ParkingSpot.spot_number.desc())\
-                    .limit(lot.total_spots - new_total).all()
-                for spot in spots_to_remove:
-                    db.session.delete(spot)
+            # Add or remove spots (from the end, unbooked only) in bulk
+            provisioning.resize_lot(lot, new_total)
+            events.lot_changed(lot.id)
+            spot_index.lot_changed(lot.id)
             
-            lot.total_spots = new_total
             db.session.commit()
             flash(f'Updated spots for "{lot.name}" to {new_total}.', 'success')
             return redirect(url_for('admin.dashboard'))
@@ -163,26 +148,101 @@ def update_spots(lot_id):
         flash(f'An error occurred: {str(e)}', 'danger')
         return redirect(url_for('admin.dashboard'))
 
+@admin_bp.route('/tariff/<int:lot_id>', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def edit_tariff(lot_id):
+    try:
+        lot = ParkingLot.query.get_or_404(lot_id)
+        form = TariffForm()
+        
+        if form.validate_on_submit():
+            tariff = lot.tariff or Tariff()
+            tariff.name = form.name.data
+            tariff.bands = json.dumps(form.parsed_bands())
+            tariff.daily_cap = form.daily_cap.data
+            tariff.grace_minutes = form.grace_minutes.data or 0
+            lot.tariff = tariff
+            ParkingLot.bump_version(lot.id)
+            
+            db.session.commit()
+            flash(f'Tariff for "{lot.name}" saved. It applies to new bookings.', 'success')
+            return redirect(url_for('admin.dashboard'))
+        
+        if request.method == 'GET' and lot.tariff:
+            form.name.data = lot.tariff.name
+            form.bands.data = "\n".join(f"{b['start']}-{b['end']} {b['rate']}" for b in lot.tariff.get_bands())
+            form.daily_cap.data = lot.tariff.daily_cap
+            form.grace_minutes.data = lot.tariff.grace_minutes
+        return render_template('tariff.html', form=form, lot=lot)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'An error occurred: {str(e)}', 'danger')
+        return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/tariff/<int:lot_id>/remove')
+@login_required
+@admin_required
+def remove_tariff(lot_id):
+    try:
+        lot = ParkingLot.query.get_or_404(lot_id)
+        lot.tariff = None
+        ParkingLot.bump_version(lot.id)
+        db.session.commit()
+        flash(f'"{lot.name}" is back on its flat hourly price for new bookings.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'An error occurred: {str(e)}', 'danger')
+    return redirect(url_for('admin.dashboard'))
+
 @admin_bp.route('/bookings')
 @login_required
 @admin_required
 def view_bookings():
     try:
-        bookings = Reservation.query.order_by(Reservation.start_time.desc()).all()
+        page_size = current_app.config.get('BOOKINGS_PAGE_SIZE', 50)
+        
+        # Streamed mode renders the whole history while holding one page in memory
+        if request.args.get('stream'):
+            pages = archive.iter_booking_history_pages(page_size)
+            bookings = (booking for items in pages for booking in apply_billing(items))
+            return current_app.response_class(stream_template(
+                'view_bookings.html', bookings=bookings, next_cursor=None, streaming=True, lots=lot_choices()))
+        
+        page = archive.booking_history_page(request.args.get('cursor'), page_size)
         
         # Add cost to each booking as an attribute for template
-        for booking in bookings:
-            try:
-                booking.cost = booking.calculate_cost()
-                booking.duration = booking.calculate_duration_hours()
-            except:
-                booking.cost = 0
-                booking.duration = 0
+        bookings = apply_billing(page.items)
         
-        return render_template('view_bookings.html', bookings=bookings)
+        return render_template('view_bookings.html', bookings=bookings,
+                               next_cursor=page.next_cursor, streaming=False, lots=lot_choices())
     except Exception as e:
         flash(f'An error occurred: {str(e)}', 'danger')
-        return render_template('view_bookings.html', bookings=[])
+        return render_template('view_bookings.html', bookings=[], next_cursor=None, streaming=False, lots=[])
+
+def lot_choices():
+    return db.session.execute(db.select(ParkingLot.id, ParkingLot.name).order_by(ParkingLot.name)).all()
+
+@admin_bp.route('/export/<kind>')
+@login_required
+@admin_required
+def export_data(kind):
+    try:
+        fmt = request.args.get('format', 'csv')
+        exports.check_format(kind, fmt)
+        filters = exports.parse_filters(request.args.get('start'), request.args.get('end'),
+                                        request.args.get('lot_id'))
+    except exports.ExportError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.view_bookings'))
+    
+    # Rows are streamed out chunk by chunk while the request context stays open
+    mimetype = exports.FORMATS[fmt][0]
+    filename = exports.export_filename(kind, fmt, **filters)
+    return current_app.response_class(
+        stream_with_context(exports.stream_export(kind, fmt, **filters)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @admin_bp.route('/active_bookings')
 @login_required
@@ -191,18 +251,12 @@ def active_bookings():
     try:
         # Get all active reservations
         active_reservations = Reservation.query.filter_by(is_active=True)\
+            .options(*loaders.booking_list_profile())\
             .order_by(Reservation.start_time.desc()).all()
         
         # Calculate costs and add as attributes
-        total_cost = 0
-        for res in active_reservations:
-            try:
-                res.cost = res.calculate_cost()
-                res.duration = res.calculate_duration_hours()
-                total_cost += res.cost
-            except Exception as e:
-                res.cost = 0
-                res.duration = 0
+        apply_billing(active_reservations)
+        total_cost = sum(res.cost for res in active_reservations)
         
         return render_template('active_bookings.html', 
                              reservations=active_reservations,
@@ -217,30 +271,22 @@ def active_bookings():
 def due_payments():
     try:
         # Get unpaid completed reservations
-        unpaid_payments = Payment.query.filter_by(is_paid=False).all()
+        unpaid_payments = Payment.query.filter_by(is_paid=False)\
+            .options(*loaders.payment_list_profile()).all()
         
         # Get active reservations (ongoing cost)
-        active_reservations = Reservation.query.filter_by(is_active=True).all()
+        active_reservations = Reservation.query.filter_by(is_active=True)\
+            .options(*loaders.booking_list_profile()).all()
         
         # Add costs and durations as attributes
-        for res in active_reservations:
-            try:
-                res.cost = res.calculate_cost()
-                res.duration = res.calculate_duration_hours()
-            except:
-                res.cost = 0
-                res.duration = 0
-        
-        for payment in unpaid_payments:
-            try:
-                payment.reservation.duration = payment.reservation.calculate_duration_hours()
-            except:
-                payment.reservation.duration = 0
+        apply_billing(active_reservations)
+        apply_billing(payment.reservation for payment in unpaid_payments)
         
         # Calculate totals
-        total_due_completed = sum(p.amount for p in unpaid_payments)
-        total_due_active = sum(r.cost for r in active_reservations)
-        total_due = total_due_completed + total_due_active
+        summary = reports.financial_summary()
+        total_due_completed = summary['unpaid_total']
+        total_due_active = summary['active_total']
+        total_due = summary['total_due']
         
         return render_template('due_payments.html',
                              unpaid_payments=unpaid_payments,
@@ -262,56 +308,132 @@ def due_payments():
 @admin_required
 def earnings_report():
     try:
-        # Get all paid payments
-        paid_payments = Payment.query.filter_by(is_paid=True)\
-            .order_by(Payment.payment_date.desc()).all()
+        # Only the latest payments are listed; totals and breakdowns come from the rollups
+        paid_payments = archive.recent_paid_payments(current_app.config['EARNINGS_RECENT_PAYMENTS'])
         
         # Add duration to each payment's reservation
-        for payment in paid_payments:
-            try:
-                payment.reservation.duration = payment.reservation.calculate_duration_hours()
-            except:
-                payment.reservation.duration = 0
-        
-        total_earnings = sum(p.amount for p in paid_payments)
-        
-        # Get unpaid for reference
-        unpaid_count = Payment.query.filter_by(is_paid=False).count()
-        unpaid_payments = Payment.query.filter_by(is_paid=False).all()
-        total_due = sum(p.amount for p in unpaid_payments)
-        
-        # Add active reservations to due
-        active_reservations = Reservation.query.filter_by(is_active=True).all()
-        for res in active_reservations:
-            try:
-                total_due += res.calculate_cost()
-            except:
-                pass
+        apply_billing(payment.reservation for payment in paid_payments)
         
-        total_revenue = total_earnings + total_due
+        summary = reports.earnings_summary()
+        total_earnings = summary['total_earnings']
+        paid_count = summary['paid_count']
+        unpaid_count = summary['unpaid_count']
+        total_due = summary['total_due']
+        total_revenue = summary['total_revenue']
         
         return render_template('earnings_report.html',
                              paid_payments=paid_payments,
+                             paid_count=paid_count,
                              total_earnings=total_earnings,
                              total_due=total_due,
                              total_revenue=total_revenue,
-                             unpaid_count=unpaid_count)
+                             unpaid_count=unpaid_count,
+                             daily=rollups.daily_breakdown(current_app.config['EARNINGS_DAILY_DAYS']),
+                             hourly=rollups.hourly_breakdown(current_app.config['EARNINGS_DAILY_DAYS']),
+                             monthly=rollups.monthly_breakdown(current_app.config['EARNINGS_MONTHS']),
+                             by_lot=rollups.lot_breakdown())
     except Exception as e:
         flash(f'An error occurred: {str(e)}', 'danger')
         return render_template('earnings_report.html',
                              paid_payments=[],
+                             paid_count=0,
                              total_earnings=0,
                              total_due=0,
                              total_revenue=0,
-                             unpaid_count=0)
+                             unpaid_count=0,
+                             daily=[],
+                             hourly=[],
+                             monthly=[],
+                             by_lot=[])
+
+@admin_bp.route('/occupancy')
+@login_required
+@admin_required
+def occupancy_report():
+    days = request.args.get('days', current_app.config['OCCUPANCY_DAYS'], type=int)
+    days = min(max(days, 1), current_app.config['OCCUPANCY_MAX_DAYS'])
+    lot_id = request.args.get('lot_id', type=int)
+    try:
+        # One sweep over every booking in the window, live and archived
+        report = occupancy.analyse(days, lot_id)
+        
+        return render_template('occupancy_report.html',
+                             report=report,
+                             lots=ParkingLot.query.order_by(ParkingLot.name).all(),
+                             days=days,
+                             lot_id=lot_id,
+                             day_names=occupancy.DAY_NAMES)
+    except Exception as e:
+        flash(f'An error occurred: {str(e)}', 'danger')
+        return render_template('occupancy_report.html',
+                             report=None,
+                             lots=[],
+                             days=days,
+                             lot_id=lot_id,
+                             day_names=occupancy.DAY_NAMES)
 
 @admin_bp.route('/lot_grid/<int:lot_id>')
 @login_required
 @admin_required
 def lot_grid(lot_id):
     try:
+        # Taken before the reads so the live stream replays anything committed meanwhile
+        since = events.last_event_id()
         lot = ParkingLot.query.get_or_404(lot_id)
-        return render_template('lot_grid.html', lot=lot)
+        spots = ParkingSpot.query.filter_by(lot_id=lot.id)\
+            .options(*loaders.grid_profile())\
+            .order_by(ParkingSpot.spot_number).all()
+        return render_template('lot_grid.html', lot=lot, spots=spots, since=since)
+    except Exception as e:
+        flash(f'An error occurred: {str(e)}', 'danger')
+        return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/jobs')
+@login_required
+@admin_required
+def job_queue():
+    try:
+        return render_template('jobs.html', stats=jobs.queue_stats(), failures=jobs.recent_failures())
+    except Exception as e:
+        flash(f'An error occurred: {str(e)}', 'danger')
+        return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/jobs/<int:job_id>/retry')
+@login_required
+@admin_required
+def retry_job(job_id):
+    try:
+        job = jobs.retry(job_id)
+        db.session.commit()
+        flash(f'Job #{job.id} queued again.', 'success')
     except Exception as e:
+        db.session.rollback()
         flash(f'An error occurred: {str(e)}', 'danger')
-        return redirect(url_for('admin.dashboard'))
\ No newline at end of file
+    return redirect(url_for('admin.job_queue'))
+
+@admin_bp.route('/instrumentation')
+@login_required
+@admin_required
+def instrumentation():
+    profiler = current_app.extensions.get('request_profiler')
+    cache = current_app.extensions.get('principal_cache')
+    index = current_app.extensions.get('spot_index')
+    hub = current_app.extensions.get('event_hub')
+    fragment_cache = current_app.extensions.get('fragment_cache')
+    gates = admission.get_admission()
+    counters = {
+        'allocation': allocation.allocation_stats(),
+        'user_cache': cache.stats() if cache else None,
+        'spot_index': index.stats() if index else None,
+        'events': hub.stats() if hub else None,
+        'fragments': fragment_cache.stats() if fragment_cache else None,
+        'jobs': jobs.queue_stats(),
+        'admission': gates.stats() if gates else None,
+        'startup': warmup.startup_stats(current_app),
+    }
+    if profiler is None:
+        return jsonify(enabled=False, **counters)
+    
+    if request.args.get('reset'):
+        profiler.reset()
+    return jsonify(enabled=True, endpoints=profiler.snapshot(), **counters)
\ No newline at end of file
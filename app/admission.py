@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, make_response, render_template, request
+from flask_login import current_user
+
+
+#Admission control for the endpoints that write: login, register, book_lot,
+#checkout and pay_now. Each has a cap on requests running at once; a request
+#over the cap waits (up to ADMISSION_QUEUE_TIMEOUT seconds) in a short bounded
+#queue for a slot, and once that queue is full it is turned away straight
+#away with 429 and Retry-After instead of piling onto the SQLite writer. Each
+#user (each IP before login) also has a token bucket per endpoint, so one
+#client retrying in a loop is throttled before it takes a slot. The IP is the
+#one TRUSTED_PROXIES lets through from X-Forwarded-For, so deployments behind
+#a reverse proxy must set it or all anonymous clients share a bucket. Limits come
+#from ADMISSION_LIMITS and apply per process; a request is counted as
+#admitted, queued (admitted after waiting), shed or throttled.
+
+
+class TokenBuckets:
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+
+    def take(self, key, now):
+        #0 when a token was taken, otherwise seconds until the next one; caller holds the lock
+        tokens, last = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class EndpointGate:
+    def __init__(self, concurrency, queue, rate=None, burst=None, methods=('POST',), max_clients=10000):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.methods = set(methods)
+        self.buckets = TokenBuckets(rate, burst or 1, max_clients) if rate else None
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.counts = {'admitted': 0, 'queued': 0, 'shed': 0, 'throttled': 0}
+        self.max_waiting = 0
+
+    def throttle(self, key):
+        #seconds the client has to wait, 0 when it may go ahead
+        if self.buckets is None:
+            return 0
+        with self.condition:
+            wait = self.buckets.take(key, time.monotonic())
+            if wait:
+                self.counts['throttled'] += 1
+            return wait
+
+    def acquire(self, timeout):
+        #True once a slot is held, False when the request should be shed
+        with self.condition:
+            if self.active < self.concurrency:
+                self.active += 1
+                self.counts['admitted'] += 1
+                return True
+            if self.waiting >= self.queue:
+                self.counts['shed'] += 1
+                return False
+
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                admitted = self.condition.wait_for(lambda: self.active < self.concurrency, timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.counts['shed'] += 1
+                return False
+            self.active += 1
+            self.counts['admitted'] += 1
+            self.counts['queued'] += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def stats(self):
+        with self.condition:
+            return dict(self.counts, active=self.active, waiting=self.waiting, max_waiting=self.max_waiting,
+                        concurrency=self.concurrency, queue=self.queue)
+
+
+class AdmissionControl:
+    def __init__(self, limits, queue_timeout=2.0, retry_after=1, max_clients=10000, enabled=True):
+        self.enabled = enabled
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.gates = {endpoint: EndpointGate(max_clients=max_clients, **limit) for endpoint, limit in limits.items()}
+
+    def admit(self):
+        gate = self.gates.get(request.endpoint)
+        if not self.enabled or gate is None or request.method not in gate.methods:
+            return None
+
+        # Logged-in users get their own bucket; everyone else shares one per address
+        key = f'user:{current_user.id}' if current_user.is_authenticated else f'ip:{request.remote_addr}'
+        wait = gate.throttle(key)
+        if wait:
+            return too_many_requests(math.ceil(wait))
+
+        if not gate.acquire(self.queue_timeout):
+            return too_many_requests(self.retry_after)
+        g.admission_gate = gate
+        return None
+
+    def release(self, exc=None):
+        gate = g.pop('admission_gate', None)
+        if gate is not None:
+            gate.release()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'endpoints': {endpoint: gate.stats() for endpoint, gate in self.gates.items()},
+        }
+
+
+def too_many_requests(retry_after):
+    response = make_response(render_template('429.html', retry_after=retry_after), 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_admission(app):
+    admission = AdmissionControl(
+        app.config.get('ADMISSION_LIMITS', {}),
+        queue_timeout = app.config.get('ADMISSION_QUEUE_TIMEOUT', 2.0),
+        retry_after = app.config.get('ADMISSION_RETRY_AFTER', 1),
+        max_clients = app.config.get('ADMISSION_MAX_CLIENTS', 10000),
+        enabled = app.config.get('ADMISSION_ENABLED', True)
+    )
+    app.before_request(admission.admit)
+    app.teardown_request(admission.release)
+    app.extensions['admission'] = admission
+    return admission
+
+
+def get_admission():
+    return current_app.extensions.get('admission')
@@ -0,0 +1,108 @@
+import threading
+from flask import current_app
+from sqlalchemy import update, select
+from app.extensions import db
+from app.models import ParkingLot, ParkingSpot
+from app.spot_index import get_spot_index, spot_claimed
+
+
+#Spot allocation for bookings. A spot is claimed with one conditional UPDATE
+#(... WHERE is_booked = false), so two requests racing for the same spot can
+#never both win: the loser sees rowcount 0 and either retries on the next free
+#spot (auto-assign) or is told the spot has gone. Auto-assign takes its
+#candidate from the in-memory free-spot index when the app has one.
+
+
+class SpotUnavailable(Exception):
+    pass
+
+
+_stats_lock = threading.Lock()
+_stats = {
+    'claims': 0,
+    'conflicts': 0,
+    'exhausted': 0,
+}
+
+
+def _record(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def allocation_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def lowest_free_spot_id(lot_id):
+    return db.session.execute(
+        select(ParkingSpot.id)
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.is_booked == False)
+        .order_by(ParkingSpot.spot_number)
+        .limit(1)
+    ).scalar()
+
+
+def next_free_spot_id(lot_id):
+    index = get_spot_index()
+    if index is None:
+        return lowest_free_spot_id(lot_id)
+    
+    found = index.next_free(lot_id)
+    if found is not None:
+        return found[1]
+    
+    # An empty index may just be stale (spots freed by another worker), so ask the database
+    spot_id = lowest_free_spot_id(lot_id)
+    if spot_id is not None:
+        index.invalidate(lot_id)
+    return spot_id
+
+
+def _try_claim(lot_id, spot_id):
+    result = db.session.execute(
+        update(ParkingSpot)
+        .where(
+            ParkingSpot.id == spot_id,
+            ParkingSpot.lot_id == lot_id,
+            ParkingSpot.is_booked == False
+        )
+        .values(is_booked = True)
+        .execution_options(synchronize_session = False)
+    )
+    return result.rowcount == 1
+
+
+def claim_spot(lot_id, spot_id=None):
+    #claims spot_id, or the lowest numbered free spot when none is given; the claim
+    #and the lot counter update join the caller's transaction
+    max_attempts = current_app.config.get('BOOKING_MAX_CLAIM_ATTEMPTS', 5)
+    
+    for _ in range(max_attempts):
+        target = spot_id or next_free_spot_id(lot_id)
+        if target is None:
+            _record('exhausted')
+            raise SpotUnavailable('This parking lot is fully booked.')
+        
+        claimed = _try_claim(lot_id, target)
+        
+        # Taken either way: by this request, or by whoever beat it to the spot
+        spot_claimed(lot_id, target)
+        
+        if claimed:
+            ParkingLot.adjust_booked_spots(lot_id, 1)
+            _record('claims')
+            return db.session.execute(
+                select(ParkingSpot)
+                .where(ParkingSpot.id == target)
+                .execution_options(populate_existing = True)
+            ).scalar_one()
+        
+        _record('conflicts')
+        if spot_id:
+            # The user picked this exact spot, someone else got it first
+            raise SpotUnavailable('This spot is no longer available.')
+    
+    _record('exhausted')
+    raise SpotUnavailable('Could not find a free spot, please try again.')
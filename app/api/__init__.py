@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+
+from . import routes
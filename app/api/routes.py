@@ -0,0 +1,149 @@
+from flask import jsonify, request, current_app
+from flask_login import current_user
+from functools import wraps
+from hashlib import blake2b
+from app.extensions import db
+from app.models import ParkingLot, ParkingSpot, Reservation
+from app import events
+
+from . import api_bp
+
+
+#Compact JSON for kiosks and the mobile app. Every response carries an ETag
+#derived from ParkingLot.version, which booking, checkout, resizing and tariff
+#changes bump, so a poll with a matching If-None-Match gets an empty 304 after
+#reading at most the lot rows, never the spots table. Like the HTML views,
+#every endpoint needs a signed-in user (401 otherwise), and responses are
+#marked private so shared caches never hand them to someone else.
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='authentication required'), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def conditional(etag, build, private=False):
+    #304 when the client already holds this version, otherwise build the body;
+    #private responses are kept out of shared caches
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    return response
+
+
+def lot_json(lot):
+    return {
+        'id': lot.id,
+        'name': lot.name,
+        'price_per_hour': lot.price_per_hour,
+        'total': lot.total_spots,
+        'booked': lot.booked_spots,
+        'available': max(lot.total_spots - lot.booked_spots, 0),
+        'version': lot.version,
+    }
+
+
+@api_bp.route('/lots')
+@api_login_required
+def lots():
+    rows = db.session.execute(
+        db.select(ParkingLot.id, ParkingLot.name, ParkingLot.price_per_hour,
+                  ParkingLot.total_spots, ParkingLot.booked_spots, ParkingLot.version)
+        .order_by(ParkingLot.id)
+    ).all()
+    
+    # Adding or deleting a lot changes the id list, so it changes the tag too
+    digest = blake2b(','.join(f'{row.id}:{row.version}' for row in rows).encode(), digest_size=8)
+    return conditional(f'lots-{digest.hexdigest()}', lambda: {'lots': [lot_json(row) for row in rows]}, private=True)
+
+
+@api_bp.route('/lots/<int:lot_id>')
+@api_login_required
+def lot(lot_id):
+    row = db.session.execute(
+        db.select(ParkingLot.id, ParkingLot.name, ParkingLot.price_per_hour,
+                  ParkingLot.total_spots, ParkingLot.booked_spots, ParkingLot.version)
+        .where(ParkingLot.id == lot_id)
+    ).first()
+    if row is None:
+        return jsonify(error='lot not found'), 404
+    return conditional(f'lot-{row.id}-{row.version}', lambda: lot_json(row), private=True)
+
+
+@api_bp.route('/lots/<int:lot_id>/spots')
+@api_login_required
+def spot_map(lot_id):
+    version = db.session.execute(
+        db.select(ParkingLot.version).where(ParkingLot.id == lot_id)
+    ).scalar()
+    if version is None:
+        return jsonify(error='lot not found'), 404
+    
+    def build():
+        # [spot number, 1 if booked] pairs in spot order
+        spots = db.session.execute(
+            db.select(ParkingSpot.spot_number, ParkingSpot.is_booked)
+            .where(ParkingSpot.lot_id == lot_id)
+            .order_by(ParkingSpot.spot_number)
+        ).all()
+        return {'lot_id': lot_id, 'version': version,
+                'spots': [[number, int(booked)] for number, booked in spots]}
+    
+    return conditional(f'spots-{lot_id}-{version}', build, private=True)
+
+
+@api_bp.route('/me/reservation')
+@api_login_required
+def active_reservation():
+    reservation = Reservation.query.filter_by(user_id=current_user.id, is_active=True).first()
+    if reservation is None:
+        return conditional(f'reservation-{current_user.id}-none', lambda: {'active': False}, private=True)
+    
+    # The running cost is left to the client, so the body only changes at checkout
+    return conditional(f'reservation-{current_user.id}-{reservation.id}', lambda: {
+        'active': True,
+        'id': reservation.id,
+        'lot_id': reservation.spot.lot_id if reservation.spot else None,
+        'lot_name': reservation.get_lot_name(),
+        'spot_number': reservation.get_spot_number(),
+        'vehicle_number': reservation.vehicle_number,
+        'start_time': reservation.start_time.isoformat(),
+        'price_per_hour': reservation.price_per_hour_snapshot,
+        'tariff': reservation.tariff_snapshot is not None,
+    }, private=True)
+
+
+def event_stream(channels):
+    #each open stream keeps a server thread for as long as the viewer stays, so
+    #like the pages that embed them the streams are for signed-in users only
+    hub = events.get_event_hub()
+    
+    # Resume from the browser's Last-Event-ID, or from the id the page was rendered at
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else None
+    
+    subscription = hub.subscribe(channels, since)
+    response = current_app.response_class(
+        events.sse_stream(subscription, current_app.config['SSE_HEARTBEAT'], current_app.config['SSE_RETRY_MS']),
+        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_bp.route('/stream/lots')
+@api_login_required
+def lots_stream():
+    return event_stream(('lots',))
+
+
+@api_bp.route('/stream/lots/<int:lot_id>')
+@api_login_required
+def lot_stream(lot_id):
+    return event_stream((events.lot_channel(lot_id),))
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, delete, func, exists, bindparam, literal
+from sqlalchemy.orm import aliased
+from app.extensions import db
+from app.models import ParkingLot, ParkingSpot, Reservation, Payment, ArchivedReservation, ArchivedPayment
+from app.models import loaders
+from app.pagination import merged_keyset_page, iter_merged_keyset_pages
+
+
+#Hot/cold split of booking history. Closed reservations whose payment is settled
+#are moved, with that payment, into archived_reservation/archived_payment once
+#they ended more than ARCHIVE_AFTER_DAYS ago, so the live tables (and the
+#indexes every booking, checkout and active-list query walks) only hold recent
+#and open bookings. Rows move in batches, each batch in one transaction, with
+#their live ids, and snapshots are filled in from the spot and lot on the way.
+#History and report views read both sides through the functions below.
+
+
+def _eligible(cutoff, limit):
+    other = aliased(Payment)
+    unpaid = exists().where(other.reservation_id == Reservation.id, other.is_paid == False)
+
+    # The newest row of each table stays behind, so SQLite never hands an archived id out again
+    newest_reservation = select(func.max(Reservation.id)).scalar_subquery()
+    newest_payment = select(func.max(Payment.id)).scalar_subquery()
+
+    return select(Reservation.id)\
+        .join(Payment, Payment.reservation_id == Reservation.id)\
+        .where(
+            Reservation.is_active == False,
+            Reservation.end_time < cutoff,
+            Payment.is_paid == True,
+            Payment.payment_date.isnot(None),
+            ~unpaid,
+            Reservation.id < newest_reservation,
+            Payment.id < newest_payment
+        )\
+        .order_by(Reservation.id)\
+        .limit(limit)
+
+
+def _copy_reservations(ids, now):
+    rows = select(
+        Reservation.id,
+        Reservation.user_id,
+        Reservation.spot_id,
+        ParkingSpot.lot_id,
+        Reservation.vehicle_number,
+        Reservation.start_time,
+        Reservation.end_time,
+        literal(False),
+        func.coalesce(Reservation.lot_name_snapshot, ParkingLot.name),
+        func.coalesce(Reservation.spot_number_snapshot, ParkingSpot.spot_number),
+        func.coalesce(func.nullif(Reservation.price_per_hour_snapshot, 0), ParkingLot.price_per_hour),
+        Reservation.tariff_snapshot,
+        bindparam('archived_at', now, type_=db.DateTime),
+    )\
+        .select_from(Reservation)\
+        .outerjoin(ParkingSpot, Reservation.spot_id == ParkingSpot.id)\
+        .outerjoin(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)\
+        .where(Reservation.id.in_(ids))
+
+    db.session.execute(insert(ArchivedReservation).from_select([
+        'id', 'user_id', 'spot_id', 'lot_id', 'vehicle_number', 'start_time', 'end_time', 'is_active',
+        'lot_name_snapshot', 'spot_number_snapshot', 'price_per_hour_snapshot', 'tariff_snapshot', 'archived_at',
+    ], rows))
+
+
+def _copy_payments(ids):
+    rows = select(Payment.id, Payment.reservation_id, Payment.amount, Payment.is_paid,
+                  Payment.payment_date, Payment.created_at)\
+        .where(Payment.reservation_id.in_(ids))
+    db.session.execute(insert(ArchivedPayment).from_select(
+        ['id', 'reservation_id', 'amount', 'is_paid', 'payment_date', 'created_at'], rows))
+
+
+def archive_closed(now=None, after_days=None, batch_size=None):
+    #moves settled history older than after_days; returns how many reservations moved
+    config = current_app.config
+    now = now or datetime.utcnow()
+    after_days = config.get('ARCHIVE_AFTER_DAYS', 180) if after_days is None else after_days
+    batch_size = batch_size or config.get('ARCHIVE_BATCH_SIZE', 5000)
+    cutoff = now - timedelta(days=after_days)
+
+    moved = 0
+    while True:
+        ids = db.session.execute(_eligible(cutoff, batch_size)).scalars().all()
+        if not ids:
+            return moved
+
+        _copy_reservations(ids, now)
+        _copy_payments(ids)
+        db.session.execute(delete(Payment).where(Payment.reservation_id.in_(ids))
+                           .execution_options(synchronize_session = False))
+        db.session.execute(delete(Reservation).where(Reservation.id.in_(ids))
+                           .execution_options(synchronize_session = False))
+        db.session.commit()
+        moved += len(ids)
+
+
+def archive_stats():
+    return {
+        'live_reservations': db.session.execute(select(func.count(Reservation.id))).scalar(),
+        'archived_reservations': db.session.execute(select(func.count(ArchivedReservation.id))).scalar(),
+        'oldest_live': db.session.execute(
+            select(func.min(Reservation.end_time)).where(Reservation.is_active == False)).scalar(),
+    }
+
+
+#Reads over live and archived history together
+
+
+def user_history_page(user_id, cursor=None, page_size=20):
+    #a user's closed bookings, newest checkout first
+    return merged_keyset_page([
+        (Reservation.query.filter_by(user_id=user_id, is_active=False).options(*loaders.history_profile()),
+         Reservation.end_time, Reservation.id),
+        (ArchivedReservation.query.filter_by(user_id=user_id),
+         ArchivedReservation.end_time, ArchivedReservation.id),
+    ], cursor, page_size)
+
+
+def _booking_sources():
+    return [
+        (Reservation.query.options(*loaders.booking_list_profile()), Reservation.start_time, Reservation.id),
+        (ArchivedReservation.query.options(*loaders.archive_booking_list_profile()),
+         ArchivedReservation.start_time, ArchivedReservation.id),
+    ]
+
+
+def booking_history_page(cursor=None, page_size=50):
+    #every booking, newest start first
+    return merged_keyset_page(_booking_sources(), cursor, page_size)
+
+
+def iter_booking_history_pages(page_size=500):
+    return iter_merged_keyset_pages(_booking_sources(), page_size)
+
+
+def recent_paid_payments(limit):
+    page = merged_keyset_page([
+        (Payment.query.filter_by(is_paid=True).options(*loaders.payment_list_profile()),
+         Payment.payment_date, Payment.id),
+        (ArchivedPayment.query.filter(ArchivedPayment.payment_date.isnot(None))
+         .options(*loaders.archive_payment_list_profile()),
+         ArchivedPayment.payment_date, ArchivedPayment.id),
+    ], None, limit)
+    return page.items
+
+
+def archived_paid_totals():
+    row = db.session.execute(
+        select(func.coalesce(func.sum(ArchivedPayment.amount), 0), func.count(ArchivedPayment.id))
+        .where(ArchivedPayment.is_paid == True)
+    ).one()
+    return {'paid_total': row[0], 'paid_count': row[1]}
@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, current_user
 from app.extensions import db
 from app.models import User
 from .forms import LoginForm, RegisterForm
+from .session_cache import invalidate_principal
 
 from . import auth_bp
 
@@ -17,6 +18,10 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            # Upgrade hashes made with outdated parameters while we have the password
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
             if user.is_admin:
@@ -48,6 +53,8 @@ def register():
 
 @auth_bp.route('/logout')
 def logout():
+    if current_user.is_authenticated:
+        invalidate_principal(current_user.id)
     logout_user()
     flash('You have been logged out.', 'info')
     return redirect(url_for('home'))
\ No newline at end of file
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from app.models import User
+
+
+#Cache of lightweight user principals for login_manager.user_loader, so most
+#authenticated requests skip the User lookup. Entries expire after
+#USER_CACHE_TTL seconds (which also bounds staleness across worker processes)
+#and are dropped on logout and whenever a User row is updated or deleted.
+
+
+class UserPrincipal(UserMixin):
+    def __init__(self, id, username, is_admin):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+    
+    def __repr__(self):
+        return f'<UserPrincipal {self.username}>'
+
+
+class PrincipalCache:
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self.entries[user_id]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, principal):
+        with self.lock:
+            self.entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self.entries.move_to_end(principal.id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def init_principal_cache(app):
+    cache = PrincipalCache(
+        max_size = app.config.get('USER_CACHE_SIZE', 10000),
+        ttl = app.config.get('USER_CACHE_TTL', 300)
+    )
+    app.extensions['principal_cache'] = cache
+    return cache
+
+
+def get_principal_cache():
+    return current_app.extensions.get('principal_cache')
+
+
+def load_principal(user_id):
+    cache = get_principal_cache()
+    principal = cache.get(user_id) if cache else None
+    if principal is not None:
+        return principal
+    
+    user = User.query.with_entities(User.id, User.username, User.is_admin)\
+        .filter_by(id=user_id).first()
+    if user is None:
+        return None
+    
+    principal = UserPrincipal(user.id, user.username, user.is_admin)
+    if cache:
+        cache.put(principal)
+    return principal
+
+
+def invalidate_principal(user_id):
+    if has_app_context():
+        cache = get_principal_cache()
+        if cache:
+            cache.invalidate(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    invalidate_principal(target.id)
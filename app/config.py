@@ -5,10 +5,189 @@ INSTANCE_DIR = os.path.join(BASE_DIR, "..", "instance")
 
 
 class Config:
-    SECRET_KEY = "dev-secret-key"
+    SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     
-    SQLALCHEMY_DATABASE_URI = (
-        f"sqlite:///{os.path.join(INSTANCE_DIR, "app.db")}"
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "DATABASE_URL",
+        "sqlite:///" + os.path.join(INSTANCE_DIR, "app.db")
     )
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    #connect-time pragmas, only applied to sqlite engines
+    SQLITE_PRAGMAS = {}
+    
+    #password hashing, stored hashes with other parameters are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_TIMEOUT = 30
+    
+    #cached user principals for the login user_loader
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 300
+    
+    #booking
+    BOOKING_MAX_CLAIM_ATTEMPTS = 5
+    BOOKING_PICKER_PAGE_SIZE = 60
+    MAX_SPOTS_PER_LOT = 50000
+    
+    #in-memory free-spot index: built at startup, each lot reloaded after this many seconds
+    SPOT_INDEX_WARM = True
+    SPOT_INDEX_TTL = 60
+    
+    #admission control on the write endpoints: at most `concurrency` requests of an
+    #endpoint run at once and `queue` more wait up to ADMISSION_QUEUE_TIMEOUT
+    #seconds for a slot; beyond that, or once a client's token bucket (`rate`
+    #per second, up to `burst`) is empty, the answer is 429 with Retry-After
+    ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+    ADMISSION_LIMITS = {
+        'auth.login': {'concurrency': 8, 'queue': 32, 'rate': 1.0, 'burst': 20},
+        'auth.register': {'concurrency': 4, 'queue': 16, 'rate': 0.2, 'burst': 10},
+        'user.book_lot': {'concurrency': 4, 'queue': 32, 'rate': 1.0, 'burst': 5},
+        'user.checkout': {'concurrency': 4, 'queue': 32, 'rate': 1.0, 'burst': 5, 'methods': ('GET',)},
+        'user.pay_now': {'concurrency': 4, 'queue': 32, 'rate': 1.0, 'burst': 5, 'methods': ('GET',)},
+    }
+    ADMISSION_QUEUE_TIMEOUT = 2.0
+    ADMISSION_RETRY_AFTER = 1
+    ADMISSION_MAX_CLIENTS = 10000
+    
+    #signed-in users are throttled by user id, everyone else by client address.
+    #Behind a reverse proxy every request comes from the proxy's address, so the
+    #anonymous buckets (login, register) would be shared by all clients: set this
+    #to the number of proxies in front of the app so X-Forwarded-For is trusted
+    #that many hops back. Leave it at 0 when clients connect directly, or a client
+    #could pick its own address
+    TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
+
+    #pagination
+    BOOKINGS_PAGE_SIZE = 50
+    HISTORY_PAGE_SIZE = 20
+    
+    #earnings report (totals and breakdowns are read from the rollup tables)
+    EARNINGS_RECENT_PAYMENTS = 50
+    EARNINGS_DAILY_DAYS = 30
+    EARNINGS_MONTHS = 12
+    
+    #occupancy report: default window in days and the longest one that may be asked for
+    OCCUPANCY_DAYS = 365
+    OCCUPANCY_MAX_DAYS = 3 * 365
+    
+    #rendered fragment cache: backend (dotted path, empty to disable), its entry and
+    #byte limits, and how long the admin summary header may lag payments
+    FRAGMENT_CACHE_BACKEND = "app.fragments.LocalBackend"
+    FRAGMENT_CACHE_SIZE = 5000
+    FRAGMENT_CACHE_BYTES = 16 * 1024 * 1024
+    FRAGMENT_SUMMARY_TTL = 15
+
+    #server-sent events: pub/sub backend (dotted path), replay buffer for
+    #reconnecting viewers, per-viewer queue bound and keepalive interval
+    EVENT_BACKEND = "app.events.LocalBackend"
+    SSE_REPLAY_SIZE = 256
+    SSE_QUEUE_SIZE = 100
+    SSE_HEARTBEAT = 15
+    SSE_RETRY_MS = 3000
+    
+    #background jobs: in-app worker threads (0 when app/models/job_worker.py
+    #runs separately), retry policy, lease before a stuck job is taken back
+    JOB_WORKER_THREADS = 2
+    JOB_WORKER_PROCESS_THREADS = 4
+    JOB_POLL_INTERVAL = 1.0
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BACKOFF = 2
+    JOB_LEASE_SECONDS = 300
+    JOB_RETENTION_DAYS = 7
+    
+    #history archive: closed, paid bookings older than this move to the archive tables
+    ARCHIVE_AFTER_DAYS = 180
+    ARCHIVE_BATCH_SIZE = 5000
+
+    #rows fetched per server-side cursor chunk in exports
+    EXPORT_CHUNK_SIZE = 10000
+    
+    #startup: where compiled templates are kept between processes (empty to
+    #disable), and whether create_app warms templates, mappers and the pool
+    JINJA_BYTECODE_CACHE_DIR = os.path.join(INSTANCE_DIR, "jinja_cache")
+    WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "0") == "1"
+    WARMUP_POOL_CONNECTIONS = 4
+
+    #request/sql instrumentation (off unless enabled)
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "0") == "1"
+    SQL_INSTRUMENTATION_LOG = os.path.join(INSTANCE_DIR, "sql_profile.log")
+    SQL_INSTRUMENTATION_LOG_BYTES = 5 * 1024 * 1024
+    SQL_INSTRUMENTATION_LOG_BACKUPS = 3
+    SQL_INSTRUMENTATION_TOP_N = 10
+    SQL_KEEP_STATEMENT_MS = 1
+    SQL_SLOW_QUERY_MS = 100
+    
+    #most statements one request to an endpoint may issue; a request over budget
+    #is flagged in the profile log and fails the benchmark comparison, which is
+    #how an N+1 (a count that grows with the rows shown) gets caught
+    SQL_STATEMENT_BUDGETS = {
+        'auth.login': 3,
+        'auth.logout': 1,
+        'auth.register': 4,
+        'user.dashboard': 6,
+        'user.book_lot': 10,
+        'user.checkout': 10,
+        'user.payment_options': 3,
+        'user.pay_now': 6,
+        'api.active_reservation': 3,
+        'api.lots': 2,
+        'api.spot_map': 3,
+        'admin.dashboard': 7,
+        'admin.view_bookings': 4,
+        'admin.active_bookings': 2,
+        'admin.due_payments': 7,
+        'admin.earnings_report': 11,
+        'admin.lot_grid': 4,
+        'admin.job_queue': 6,
+        'admin.export_data': 3,
+    }
+
+
+class SQLiteConfig(Config):
+    #WAL lets readers run alongside the single writer, and busy_timeout makes a
+    #writer wait for the lock instead of failing with "database is locked"
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 10000)),
+        "cache_size": -int(os.environ.get("SQLITE_CACHE_KB", 64000)),
+        "temp_store": "MEMORY",
+    }
+    
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "connect_args": {
+            "timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 10000)) / 1000,
+        },
+    }
+
+
+class ServerDBConfig(Config):
+    #for a client/server database (postgres, mysql) given by DATABASE_URL
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+
+
+PROFILES = {
+    "sqlite": SQLiteConfig,
+    "server": ServerDBConfig,
+}
+
+
+def get_config():
+    #PARKSYNC_DB_PROFILE picks a profile; otherwise it follows the DATABASE_URL scheme
+    profile = os.environ.get("PARKSYNC_DB_PROFILE")
+    if not profile:
+        profile = "sqlite" if Config.SQLALCHEMY_DATABASE_URI.startswith("sqlite") else "server"
+    if profile not in PROFILES:
+        raise ValueError(
+            f'unknown PARKSYNC_DB_PROFILE "{profile}", expected one of: {", ".join(sorted(PROFILES))}'
+        )
+    return PROFILES[profile]
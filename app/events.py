@@ -0,0 +1,203 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+from app.extensions import db
+from app.models import ParkingLot
+
+
+#Live spot and lot updates for the grid and dashboards. Routes queue events on
+#the session while they work; they are published only once that transaction
+#commits (and dropped on rollback), so viewers never see a booking that did
+#not happen. The hub fans events out through a backend: LocalBackend keeps
+#everything in this process, and anything with the same publish/subscribe
+#methods (named by EVENT_BACKEND) can replace it for multi-process setups.
+
+
+class Subscription:
+    def __init__(self, backend, channels, max_queue):
+        self.backend = backend
+        self.channels = channels
+        self.queue = queue.Queue(max_queue)
+        self.overflowed = False
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # A viewer that can't keep up is told to reload rather than slowing publishers
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class LocalBackend:
+    def __init__(self, replay_size=256, max_queue=100):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.last_id = 0
+        self.history = deque(maxlen=replay_size)
+        self.subscribers = {}
+        self.max_queue = max_queue
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, channels, payload):
+        with self.lock:
+            event_id = next(self.ids)
+            self.last_id = event_id
+            item = (event_id, payload)
+            self.history.append((event_id, channels, payload))
+            targets = {sub for channel in channels for sub in self.subscribers.get(channel, ())}
+            self.published += 1
+        dropped = 0
+        for subscription in targets:
+            subscription.push(item)
+            if subscription.overflowed:
+                dropped += 1
+        if dropped:
+            with self.lock:
+                self.dropped += dropped
+        return event_id
+
+    def subscribe(self, channels, since=None):
+        subscription = Subscription(self, channels, self.max_queue)
+        with self.lock:
+            # Replay what the client missed since the id it last saw (or since its page rendered)
+            if since is not None:
+                for event_id, event_channels, payload in self.history:
+                    if event_id > since and set(event_channels) & set(channels):
+                        subscription.push((event_id, payload))
+            for channel in channels:
+                self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[channel]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'last_id': self.last_id,
+                'published': self.published,
+                'dropped': self.dropped,
+                'subscribers': len({sub for subs in self.subscribers.values() for sub in subs}),
+            }
+
+
+def init_event_hub(app):
+    backend = app.config.get('EVENT_BACKEND', LocalBackend)
+    if isinstance(backend, str):
+        backend = import_string(backend)
+    hub = backend(
+        replay_size = app.config.get('SSE_REPLAY_SIZE', 256),
+        max_queue = app.config.get('SSE_QUEUE_SIZE', 100)
+    )
+    app.extensions['event_hub'] = hub
+    return hub
+
+
+def get_event_hub():
+    return current_app.extensions.get('event_hub')
+
+
+def last_event_id():
+    hub = get_event_hub()
+    return hub.stats()['last_id'] if hub else 0
+
+
+def lot_channel(lot_id):
+    return f'lot:{lot_id}'
+
+
+def _queue(session, channels, payload):
+    session.info.setdefault('pending_events', []).append((channels, payload))
+
+
+def _lot_counts(lot_id):
+    return db.session.execute(
+        select(ParkingLot.total_spots, ParkingLot.booked_spots, ParkingLot.version)
+        .where(ParkingLot.id == lot_id)
+    ).one_or_none()
+
+
+def spot_changed(spot):
+    #call after the spot and lot counter updates, before commit
+    counts = _lot_counts(spot.lot_id)
+    if counts is None:
+        return
+    total, booked, version = counts
+    _queue(db.session, ('lots', lot_channel(spot.lot_id)), {
+        'type': 'spot',
+        'lot_id': spot.lot_id,
+        'spot_number': spot.spot_number,
+        'is_booked': bool(spot.is_booked),
+        'total': total,
+        'booked': booked,
+        'available': max(total - booked, 0),
+        'version': version,
+    })
+
+
+def lot_changed(lot_id, deleted=False):
+    #resizes and deletions: viewers reload rather than patch individual spots
+    payload = {'type': 'lot', 'lot_id': lot_id, 'deleted': deleted}
+    if not deleted:
+        counts = _lot_counts(lot_id)
+        if counts is not None:
+            total, booked, version = counts
+            payload.update(total=total, booked=booked, available=max(total - booked, 0), version=version)
+    _queue(db.session, ('lots', lot_channel(lot_id)), payload)
+
+
+def sse_stream(subscription, heartbeat=15, retry_ms=3000):
+    #text/event-stream body; holds no database connection while it waits
+    try:
+        yield f'retry: {retry_ms}\n\n'
+        while True:
+            item = subscription.get(timeout=heartbeat)
+            if subscription.overflowed:
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            if item is None:
+                yield ': keepalive\n\n'
+                continue
+            event_id, payload = item
+            yield f'id: {event_id}\nevent: {payload["type"]}\ndata: {json.dumps(payload)}\n\n'
+    finally:
+        subscription.close()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending or not has_app_context():
+        return
+    hub = get_event_hub()
+    if hub is None:
+        return
+    for channels, payload in pending:
+        hub.publish(channels, payload)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop('pending_events', None)
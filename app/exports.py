@@ -0,0 +1,244 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, union_all
+from app.extensions import db
+from app.models import User, ParkingSpot, Reservation, Payment, ArchivedReservation, ArchivedPayment
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+    pq = None
+
+
+#Streaming exports of reservations and payments for finance. Rows are read as
+#plain tuples through a server-side cursor (yield_per) and written out one
+#chunk at a time, so memory stays flat however much history is exported. CSV
+#always works; Parquet and Arrow need pyarrow. Archived history is exported
+#along with the live tables, in the same id order.
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+KINDS = ('reservations', 'payments')
+
+#(name, column, type) for every exported field
+COLUMNS = (
+    ('reservation_id', Reservation.id, 'int'),
+    ('user_id', Reservation.user_id, 'int'),
+    ('username', User.username, 'str'),
+    ('email', User.email, 'str'),
+    ('vehicle_number', Reservation.vehicle_number, 'str'),
+    ('lot_id', ParkingSpot.lot_id, 'int'),
+    ('lot_name', Reservation.lot_name_snapshot, 'str'),
+    ('spot_number', Reservation.spot_number_snapshot, 'int'),
+    ('start_time', Reservation.start_time, 'datetime'),
+    ('end_time', Reservation.end_time, 'datetime'),
+    ('is_active', Reservation.is_active, 'bool'),
+    ('price_per_hour', Reservation.price_per_hour_snapshot, 'float'),
+    ('payment_id', Payment.id, 'int'),
+    ('amount', Payment.amount, 'float'),
+    ('is_paid', Payment.is_paid, 'bool'),
+    ('payment_created_at', Payment.created_at, 'datetime'),
+    ('payment_date', Payment.payment_date, 'datetime'),
+)
+
+#the same fields read from the archive tables, in COLUMNS order
+ARCHIVE_COLUMNS = (
+    ArchivedReservation.id,
+    ArchivedReservation.user_id,
+    User.username,
+    User.email,
+    ArchivedReservation.vehicle_number,
+    ArchivedReservation.lot_id,
+    ArchivedReservation.lot_name_snapshot,
+    ArchivedReservation.spot_number_snapshot,
+    ArchivedReservation.start_time,
+    ArchivedReservation.end_time,
+    ArchivedReservation.is_active,
+    ArchivedReservation.price_per_hour_snapshot,
+    ArchivedPayment.id,
+    ArchivedPayment.amount,
+    ArchivedPayment.is_paid,
+    ArchivedPayment.created_at,
+    ArchivedPayment.payment_date,
+)
+
+
+class ExportError(ValueError):
+    pass
+
+
+def check_format(kind, fmt):
+    if kind not in KINDS:
+        raise ExportError(f'Unknown export "{kind}".')
+    if fmt not in FORMATS:
+        raise ExportError(f'Unknown export format "{fmt}".')
+    if fmt != 'csv' and pa is None:
+        raise ExportError(f'{fmt.title()} export needs pyarrow installed; use CSV instead.')
+
+
+def parse_filters(start=None, end=None, lot_id=None):
+    #dates are YYYY-MM-DD and inclusive; empty values mean no filter
+    filters = {'start': None, 'end': None, 'lot_id': None}
+    try:
+        if start:
+            filters['start'] = datetime.strptime(start, '%Y-%m-%d')
+        if end:
+            filters['end'] = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)
+        if lot_id:
+            filters['lot_id'] = int(lot_id)
+    except ValueError:
+        raise ExportError('Dates must be YYYY-MM-DD and the lot must be a number.')
+    return filters
+
+
+def _live_statement(kind, start, end, lot_id):
+    statement = select(*(column.label(name) for name, column, _ in COLUMNS))
+
+    # Reservations are filtered by start time, payments by when the charge was raised
+    if kind == 'reservations':
+        statement = statement.select_from(Reservation)\
+            .outerjoin(Payment, Payment.reservation_id == Reservation.id)
+        moment = Reservation.start_time
+    else:
+        statement = statement.select_from(Payment)\
+            .join(Reservation, Payment.reservation_id == Reservation.id)
+        moment = Payment.created_at
+
+    statement = statement.join(User, Reservation.user_id == User.id)\
+        .outerjoin(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+
+    if start:
+        statement = statement.where(moment >= start)
+    if end:
+        statement = statement.where(moment < end)
+    if lot_id:
+        statement = statement.where(ParkingSpot.lot_id == lot_id)
+    return statement
+
+
+def _archive_statement(kind, start, end, lot_id):
+    statement = select(*(column.label(name) for (name, _, _), column in zip(COLUMNS, ARCHIVE_COLUMNS)))\
+        .select_from(ArchivedReservation)
+
+    # Every archived reservation has its payment, so both kinds read the same rows
+    statement = statement.join(ArchivedPayment, ArchivedPayment.reservation_id == ArchivedReservation.id)\
+        .join(User, ArchivedReservation.user_id == User.id)
+    moment = ArchivedReservation.start_time if kind == 'reservations' else ArchivedPayment.created_at
+
+    if start:
+        statement = statement.where(moment >= start)
+    if end:
+        statement = statement.where(moment < end)
+    if lot_id:
+        statement = statement.where(ArchivedReservation.lot_id == lot_id)
+    return statement
+
+
+def export_statement(kind, start=None, end=None, lot_id=None):
+    combined = union_all(_live_statement(kind, start, end, lot_id),
+                         _archive_statement(kind, start, end, lot_id)).subquery()
+    order = combined.c.reservation_id if kind == 'reservations' else combined.c.payment_id
+    return select(*(combined.c[name] for name, _, _ in COLUMNS)).order_by(order)
+
+
+def export_filename(kind, fmt, start=None, end=None, lot_id=None):
+    parts = ['parksync', kind]
+    if lot_id:
+        parts.append(f'lot{lot_id}')
+    if start:
+        parts.append(start.strftime('%Y%m%d'))
+    if end:
+        parts.append((end - timedelta(days=1)).strftime('%Y%m%d'))
+    return '-'.join(parts) + '.' + FORMATS[fmt][1]
+
+
+def _row_chunks(kind, chunk_size, filters):
+    statement = export_statement(kind, **filters).execution_options(yield_per=chunk_size)
+    result = db.session.execute(statement)
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in COLUMNS])
+
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    #write-only file that hands back whatever pyarrow has written since the last drain
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema():
+    types = {'int': pa.int64(), 'str': pa.string(), 'float': pa.float64(),
+             'bool': pa.bool_(), 'datetime': pa.timestamp('us')}
+    return pa.schema([(name, types[kind]) for name, _, kind in COLUMNS])
+
+
+def _arrow_chunks(chunks, fmt):
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == 'parquet' else pa.ipc.new_stream(sink, schema)
+
+    # Each chunk becomes one Parquet row group / Arrow record batch
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema)
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(kind, fmt='csv', start=None, end=None, lot_id=None, chunk_size=None):
+    check_format(kind, fmt)
+    chunk_size = chunk_size or current_app.config['EXPORT_CHUNK_SIZE']
+    chunks = _row_chunks(kind, chunk_size, {'start': start, 'end': end, 'lot_id': lot_id})
+
+    if fmt == 'csv':
+        return _csv_chunks(chunks)
+    return _arrow_chunks(chunks, fmt)
@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, render_template
+from markupsafe import Markup
+from werkzeug.utils import import_string
+
+
+#Cache of rendered HTML fragments: the lot cards on both dashboards and the
+#admin summary header. A lot card's key carries the lot's id, creation time and
+#version, and every change that alters a card (book_lot, checkout,
+#update_spots, tariff edits) bumps ParkingLot.version in the same commit, so a
+#changed lot just gets a new key and its old entry ages out. Nothing has to be
+#invalidated, which is what lets several processes share one backend. The
+#creation time keeps a lot that reuses a deleted lot's id from picking up its
+#cards. The summary header also depends on payments and on charges that grow
+#by the minute, so it is keyed by every lot's version and kept for at most
+#FRAGMENT_SUMMARY_TTL seconds. LocalBackend is an in-process LRU bounded by
+#entries and bytes; anything with the same get/set/clear/stats methods (named
+#by FRAGMENT_CACHE_BACKEND) can replace it.
+
+
+class LocalBackend:
+    def __init__(self, max_entries=5000, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < now:
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, expires)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        value, _ = self.entries.pop(key)
+        self.bytes -= len(value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'bytes': self.bytes,
+                'evictions': self.evictions,
+            }
+
+
+class FragmentCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def fetch(self, kind, key, render, ttl=None):
+        #the cached fragment for key, or render() stored under it
+        value = self.backend.get(f'{kind}:{key}')
+        counts = self.misses if value is None else self.hits
+        with self.lock:
+            counts[kind] = counts.get(kind, 0) + 1
+        if value is None:
+            value = str(render())
+            self.backend.set(f'{kind}:{key}', value, ttl)
+        return Markup(value)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self.lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            stats = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                'by_kind': {kind: {'hits': self.hits.get(kind, 0), 'misses': self.misses.get(kind, 0)}
+                            for kind in sorted(set(self.hits) | set(self.misses))},
+            }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def init_fragment_cache(app):
+    backend = app.config.get('FRAGMENT_CACHE_BACKEND', LocalBackend)
+    if not backend:
+        app.extensions['fragment_cache'] = None
+    else:
+        if isinstance(backend, str):
+            backend = import_string(backend)
+        app.extensions['fragment_cache'] = FragmentCache(backend(
+            max_entries = app.config.get('FRAGMENT_CACHE_SIZE', 5000),
+            max_bytes = app.config.get('FRAGMENT_CACHE_BYTES', 16 * 1024 * 1024)
+        ))
+    app.jinja_env.globals['lot_card'] = lot_card
+    return app.extensions['fragment_cache']
+
+
+def get_fragment_cache():
+    return current_app.extensions.get('fragment_cache')
+
+
+def _fetch(kind, key, render, ttl=None):
+    cache = get_fragment_cache()
+    if cache is None:
+        return Markup(render())
+    return cache.fetch(kind, key, render, ttl)
+
+
+def lot_card(template, lot, **context):
+    #a lot's card rendered from template; context values become part of the key
+    variant = ','.join(f'{name}={value}' for name, value in sorted(context.items()))
+    key = f'{template}:{lot.id}:{lot.created_at}:{lot.version}:{variant}'
+    return _fetch('lot_card', key, lambda: render_template(template, lot=lot, **context))
+
+
+def summary_header(template, lots, compute):
+    #template rendered with compute()'s values, which are only worked out on a miss
+    versions = ','.join(f'{lot.id}.{lot.version}' for lot in sorted(lots, key=lambda lot: lot.id))
+    digest = hashlib.sha1(versions.encode()).hexdigest()
+    return _fetch('summary', f'{template}:{digest}', lambda: render_template(template, **compute()),
+                  current_app.config.get('FRAGMENT_SUMMARY_TTL', 15))
@@ -0,0 +1,236 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from flask import current_app, g, has_request_context, request, request_started, request_finished
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from app.extensions import db
+
+
+#SQL statement counting and per-request profiling.
+
+
+class StatementCounter:
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.statements = []
+    
+    @property
+    def count(self):
+        return len(self.statements)
+    
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+    
+    def __enter__(self):
+        self.engine = self.engine or db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+
+@contextmanager
+def assert_max_statements(endpoint, limit=None, engine=None):
+    #fails when the wrapped block (e.g. a test-client request, body read included)
+    #issues more statements than the endpoint's SQL_STATEMENT_BUDGETS entry
+    if limit is None:
+        limit = current_app.config['SQL_STATEMENT_BUDGETS'][endpoint]
+    with StatementCounter(engine) as counter:
+        yield counter
+    
+    if counter.count > limit:
+        listing = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(
+            f"{endpoint} issued {counter.count} SQL statements, limit is {limit}:\n{listing}"
+        )
+
+
+#Opt-in per-request profiling (SQL_INSTRUMENTATION). Cursor events time every
+#statement, Flask signals time template rendering, and each request's totals
+#are folded into per-endpoint stats, written to a rotating JSON-lines log and
+#served at admin.instrumentation. The hot path is a perf_counter() pair and a
+#few additions; SQL text and parameters are only kept for slow statements.
+#Endpoints listed in SQL_STATEMENT_BUDGETS count the requests that went over.
+
+
+class EndpointStats:
+    def __init__(self, top_n, budget=None):
+        self.top_n = top_n
+        self.budget = budget
+        self.over_budget = 0
+        self.requests = 0
+        self.statements = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.max_statements = 0
+        self.max_db_time = 0.0
+        self.slowest = []
+    
+    def add(self, profile):
+        self.requests += 1
+        self.statements += profile['statements']
+        self.db_time += profile['db_time']
+        self.render_time += profile['render_time']
+        self.max_statements = max(self.max_statements, profile['statements'])
+        self.max_db_time = max(self.max_db_time, profile['db_time'])
+        if self.budget is not None and profile['statements'] > self.budget:
+            self.over_budget += 1
+        
+        if profile['slow']:
+            self.slowest = sorted(self.slowest + profile['slow'], key=lambda s: s['ms'], reverse=True)[:self.top_n]
+    
+    def to_dict(self):
+        n = self.requests or 1
+        return {
+            'requests': self.requests,
+            'statements': self.statements,
+            'avg_statements': round(self.statements / n, 2),
+            'max_statements': self.max_statements,
+            'budget': self.budget,
+            'over_budget': self.over_budget,
+            'db_ms': round(self.db_time * 1000, 2),
+            'avg_db_ms': round(self.db_time * 1000 / n, 3),
+            'max_db_ms': round(self.max_db_time * 1000, 3),
+            'avg_render_ms': round(self.render_time * 1000 / n, 3),
+            'slowest': self.slowest,
+        }
+
+
+class RequestProfiler:
+    def __init__(self, app):
+        self.slow_ms = app.config.get('SQL_SLOW_QUERY_MS', 100)
+        self.keep_ms = app.config.get('SQL_KEEP_STATEMENT_MS', 1)
+        self.top_n = app.config.get('SQL_INSTRUMENTATION_TOP_N', 10)
+        self.budgets = app.config.get('SQL_STATEMENT_BUDGETS', {})
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.logger = self._make_logger(app)
+    
+    def _make_logger(self, app):
+        logger = logging.getLogger('parksync.instrumentation')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = RotatingFileHandler(
+                app.config['SQL_INSTRUMENTATION_LOG'],
+                maxBytes = app.config.get('SQL_INSTRUMENTATION_LOG_BYTES', 5 * 1024 * 1024),
+                backupCount = app.config.get('SQL_INSTRUMENTATION_LOG_BACKUPS', 3)
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        return logger
+    
+    def install(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        request_started.connect(self.request_started, app)
+        request_finished.connect(self.request_finished, app)
+        before_render_template.connect(self.before_render, app)
+        template_rendered.connect(self.after_render, app)
+    
+    #sqlalchemy events
+    
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_profile_start', []).append(time.perf_counter())
+    
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['_profile_start'].pop()
+        if not has_request_context() or '_sql_profile' not in g:
+            return
+        
+        profile = g._sql_profile
+        profile['statements'] += 1
+        profile['db_time'] += elapsed
+        
+        ms = elapsed * 1000
+        if ms >= self.keep_ms:
+            profile['slow'].append({
+                'ms': round(ms, 3),
+                'sql': statement,
+                'params': repr(parameters)[:500],
+            })
+    
+    #flask signals
+    
+    def request_started(self, sender, **extra):
+        g._sql_profile = {
+            'started': time.perf_counter(),
+            'statements': 0,
+            'db_time': 0.0,
+            'render_time': 0.0,
+            'slow': [],
+        }
+    
+    def before_render(self, sender, template, context, **extra):
+        if '_sql_profile' in g:
+            g._sql_profile.setdefault('render_started', []).append(time.perf_counter())
+    
+    def after_render(self, sender, template, context, **extra):
+        if '_sql_profile' in g and g._sql_profile.get('render_started'):
+            g._sql_profile['render_time'] += time.perf_counter() - g._sql_profile['render_started'].pop()
+    
+    def request_finished(self, sender, response, **extra):
+        profile = g.get('_sql_profile')
+        if profile is None:
+            return
+        
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        if not response.is_streamed:
+            g.pop('_sql_profile')
+            self.finish(profile, endpoint, method, response.status_code)
+            return
+        
+        # A streamed body (SSE, exports) still runs queries after this signal;
+        # the profile stays on g for them and is closed with the response
+        response.call_on_close(lambda: self.finish(profile, endpoint, method, response.status_code))
+    
+    def finish(self, profile, endpoint, method, status):
+        profile['slow'].sort(key=lambda s: s['ms'], reverse=True)
+        profile['slow'] = profile['slow'][:self.top_n]
+        
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats(self.top_n, self.budgets.get(endpoint))
+            stats.add(profile)
+        
+        total_ms = (time.perf_counter() - profile['started']) * 1000
+        slow = [s for s in profile['slow'] if s['ms'] >= self.slow_ms]
+        self.logger.info(json.dumps({
+            'ts': time.time(),
+            'endpoint': endpoint,
+            'method': method,
+            'status': status,
+            'total_ms': round(total_ms, 3),
+            'statements': profile['statements'],
+            'budget': self.budgets.get(endpoint),
+            'db_ms': round(profile['db_time'] * 1000, 3),
+            'render_ms': round(profile['render_time'] * 1000, 3),
+            'slow_statements': slow,
+        }))
+    
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())}
+    
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+def init_instrumentation(app):
+    if not app.config.get('SQL_INSTRUMENTATION'):
+        return None
+    
+    profiler = RequestProfiler(app)
+    with app.app_context():
+        profiler.install(app, db.engine)
+    app.extensions['request_profiler'] = profiler
+    return profiler
@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update, delete, func, or_, and_
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Job
+
+
+#Local job queue for side effects that don't need to hold up a request.
+#enqueue() adds a Job row to the caller's transaction, so the job exists if
+#and only if the request's own change committed. Workers claim a job with a
+#conditional UPDATE (the same trick spot allocation uses), run its handler
+#and mark it done in the handler's own transaction, so a job's database
+#effects happen once even if it is retried. Failures are retried with
+#exponential backoff up to max_attempts, and a job whose worker died is taken
+#back after JOB_LEASE_SECONDS; a slow worker that lost its lease can no longer
+#mark the job done, so its effects are rolled back instead of applied twice.
+#In-app workers are woken as soon as the enqueuing transaction commits; a
+#separate worker process polls.
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(f):
+        HANDLERS[kind] = f
+        return f
+    return register
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    now = datetime.utcnow()
+    values = {
+        'kind': kind,
+        'payload': json.dumps(payload or {}, sort_keys=True),
+        'idempotency_key': key,
+        'status': 'queued',
+        'attempts': 0,
+        'max_attempts': max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 5),
+        'run_after': now + timedelta(seconds=delay),
+        'created_at': now,
+    }
+
+    db.session.info['jobs_enqueued'] = True
+
+    # A key that is already queued (or done) is silently skipped
+    dialect = db.session.get_bind().dialect.name
+    if key is not None and dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.session.execute(insert(Job).values(**values).on_conflict_do_nothing(index_elements=['idempotency_key']))
+        return
+
+    if key is not None and db.session.execute(select(Job.id).where(Job.idempotency_key == key)).first():
+        return
+    db.session.add(Job(**values))
+
+
+def _claim(worker_name, lease):
+    now = datetime.utcnow()
+    ready = or_(
+        and_(Job.status == 'queued', Job.run_after <= now),
+        and_(Job.status == 'running', Job.started_at < now - timedelta(seconds=lease)),
+    )
+
+    candidates = db.session.execute(
+        select(Job.id, Job.status).where(ready).order_by(Job.run_after, Job.id).limit(5)
+    ).all()
+    for job_id, status in candidates:
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == status, ready)
+            .values(status='running', worker=worker_name, started_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(Job, job_id, populate_existing=True)
+    return None
+
+
+def _still_ours(job_id, worker, started_at):
+    #matches the job only while this claim holds it; a lease takeover changes worker and started_at
+    return (Job.id == job_id, Job.status == 'running', Job.worker == worker, Job.started_at == started_at)
+
+
+def run_job(job):
+    #runs the handler and marks the job done in one transaction
+    job_id, kind, attempts = job.id, job.kind, job.attempts
+    owner = (job.worker, job.started_at)
+    try:
+        handle = HANDLERS.get(kind)
+        if handle is None:
+            raise LookupError(f'no handler for job kind "{kind}"')
+        handle(**job.get_payload())
+        
+        # Only the claim that still holds the job may mark it done; a slow worker
+        # whose lease was taken over throws its effects away
+        done = db.session.execute(
+            update(Job)
+            .where(*_still_ours(job_id, *owner))
+            .values(status='done', finished_at=datetime.utcnow(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        if done.rowcount != 1:
+            db.session.rollback()
+            logger.warning('job %s (%s) attempt %s lost its lease; its effects were rolled back', job_id, kind, attempts)
+            return False
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.warning('job %s (%s) attempt %s failed: %s', job_id, kind, attempts, e)
+
+        job = db.session.execute(
+            select(Job).where(*_still_ours(job_id, *owner)).execution_options(populate_existing=True)
+        ).scalar()
+        if job is None:
+            return False
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            backoff = current_app.config.get('JOB_RETRY_BACKOFF', 2) * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
+        db.session.commit()
+        return False
+
+
+def run_pending(limit=None, worker_name='inline'):
+    #runs ready jobs in the calling thread until none are left (or limit is hit)
+    lease = current_app.config.get('JOB_LEASE_SECONDS', 300)
+    ran = 0
+    while limit is None or ran < limit:
+        job = _claim(worker_name, lease)
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+
+def prune(retention_days):
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    db.session.execute(delete(Job).where(Job.status == 'done', Job.finished_at < cutoff))
+    db.session.commit()
+
+
+class JobWorker:
+    def __init__(self, app, threads=2, poll_interval=1.0):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.workers = []
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def start(self):
+        for number in range(self.threads):
+            thread = threading.Thread(target=self._loop, args=(f'{self.name}:{number}',),
+                                      name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self.workers.append(thread)
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.workers:
+            thread.join(timeout)
+
+    def _loop(self, worker_name):
+        config = self.app.config
+        last_prune = 0
+        while not self.stopping.is_set():
+            # Cleared before looking for work, so a wake-up during the run is not lost
+            self.wakeup.clear()
+            try:
+                with self.app.app_context():
+                    ran = run_pending(limit=100, worker_name=worker_name)
+                    if time.monotonic() - last_prune > 3600:
+                        prune(config.get('JOB_RETENTION_DAYS', 7))
+                        last_prune = time.monotonic()
+            except Exception:
+                logger.exception('job worker %s crashed, restarting loop', worker_name)
+                ran = 0
+            if not ran:
+                self.wakeup.wait(self.poll_interval)
+
+
+def init_jobs(app):
+    #in-app worker threads start with the first request, so CLI commands and
+    #scripts never run jobs; set JOB_WORKER_THREADS = 0 when a separate worker
+    #process (app/models/job_worker.py) does the work
+    threads = app.config.get('JOB_WORKER_THREADS', 2)
+    if not threads:
+        return None
+
+    worker = JobWorker(app, threads, app.config.get('JOB_POLL_INTERVAL', 1.0))
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_job_worker():
+        if not worker.workers:
+            with lock:
+                if not worker.workers:
+                    worker.start()
+
+    app.extensions['job_worker'] = worker
+    return worker
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('jobs_enqueued', False) and has_app_context():
+        worker = current_app.extensions.get('job_worker')
+        if worker is not None:
+            worker.wake()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_enqueued(session, previous_transaction):
+    session.info.pop('jobs_enqueued', None)
+
+
+def queue_stats(sample=500):
+    now = datetime.utcnow()
+    counts = dict(db.session.execute(select(Job.status, func.count(Job.id)).group_by(Job.status)).all())
+    by_kind = db.session.execute(
+        select(Job.kind, Job.status, func.count(Job.id))
+        .where(Job.status.in_(('queued', 'running', 'failed')))
+        .group_by(Job.kind, Job.status)
+        .order_by(Job.kind)
+    ).all()
+    oldest = db.session.execute(select(func.min(Job.created_at)).where(Job.status == 'queued')).scalar()
+
+    # Latency (queued to done) over the most recently finished jobs
+    recent = db.session.execute(
+        select(Job.created_at, Job.started_at, Job.finished_at)
+        .where(Job.status == 'done')
+        .order_by(Job.finished_at.desc())
+        .limit(sample)
+    ).all()
+    latencies = sorted((finished - created).total_seconds() * 1000 for created, _, finished in recent)
+    runtimes = sorted((finished - started).total_seconds() * 1000 for _, started, finished in recent)
+
+    def percentile(values, p):
+        return round(values[min(int(len(values) * p), len(values) - 1)], 1) if values else None
+
+    return {
+        'queued': counts.get('queued', 0),
+        'running': counts.get('running', 0),
+        'done': counts.get('done', 0),
+        'failed': counts.get('failed', 0),
+        'by_kind': [{'kind': kind, 'status': status, 'count': count} for kind, status, count in by_kind],
+        'oldest_queued_s': round((now - oldest).total_seconds(), 1) if oldest else None,
+        'latency_ms': {'p50': percentile(latencies, 0.5), 'p95': percentile(latencies, 0.95),
+                       'max': round(latencies[-1], 1) if latencies else None},
+        'run_ms': {'p50': percentile(runtimes, 0.5), 'p95': percentile(runtimes, 0.95)},
+        'sample': len(recent),
+    }
+
+
+def recent_failures(limit=20):
+    return Job.query.filter_by(status='failed').order_by(Job.finished_at.desc()).limit(limit).all()
+
+
+def retry(job_id):
+    job = Job.query.get_or_404(job_id)
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_after = datetime.utcnow()
+    job.finished_at = None
+    return job
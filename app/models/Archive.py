@@ -0,0 +1,80 @@
+from app.extensions import db
+from sqlalchemy import func
+from app.tariffs import compile_snapshot
+
+#Cold storage for closed, paid reservations and their payments (see app/archive.py).
+#Rows keep the ids they had in the live tables. Snapshots are filled in when a
+#row is archived, and spot_id/lot_id are kept without foreign keys, so archived
+#history never depends on a spot or lot that may be deleted later.
+
+class ArchivedReservation(db.Model):
+    __tablename__ = 'archived_reservation'
+
+    id = db.Column(db.Integer, primary_key = True, autoincrement = False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable = False)
+    spot_id = db.Column(db.Integer, nullable = True)
+    lot_id = db.Column(db.Integer, nullable = True)
+    vehicle_number = db.Column(db.String(20), nullable = False)
+
+    start_time = db.Column(db.DateTime, nullable = False)
+    end_time = db.Column(db.DateTime, nullable = False)
+    is_active = db.Column(db.Boolean, nullable = False, default = False)
+
+    lot_name_snapshot = db.Column(db.String(100))
+    spot_number_snapshot = db.Column(db.Integer)
+    price_per_hour_snapshot = db.Column(db.Float)
+    tariff_snapshot = db.Column(db.Text)
+
+    archived_at = db.Column(db.DateTime, server_default = func.now())
+
+    user = db.relationship('User', lazy = True)
+    payment = db.relationship('ArchivedPayment', backref = 'reservation', uselist = False)
+
+    #the same lookups the live table serves for history: a user's past bookings
+    #by end time and the admin history by start time
+    __table_args__ = (
+        db.Index('ix_archived_reservation_user_end', 'user_id', 'end_time'),
+        db.Index('ix_archived_reservation_start_id', 'start_time', 'id'),
+    )
+
+
+    def calculate_duration_hours(self, now=None):
+        return (self.end_time - self.start_time).total_seconds()/3600
+
+
+    def calculate_cost(self, now=None):
+        if self.tariff_snapshot:
+            return round(compile_snapshot(self.tariff_snapshot).cost(self.start_time, self.end_time))
+        return round(self.calculate_duration_hours() * (self.price_per_hour_snapshot or 0))
+
+
+    def get_lot_name(self):
+        return self.lot_name_snapshot or "Deleted Lot"
+
+
+    def get_spot_number(self):
+        return self.spot_number_snapshot or "Deleted Spot"
+
+
+    def __repr__(self):
+        return f'<ArchivedReservation {self.id}, by user {self.user_id}>'
+
+
+class ArchivedPayment(db.Model):
+    __tablename__ = 'archived_payment'
+
+    id = db.Column(db.Integer, primary_key = True, autoincrement = False)
+    reservation_id = db.Column(db.Integer, db.ForeignKey('archived_reservation.id'), nullable = False)
+    amount = db.Column(db.Float, nullable = False)
+    is_paid = db.Column(db.Boolean, nullable = False, default = True)
+    payment_date = db.Column(db.DateTime, nullable = True)
+    created_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_archived_payment_reservation', 'reservation_id'),
+        db.Index('ix_archived_payment_date', 'payment_date'),
+        db.Index('ix_archived_payment_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedPayment {self.id}, for reservation {self.reservation_id}>'
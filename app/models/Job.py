@@ -0,0 +1,38 @@
+from app.extensions import db
+from sqlalchemy import func
+import json
+
+#Background job queued by a request and run by app.jobs workers. A job row is
+#written in the same transaction as the change that needs it, so it exists
+#exactly when that change committed; idempotency_key stops the same side
+#effect being queued twice.
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key = True, autoincrement = True)
+    kind = db.Column(db.String(50), nullable = False)
+    payload = db.Column(db.Text, nullable = False, default = '{}')
+    idempotency_key = db.Column(db.String(200), nullable = True)
+    
+    #queued -> running -> done, or back to queued for a retry, or failed for good
+    status = db.Column(db.String(20), nullable = False, default = 'queued')
+    attempts = db.Column(db.Integer, nullable = False, default = 0)
+    max_attempts = db.Column(db.Integer, nullable = False, default = 5)
+    last_error = db.Column(db.Text)
+    worker = db.Column(db.String(100))
+    
+    run_after = db.Column(db.DateTime, nullable = False, server_default = func.now())
+    created_at = db.Column(db.DateTime, nullable = False, server_default = func.now())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.UniqueConstraint('idempotency_key', name = 'uq_job_idempotency_key'),
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_job_status_finished', 'status', 'finished_at'),
+    )
+    
+    def get_payload(self):
+        return json.loads(self.payload or '{}')
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
@@ -1,5 +1,6 @@
 from app.extensions import db
-from sqlalchemy import func
+from sqlalchemy import func, select
+from .ParkingSpot import ParkingSpot
 
 class ParkingLot(db.Model):
     id = db.Column(db.Integer, primary_key = True, autoincrement = True)
@@ -8,14 +9,70 @@ class ParkingLot(db.Model):
     price_per_hour = db.Column(db.Float, nullable = False)
     created_at = db.Column (db.DateTime, server_default = func.now())
     
+    #occupancy counter, kept in step with ParkingSpot.is_booked by the booking routes
+    booked_spots = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    
+    #bumped whenever the lot's availability or pricing changes; the API builds ETags from it
+    version = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    
+    #optional time-of-day tariff, a flat price_per_hour applies without one
+    tariff_id = db.Column(db.Integer, db.ForeignKey('tariff.id', ondelete='SET NULL'), nullable = True)
+    
     
     spots = db.relationship('ParkingSpot', backref = 'lot', lazy = True, cascade = 'all, delete-orphan')
     
     def get_available_spots_count(self):
-        return sum(1 for spot in self.spots if not spot.is_booked)
+        return max(self.total_spots - (self.booked_spots or 0), 0)
     
     def get_booked_spots_count(self):
-        return sum(1 for spot in self.spots if spot.is_booked)
+        return self.booked_spots or 0
+    
+    
+    @classmethod
+    def adjust_booked_spots(cls, lot_id, delta):
+        #runs as an UPDATE in the caller's transaction, so it commits (or rolls back) with the spot change
+        cls.query.filter_by(id = lot_id).update(
+            {cls.booked_spots: cls.booked_spots + delta, cls.version: cls.version + 1},
+            synchronize_session = False
+        )
+    
+    
+    @classmethod
+    def bump_version(cls, lot_id):
+        cls.query.filter_by(id = lot_id).update(
+            {cls.version: cls.version + 1},
+            synchronize_session = False
+        )
+    
+    
+    @classmethod
+    def reconcile_counters(cls):
+        #recount booked spots and spot rows per lot and repair any lot whose counters drifted
+        booked = select(func.count(ParkingSpot.id))\
+            .where(ParkingSpot.lot_id == cls.id, ParkingSpot.is_booked == True)\
+            .scalar_subquery()
+        spot_rows = select(func.count(ParkingSpot.id))\
+            .where(ParkingSpot.lot_id == cls.id)\
+            .scalar_subquery()
+        
+        rows = db.session.execute(
+            select(cls.id, cls.name, cls.booked_spots, booked, cls.total_spots, spot_rows)
+            .where((cls.booked_spots != booked) | (cls.total_spots != spot_rows))
+        ).all()
+        
+        repaired = []
+        for lot_id, name, old_booked, new_booked, old_total, new_total in rows:
+            cls.query.filter_by(id = lot_id).update(
+                {cls.booked_spots: new_booked, cls.total_spots: new_total, cls.version: cls.version + 1},
+                synchronize_session = False
+            )
+            repaired.append({
+                'lot_id': lot_id,
+                'name': name,
+                'booked_spots': (old_booked, new_booked),
+                'total_spots': (old_total, new_total),
+            })
+        return repaired
     
     def __repr__(self):
         return f'<ParkingLot {self.name}>'
@@ -23,4 +80,4 @@ class ParkingLot(db.Model):
     
     
     
-    
\ No newline at end of file
+    
@@ -10,6 +10,20 @@ class ParkingSpot(db.Model):
     
     reservations = db.relationship('Reservation', backref = 'spot' , lazy = True)
     
+    #the reservation currently parked here, so the lot grid can load it without the spot's history
+    active_reservation = db.relationship(
+        'Reservation',
+        primaryjoin = 'and_(ParkingSpot.id == Reservation.spot_id, Reservation.is_active == True)',
+        uselist = False,
+        viewonly = True
+    )
+    
+    #grid ordering and lowest-free-spot allocation both walk a lot by spot number
+    __table_args__ = (
+        db.Index('ix_spot_lot_number', 'lot_id', 'spot_number'),
+        db.Index('ix_spot_lot_booked_number', 'lot_id', 'is_booked', 'spot_number'),
+    )
+    
     def __repr__(self):
         return f'<Spot {self.spot_number} in lot {self.lot_id}>'
     
@@ -8,5 +8,10 @@ class Payment(db.Model):
     payment_date = db.Column(db.DateTime, nullable = True)
     created_at = db.Column(db.DateTime, server_default = func.now())
     
+    __table_args__ = (
+        db.Index('ix_payment_paid_date', 'is_paid', 'payment_date'),
+        db.Index('ix_payment_reservation', 'reservation_id'),
+    )
+    
     def __repr__(self):
         return f'<Payment {self.id} - amount {self.amount} Status {self.is_paid}>'
\ No newline at end of file
@@ -1,6 +1,7 @@
 from app.extensions import db
 from sqlalchemy import func
 from .ParkingSpot import ParkingSpot
+from app.tariffs import compile_snapshot
 from datetime import datetime
 
 
@@ -12,7 +13,8 @@ class Reservation(db.Model):
     vehicle_number = db.Column(db.String(20), nullable = False)
     
     
-    start_time = db.Column(db.DateTime, nullable = False, server_default = func.now())
+    #set from Python so SQLite stores it with microseconds, the form keyset cursors compare in
+    start_time = db.Column(db.DateTime, nullable = False, default = datetime.utcnow, server_default = func.now())
     end_time = db.Column(db.DateTime, nullable = True)
     is_active = db.Column(db.Boolean, nullable = False, default = False)
     
@@ -21,6 +23,7 @@ class Reservation(db.Model):
     lot_name_snapshot  = db.Column(db.String(100))
     spot_number_snapshot = db.Column(db.Integer)
     price_per_hour_snapshot = db.Column(db.Float)
+    tariff_snapshot = db.Column(db.Text)
     
     
     #this is required to store the history of spots or lots of parking for, if a lot is deleted, the balance or the amount #earned must not be deleted
@@ -28,15 +31,30 @@ class Reservation(db.Model):
     payment = db.relationship('Payment', backref = 'reservation', uselist = False, cascade = 'all, delete-orphan')
     
     
-    def calculate_duration_hours(self):
-        end = self.end_time or datetime.now()
+    #indexes for the hot lookups: a user's active/previous bookings, the admin
+    #active list ordered by start time, full history ordered by start time and
+    #a spot's active reservation on the lot grid
+    __table_args__ = (
+        db.Index('ix_reservation_user_active_end', 'user_id', 'is_active', 'end_time'),
+        db.Index('ix_reservation_active_start', 'is_active', 'start_time'),
+        db.Index('ix_reservation_start_id', 'start_time', 'id'),
+        db.Index('ix_reservation_spot_active', 'spot_id', 'is_active'),
+    )
+    
+    
+    def calculate_duration_hours(self, now=None):
+        end = self.end_time or now or datetime.now()
         duration = end - self.start_time
         
         return duration.total_seconds()/3600
     
     
-    def calculate_cost(self):
-        hours = self.calculate_duration_hours()
+    def calculate_cost(self, now=None):
+        if self.tariff_snapshot:
+            end = self.end_time or now or datetime.now()
+            return round(compile_snapshot(self.tariff_snapshot).cost(self.start_time, end))
+        
+        hours = self.calculate_duration_hours(now)
         
         if self.price_per_hour_snapshot:
             price = self.price_per_hour_snapshot
@@ -77,6 +95,13 @@ class Reservation(db.Model):
         self.lot_name_snapshot = self.spot.lot.name
         self.spot_number_snapshot = self.spot.spot_number
         self.price_per_hour_snapshot = self.spot.lot.price_per_hour
+        
+        #only new bookings take the lot's tariff, closed ones stay on the price they ran at
+        if self.is_active:
+            with db.session.no_autoflush:
+                tariff = self.spot.lot.tariff
+            if tariff:
+                self.tariff_snapshot = tariff.snapshot(self.spot.lot.price_per_hour)
 
         
         
@@ -0,0 +1,47 @@
+from app.extensions import db
+from sqlalchemy import func
+
+#Incremental revenue/occupancy rollups, written by checkout and pay_now. lot_id
+#is kept without a foreign key so a lot's history survives its deletion; 0 means
+#the lot was already gone when the row was recorded.
+
+class DailyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key = True, autoincrement = True)
+    lot_id = db.Column(db.Integer, nullable = False, default = 0)
+    lot_name = db.Column(db.String(100))
+    day = db.Column(db.Date, nullable = False)
+    
+    revenue = db.Column(db.Float, nullable = False, default = 0)
+    payments = db.Column(db.Integer, nullable = False, default = 0)
+    bookings = db.Column(db.Integer, nullable = False, default = 0)
+    occupancy_hours = db.Column(db.Float, nullable = False, default = 0)
+    updated_at = db.Column(db.DateTime, server_default = func.now(), onupdate = func.now())
+    
+    __table_args__ = (
+        db.UniqueConstraint('lot_id', 'day', name = 'uq_daily_rollup_lot_day'),
+        db.Index('ix_daily_rollup_day', 'day'),
+    )
+    
+    def __repr__(self):
+        return f'<DailyRollup lot {self.lot_id} {self.day}>'
+
+
+class HourlyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key = True, autoincrement = True)
+    lot_id = db.Column(db.Integer, nullable = False, default = 0)
+    lot_name = db.Column(db.String(100))
+    day = db.Column(db.Date, nullable = False)
+    hour = db.Column(db.Integer, nullable = False)
+    
+    revenue = db.Column(db.Float, nullable = False, default = 0)
+    payments = db.Column(db.Integer, nullable = False, default = 0)
+    bookings = db.Column(db.Integer, nullable = False, default = 0)
+    occupancy_hours = db.Column(db.Float, nullable = False, default = 0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('lot_id', 'day', 'hour', name = 'uq_hourly_rollup_lot_day_hour'),
+        db.Index('ix_hourly_rollup_day', 'day', 'hour'),
+    )
+    
+    def __repr__(self):
+        return f'<HourlyRollup lot {self.lot_id} {self.day} {self.hour}:00>'
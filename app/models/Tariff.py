@@ -0,0 +1,31 @@
+from app.extensions import db
+from sqlalchemy import func
+import json
+
+class Tariff(db.Model):
+    id = db.Column(db.Integer, primary_key = True, autoincrement = True)
+    name = db.Column(db.String(100), nullable = False)
+    
+    #JSON list of {"start": "HH:MM", "end": "HH:MM", "rate": price per hour}; hours
+    #outside every band are charged at the lot's price_per_hour
+    bands = db.Column(db.Text, nullable = False, default = '[]')
+    daily_cap = db.Column(db.Float, nullable = True)
+    grace_minutes = db.Column(db.Integer, nullable = False, default = 0)
+    created_at = db.Column(db.DateTime, server_default = func.now())
+    
+    lots = db.relationship('ParkingLot', backref = 'tariff', lazy = True)
+    
+    def get_bands(self):
+        return json.loads(self.bands or '[]')
+    
+    def snapshot(self, default_rate):
+        #frozen copy stored on each reservation, like the other *_snapshot columns
+        return json.dumps({
+            'default_rate': default_rate,
+            'bands': self.get_bands(),
+            'daily_cap': self.daily_cap,
+            'grace_minutes': self.grace_minutes or 0,
+        }, sort_keys = True)
+    
+    def __repr__(self):
+        return f'<Tariff {self.name}>'
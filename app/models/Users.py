@@ -1,7 +1,7 @@
 from app.extensions import db
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import hash_password, verify_password, needs_rehash
 from sqlalchemy import func
 
 
@@ -17,10 +17,14 @@ class User(UserMixin, db.Model):
     reservations = db.relationship("Reservation", backref = "user", lazy = True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        #true when the stored hash was made with other parameters than Config asks for
+        return needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -3,8 +3,12 @@ from .ParkingLot import ParkingLot
 from .ParkingSpot import ParkingSpot
 from .Reservation import Reservation
 from .Payment import  Payment
+from .Tariff import Tariff
+from .Rollups import DailyRollup, HourlyRollup
+from .Job import Job
+from .Archive import ArchivedReservation, ArchivedPayment
 
 
 
-__all__ = ["User", "ParkingLot", "ParkingSpot", "Reservation", "Payment"]
+__all__ = ["User", "ParkingLot", "ParkingSpot", "Reservation", "Payment", "Tariff", "DailyRollup", "HourlyRollup", "Job", "ArchivedReservation", "ArchivedPayment"]
 
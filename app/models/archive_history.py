@@ -0,0 +1,24 @@
+import argparse
+from app import create_app
+from app import archive
+
+def archive_history(argv=None):
+    parser = argparse.ArgumentParser(description="Move closed, paid reservations into the archive tables.")
+    parser.add_argument('--days', type=int, help="archive bookings that ended more than this many days ago")
+    parser.add_argument('--batch-size', type=int, help="reservations moved per transaction")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    
+
+    with app.app_context():
+        print("Archiving settled booking history...")
+
+        moved = archive.archive_closed(after_days=args.days, batch_size=args.batch_size)
+        stats = archive.archive_stats()
+
+        print(f"Archived {moved} reservation(s). Live: {stats['live_reservations']}, "
+              f"archived: {stats['archived_reservations']}.")
+
+if __name__ == '__main__':
+    archive_history()
@@ -0,0 +1,40 @@
+import argparse
+import sys
+from app import create_app
+from app import exports
+
+def export_data(argv=None):
+    parser = argparse.ArgumentParser(description="Stream reservations or payments to CSV, Parquet or Arrow.")
+    parser.add_argument('kind', choices=exports.KINDS)
+    parser.add_argument('--format', default='csv', choices=sorted(exports.FORMATS))
+    parser.add_argument('--start', help="first day to include, YYYY-MM-DD")
+    parser.add_argument('--end', help="last day to include, YYYY-MM-DD")
+    parser.add_argument('--lot', help="only this parking lot id")
+    parser.add_argument('--chunk-size', type=int, help="rows per server-side cursor chunk")
+    parser.add_argument('--output', '-o', help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    
+
+    with app.app_context():
+        try:
+            exports.check_format(args.kind, args.format)
+            filters = exports.parse_filters(args.start, args.end, args.lot)
+        except exports.ExportError as e:
+            parser.error(str(e))
+
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in exports.stream_export(args.kind, args.format, chunk_size=args.chunk_size, **filters):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if args.output:
+                output.close()
+
+        print(f"Exported {args.kind} ({written} bytes).", file=sys.stderr)
+
+if __name__ == '__main__':
+    export_data()
@@ -0,0 +1,27 @@
+import signal
+from app import create_app
+from app.jobs import JobWorker
+
+def run_worker():
+    app = create_app()
+    
+
+    threads = app.config.get('JOB_WORKER_PROCESS_THREADS', 4)
+    worker = JobWorker(app, threads, app.config.get('JOB_POLL_INTERVAL', 1.0))
+
+    print(f"Job worker {worker.name} running with {threads} thread(s). Ctrl+C to stop.")
+    worker.start()
+
+    stop = lambda *args: worker.stopping.set()
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while not worker.stopping.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+
+    print("Stopping job worker...")
+    worker.stop(timeout=30)
+
+if __name__ == '__main__':
+    run_worker()
@@ -0,0 +1,62 @@
+from sqlalchemy.orm import selectinload, joinedload, load_only
+from .ParkingSpot import ParkingSpot
+from .Reservation import Reservation
+from .Payment import Payment
+from .Archive import ArchivedReservation, ArchivedPayment
+
+
+#Named loader profiles: each view asks for exactly the rows its template reads,
+#instead of relying on lazy loads fired row by row from Jinja.
+
+
+def grid_profile():
+    #spots plus only their active reservation: one query for the spots, one for the reservations
+    return (selectinload(ParkingSpot.active_reservation),)
+
+
+def history_profile():
+    #a user's past bookings render from the snapshot columns alone, no joins
+    return (
+        load_only(
+            Reservation.id,
+            Reservation.spot_id,
+            Reservation.vehicle_number,
+            Reservation.start_time,
+            Reservation.end_time,
+            Reservation.is_active,
+            Reservation.lot_name_snapshot,
+            Reservation.spot_number_snapshot,
+            Reservation.price_per_hour_snapshot,
+            Reservation.tariff_snapshot,
+        ),
+    )
+
+
+def booking_list_profile():
+    #admin booking lists show the user and payment status on every row
+    return (
+        joinedload(Reservation.user),
+        joinedload(Reservation.payment),
+    )
+
+
+def payment_list_profile():
+    #payment reports show the reservation and its user on every row
+    return (
+        joinedload(Payment.reservation).joinedload(Reservation.user),
+    )
+
+
+def archive_booking_list_profile():
+    #booking_list_profile for archived rows
+    return (
+        joinedload(ArchivedReservation.user),
+        joinedload(ArchivedReservation.payment),
+    )
+
+
+def archive_payment_list_profile():
+    #payment_list_profile for archived rows
+    return (
+        joinedload(ArchivedPayment.reservation).joinedload(ArchivedReservation.user),
+    )
@@ -0,0 +1,20 @@
+from app import create_app
+from app.warmup import compile_templates
+
+def precompile_templates():
+    app = create_app()
+    
+
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if not directory:
+        print("JINJA_BYTECODE_CACHE_DIR is not set; templates will compile in each process.")
+        return
+
+    print(f"Compiling templates into {directory}...")
+
+    count = compile_templates(app)
+
+    print(f"Compiled {count} template(s).")
+
+if __name__ == '__main__':
+    precompile_templates()
@@ -0,0 +1,65 @@
+from flask import has_request_context, request
+from app.extensions import db
+from app.instrumentation import StatementCounter
+
+
+#EXPLAIN QUERY PLAN check for the queries the routes really run. Statements are
+#captured while traffic goes through the app (python -m benchmarks.run --only
+#query_plans drives the lifecycle and admin scenarios), one per endpoint and
+#distinct SELECT, and each is explained with the parameters it first ran with.
+#A full table scan fails the run unless the table is listed below as one the
+#endpoint is meant to read whole.
+
+#tables with a handful of rows per lot or per day, read whole wherever they are used
+SMALL_TABLES = ('parking_lot', 'daily_rollup', 'tariff')
+
+#endpoints that total or stream every row of a table on purpose
+WHOLE_TABLE_READS = {
+    #summary header totals, kept in the fragment cache
+    'admin.dashboard': ('payment', 'archived_payment'),
+    'admin.due_payments': ('payment', 'archived_payment'),
+    'admin.export_data': ('payment', 'archived_payment', 'reservation', 'archived_reservation'),
+}
+
+
+class StatementCapture(StatementCounter):
+    #distinct SELECTs by endpoint ('background' outside a request), with the
+    #parameters each one first ran with
+    def __init__(self, engine=None):
+        super().__init__(engine)
+        self.selects = {}
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        super()._record(conn, cursor, statement, parameters, context, executemany)
+        if executemany or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        endpoint = (request.endpoint if has_request_context() else None) or 'background'
+        self.selects.setdefault((endpoint, statement), parameters)
+
+
+def explain(statement, parameters=()):
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+
+def scanned_table(detail):
+    #"SCAN reservation" is a full table scan, "SCAN reservation USING INDEX ..." walks an index
+    if detail.startswith('SCAN ') and 'USING' not in detail:
+        return detail.split()[1]
+    return None
+
+
+def check_query_plans(selects):
+    #selects maps (endpoint, statement) to parameters, as StatementCapture collects them
+    results = []
+    for (endpoint, statement), parameters in sorted(selects.items()):
+        plan = explain(statement, parameters)
+        allowed = SMALL_TABLES + WHOLE_TABLE_READS.get(endpoint, ())
+        scans = [table for table in map(scanned_table, plan) if table and table not in allowed]
+        results.append({
+            'endpoint': endpoint,
+            'sql': statement,
+            'plan': plan,
+            'full_scan': bool(scans),
+        })
+    return results
@@ -0,0 +1,27 @@
+from app import create_app
+from app.extensions import db
+from app.models import ParkingLot
+
+def reconcile_occupancy():
+    app = create_app()
+    
+
+    with app.app_context():
+        print("Reconciling parking lot occupancy counters...")
+
+        repaired = ParkingLot.reconcile_counters()
+        db.session.commit()
+
+        if not repaired:
+            print("All lot counters are in sync.")
+            return
+
+        for lot in repaired:
+            old_booked, new_booked = lot['booked_spots']
+            old_total, new_total = lot['total_spots']
+            print(f"  Lot #{lot['lot_id']} ({lot['name']}): "
+                  f"booked {old_booked} -> {new_booked}, total {old_total} -> {new_total}")
+        print(f"Repaired {len(repaired)} lot(s).")
+
+if __name__ == '__main__':
+    reconcile_occupancy()
@@ -0,0 +1,18 @@
+from app import create_app
+from app.extensions import db
+from app import rollups
+
+def backfill_rollups():
+    app = create_app()
+    
+
+    with app.app_context():
+        print("Rebuilding revenue and occupancy rollups from history...")
+
+        bookings, payments = rollups.rebuild()
+        db.session.commit()
+
+        print(f"Rolled up {bookings} closed booking(s) and {payments} paid payment(s).")
+
+if __name__ == '__main__':
+    backfill_rollups()
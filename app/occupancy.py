@@ -0,0 +1,272 @@
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, false, func, select, union_all
+from app.extensions import db
+from app.models import ParkingLot, ParkingSpot, Reservation, ArchivedReservation
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+
+#Occupancy analytics over reservation intervals. Every booking in the window,
+#live or archived, is one [start, end) interval on its lot (still-parked cars
+#run to "now"), read in a single query as epoch seconds. The intervals become
+#+1/-1 events sorted by lot and time, ends before starts at the same instant,
+#and a running sum over them is each lot's concurrency after every event. Its
+#integral, also a running sum, gives the occupied seconds up to any moment, so
+#hourly occupancy is one interpolation at the hour edges and everything else
+#(daily series, peaks, the hour-of-week heatmap) is a bincount or reduce over
+#those arrays. Nothing is queried per hour or per lot, and a year of bookings
+#for every lot is a few array passes. Hours and weekdays are in UTC, like the
+#stored timestamps. Utilisation is against the lot's current total_spots;
+#bookings whose spot was deleted count under lot 0 with no capacity.
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+class OccupancyError(ValueError):
+    pass
+
+
+def _epoch(column):
+    #seconds since 1970-01-01 as a float, worked out in the database
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(column) - 2440587.5) * 86400.0
+    return func.extract('epoch', column)
+
+
+def _seconds(moment):
+    return (moment - datetime(1970, 1, 1)).total_seconds()
+
+
+def _moment(seconds):
+    return datetime(1970, 1, 1) + timedelta(seconds=float(seconds))
+
+
+def interval_statement(since, until, lot_id=None):
+    #lot_id, start, end (epoch seconds) and open for every booking overlapping [since, until)
+    since_param = bindparam('since', since, type_=db.DateTime)
+    until_param = bindparam('until', until, type_=db.DateTime)
+
+    live_lot = func.coalesce(ParkingSpot.lot_id, 0)
+    live = select(
+        live_lot.label('lot_id'),
+        _epoch(Reservation.start_time).label('start'),
+        _epoch(func.coalesce(Reservation.end_time, until_param)).label('end'),
+        Reservation.end_time.is_(None).label('open'),
+    ).select_from(Reservation)\
+        .outerjoin(ParkingSpot, Reservation.spot_id == ParkingSpot.id)\
+        .where(Reservation.start_time < until_param,
+               (Reservation.end_time == None) | (Reservation.end_time > since_param))
+
+    archived_lot = func.coalesce(ArchivedReservation.lot_id, 0)
+    archived = select(
+        archived_lot.label('lot_id'),
+        _epoch(ArchivedReservation.start_time).label('start'),
+        _epoch(ArchivedReservation.end_time).label('end'),
+        false().label('open'),
+    ).where(ArchivedReservation.start_time < until_param, ArchivedReservation.end_time > since_param)
+
+    if lot_id is not None:
+        live = live.where(live_lot == lot_id)
+        archived = archived.where(archived_lot == lot_id)
+    return union_all(live, archived)
+
+
+def load_intervals(since, until, lot_id=None):
+    rows = db.session.execute(interval_statement(since, until, lot_id)).all()
+    columns = tuple(zip(*rows)) or ((), (), (), ())
+    return (np.fromiter(columns[0], np.int64, count=len(rows)),
+            np.fromiter(columns[1], np.float64, count=len(rows)),
+            np.fromiter(columns[2], np.float64, count=len(rows)),
+            np.fromiter(columns[3], bool, count=len(rows)))
+
+
+def sweep(lots, starts, ends, span):
+    #events sorted by (lot, time, ends first) and each lot's concurrency after every event;
+    #times are offsets below span, so lot * span + time orders by lot, then time
+    by_start = np.argsort(lots * span + starts)
+    by_end = np.argsort(lots * span + ends)
+    owners = np.concatenate((lots[by_end], lots[by_start]))
+    times = np.concatenate((ends[by_end], starts[by_start]))
+    # Two sorted runs, ends first: the stable sort only merges them and keeps
+    # ends ahead of starts at the same instant
+    order = np.argsort(owners * span + times, kind='stable')
+    deltas = np.where(order < len(ends), -1, 1)
+    # Every lot's deltas add up to zero, so one running sum restarts at each lot
+    return owners[order], times[order], np.cumsum(deltas)
+
+
+def _occupied_seconds(owners, times, level, span, lot_count, edges):
+    #occupied seconds per lot between consecutive edges (offsets from the window start)
+    # Each lot's events get their own stretch of one axis, so a single
+    # cumulative integral and a single interpolation cover every lot
+    keys = owners * span + times
+    area = np.concatenate(([0.0], np.cumsum(level[:-1] * np.diff(keys)))) if len(keys) else np.zeros(1)
+    keys = keys if len(keys) else np.zeros(1)
+    points = (np.arange(lot_count)[:, None] * span + edges).ravel()
+    return np.diff(np.interp(points, keys, area).reshape(lot_count, len(edges)), axis=1)
+
+
+def _level_at(owners, times, level, span, lot_count, moments):
+    #each lot's concurrency at the given offsets, shape (lots, moments)
+    if not len(times):
+        return np.zeros((lot_count, len(moments)), np.int64)
+    keys = owners * span + times
+    points = (np.arange(lot_count)[:, None] * span + moments).ravel()
+    index = np.searchsorted(keys, points, side='right') - 1
+    found = np.where(index >= 0, level[np.maximum(index, 0)], 0)
+    return found.reshape(lot_count, len(moments))
+
+
+def _hour_of_week(seconds):
+    #0 is Monday 00:00 UTC; 1970-01-01 was a Thursday
+    seconds = seconds.astype(np.int64)
+    return ((seconds // SECONDS_PER_DAY + 3) % 7) * 24 + (seconds % SECONDS_PER_DAY) // SECONDS_PER_HOUR
+
+
+def _group(rows, groups, size):
+    #sums of each row's values by group number, shape (rows, size)
+    offsets = (np.arange(rows.shape[0])[:, None] * size + groups).ravel()
+    return np.bincount(offsets, weights=rows.ravel(), minlength=rows.shape[0] * size).reshape(-1, size)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def _slot_label(slot):
+    return f'{DAY_NAMES[slot // 24]} {slot % 24:02d}:00'
+
+
+def _round(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def analyse(days=365, lot_id=None, until=None):
+    #occupancy of the last `days` days for every lot (or one), from whole hours up to until
+    if np is None:
+        raise OccupancyError('Occupancy analytics need NumPy installed.')
+    until = until or datetime.utcnow()
+    since = (until - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+
+    lot_ids, starts, ends, open_ = load_intervals(since, until, lot_id)
+    origin, finish = _seconds(since), _seconds(until)
+    span = finish - origin + 1
+
+    # Everything works in offsets from the window start, clipped to the window
+    clipped_starts = np.clip(starts - origin, 0, finish - origin)
+    clipped_ends = np.clip(ends - origin, 0, finish - origin)
+    keep = clipped_ends > clipped_starts
+    lot_ids, clipped_starts, clipped_ends = lot_ids[keep], clipped_starts[keep], clipped_ends[keep]
+    dwell, closed = (ends - starts)[keep], ~open_[keep]
+
+    known = ParkingLot.query.order_by(ParkingLot.id)
+    if lot_id is not None:
+        known = known.filter(ParkingLot.id == lot_id)
+    lots = {lot.id: lot for lot in known}
+    ids = np.union1d(np.fromiter(lots, np.int64, count=len(lots)), lot_ids)
+    index = np.searchsorted(ids, lot_ids)
+    capacity = np.array([lots[i].total_spots if i in lots else 0 for i in ids.tolist()], np.float64)
+
+    owners, times, level = sweep(index, clipped_starts, clipped_ends, span)
+
+    # Hourly buckets; the last one ends at `until`
+    edges = np.arange(0, finish - origin, SECONDS_PER_HOUR, dtype=np.float64)
+    edges = np.append(edges, finish - origin)
+    occupied = _occupied_seconds(owners, times, level, span, len(ids), edges)
+    lengths = np.diff(edges)
+    bucket_starts = edges[:-1] + origin
+
+    # Peaks: the highest level per lot and the first event that reached it
+    bookings = np.bincount(index, minlength=len(ids))
+    peak = np.zeros(len(ids), np.int64)
+    np.maximum.at(peak, owners, level)
+    reached = level == peak[owners]
+    first_peak = np.full(len(ids), -1)
+    peak_lots, positions = np.unique(owners[reached], return_index=True)
+    first_peak[peak_lots] = np.flatnonzero(reached)[positions]
+
+    dwell_sum = np.bincount(index[closed], weights=dwell[closed], minlength=len(ids))
+    dwell_count = np.bincount(index[closed], minlength=len(ids))
+    average_dwell = _ratio(dwell_sum, dwell_count.astype(np.float64)) / SECONDS_PER_HOUR
+
+    # Hour-of-week heatmap: occupied time over available spot-time in each slot
+    slots = _hour_of_week(bucket_starts)
+    available = capacity[:, None] * lengths
+    slot_occupied = _group(occupied, slots, 168)
+    slot_available = _group(available, slots, 168)
+    measured = capacity > 0
+    heatmap = _ratio(slot_occupied[measured].sum(axis=0), slot_available[measured].sum(axis=0))
+
+    # Daily series over all the lots shown; a day's peak also counts the cars
+    # already parked at midnight
+    day_numbers = (bucket_starts // SECONDS_PER_DAY).astype(np.int64)
+    first_day = int(day_numbers[0])
+    day_index = day_numbers - first_day
+    day_count = int(day_index[-1]) + 1
+    daily_occupied = _group(occupied, day_index, day_count)
+    daily_length = np.bincount(day_index, weights=lengths, minlength=day_count)
+    if len(ids) == 1:
+        all_times, all_level = times, level
+    else:
+        _, all_times, all_level = sweep(np.zeros(len(index), np.int64), clipped_starts, clipped_ends, span)
+    all_owners = np.zeros(len(all_times), np.int64)
+    midnights = np.maximum((first_day + np.arange(day_count)) * SECONDS_PER_DAY - origin, 0)
+    daily_peak = _level_at(all_owners, all_times, all_level, span, 1, midnights)[0]
+    event_days = np.minimum(((all_times + origin) // SECONDS_PER_DAY).astype(np.int64) - first_day, day_count - 1)
+    np.maximum.at(daily_peak, event_days, all_level)
+
+    total_occupied = occupied.sum(axis=1)
+    total_available = available.sum(axis=1)
+    utilisation = _ratio(total_occupied, total_available)
+    slot_utilisation = _ratio(slot_occupied, slot_available)
+
+    summary = []
+    for position, identifier in enumerate(ids.tolist()):
+        lot = lots.get(identifier)
+        busiest = slot_utilisation[position]
+        summary.append({
+            'lot_id': identifier,
+            'name': lot.name if lot else 'Deleted lot',
+            'capacity': int(capacity[position]),
+            'bookings': int(bookings[position]),
+            'peak': int(peak[position]),
+            'peak_at': _moment(times[first_peak[position]] + origin) if first_peak[position] >= 0 else None,
+            'average_dwell_hours': _round(average_dwell[position]),
+            'occupied_hours': round(float(total_occupied[position]) / SECONDS_PER_HOUR, 1),
+            'utilisation': _round(utilisation[position], 4),
+            'busiest_slot': _slot_label(int(np.nanargmax(busiest))) if not np.all(np.isnan(busiest)) else None,
+        })
+
+    all_peak = int(all_level.max()) if len(all_level) else 0
+    all_daily = daily_occupied.sum(axis=0)
+    daily_available = capacity[measured].sum() * daily_length
+    daily_utilisation = _ratio(daily_occupied[measured].sum(axis=0), daily_available)
+    daily = [{
+        'day': _moment((first_day + number) * SECONDS_PER_DAY).date(),
+        'occupied_hours': round(float(all_daily[number]) / SECONDS_PER_HOUR, 1),
+        'average_occupied': round(float(all_daily[number] / daily_length[number]), 2),
+        'peak': int(daily_peak[number]),
+        'utilisation': _round(daily_utilisation[number], 4),
+    } for number in range(day_count)]
+
+    return {
+        'since': since,
+        'until': until,
+        'days': days,
+        'lot_id': lot_id,
+        'bookings': int(bookings.sum()),
+        'lots': summary,
+        'peak': all_peak,
+        'peak_at': _moment(all_times[int(np.argmax(all_level))] + origin) if all_peak else None,
+        'occupied_hours': round(float(total_occupied.sum()) / SECONDS_PER_HOUR, 1),
+        'utilisation': _round(_ratio(total_occupied[measured].sum(), total_available[measured].sum()), 4),
+        'busiest_slot': _slot_label(int(np.nanargmax(heatmap))) if not np.all(np.isnan(heatmap)) else None,
+        'heatmap': [[_round(heatmap[day * 24 + hour], 4) for hour in range(24)] for day in range(7)],
+        'daily': daily,
+    }
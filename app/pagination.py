@@ -0,0 +1,112 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_, and_
+
+
+#Keyset (cursor) pagination over a (timestamp, id) pair, newest first. Each page
+#is an index range scan that starts where the previous one stopped, so page N
+#costs the same as page 1 however much history is stored.
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    #a malformed cursor just means "start from the first page"
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(query, time_column, id_column, cursor=None, page_size=50):
+    query = query.order_by(time_column.desc(), id_column.desc())
+    
+    position = decode_cursor(cursor)
+    if position and position[0] is not None:
+        query = query.filter(tuple_(time_column, id_column) < tuple_(*position))
+    elif position:
+        # SQLite sorts NULL timestamps last when descending, so only lower ids remain
+        query = query.filter(and_(time_column.is_(None), id_column < position[1]))
+    
+    # Fetch one extra row to know whether another page follows
+    rows = query.limit(page_size + 1).all()
+    items = rows[:page_size]
+    
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+    return KeysetPage(items, next_cursor)
+
+
+def iter_keyset_pages(query, time_column, id_column, page_size=500):
+    #walks the whole result page by page, holding one page in memory at a time
+    cursor = None
+    while True:
+        page = keyset_page(query, time_column, id_column, cursor, page_size)
+        yield page.items
+        if not page.has_next:
+            return
+        cursor = page.next_cursor
+
+
+def iter_keyset(query, time_column, id_column, page_size=500):
+    for items in iter_keyset_pages(query, time_column, id_column, page_size):
+        yield from items
+
+
+#The same pagination over several tables at once (live and archived history).
+#Each table serves its own first page after the cursor from its own index; the
+#newest page_size rows of those are the merged page. Ids must be unique across
+#the tables, which the archive guarantees by keeping the live ids.
+
+
+def _newest_first(row):
+    timestamp, row_id, _ = row
+    return (timestamp is not None, timestamp or datetime.min, row_id)
+
+
+def merged_keyset_page(sources, cursor=None, page_size=50):
+    #sources: (query, time_column, id_column) for each table
+    rows = []
+    more = False
+    for query, time_column, id_column in sources:
+        page = keyset_page(query, time_column, id_column, cursor, page_size)
+        more = more or page.has_next
+        rows.extend((getattr(item, time_column.key), getattr(item, id_column.key), item) for item in page.items)
+    
+    rows.sort(key=_newest_first, reverse=True)
+    more = more or len(rows) > page_size
+    rows = rows[:page_size]
+    
+    next_cursor = None
+    if more and rows:
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+    return KeysetPage([item for _, _, item in rows], next_cursor)
+
+
+def iter_merged_keyset_pages(sources, page_size=500):
+    cursor = None
+    while True:
+        page = merged_keyset_page(sources, cursor, page_size)
+        yield page.items
+        if not page.has_next:
+            return
+        cursor = page.next_cursor
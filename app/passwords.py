@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+#Password hashing with the method and cost taken from Config. Hashing runs in
+#a small per-app thread pool (hashlib releases the GIL), so a login peak can
+#only keep PASSWORD_HASH_WORKERS cores busy and the other requests keep being
+#served while the rest of the logins queue. The pool is created with the app by
+#init_passwords(); outside an app, or before it, hashing runs inline. A hash
+#still waiting for the pool after PASSWORD_HASH_TIMEOUT seconds raises
+#HashingBusy, which is answered like a shed request: 429 with Retry-After.
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+
+def _settings():
+    if not has_app_context():
+        return DEFAULT_METHOD, DEFAULT_SALT_LENGTH
+    config = current_app.config
+    return (config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+            config.get('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH))
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _busy(e):
+    from app.admission import too_many_requests
+    return too_many_requests(current_app.config.get('ADMISSION_RETRY_AFTER', 1))
+
+
+def init_passwords(app):
+    executor = ThreadPoolExecutor(
+        max_workers = app.config.get('PASSWORD_HASH_WORKERS', 4),
+        thread_name_prefix = 'password-hash'
+    )
+    app.extensions['password_hasher'] = executor
+    app.register_error_handler(HashingBusy, _busy)
+    return executor
+
+
+def _executor():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('password_hasher')
+
+
+def _run(fn, *args):
+    executor = _executor()
+    if executor is None:
+        return fn(*args)
+    future = executor.submit(fn, *args)
+    try:
+        return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 30))
+    except FutureTimeout:
+        # A hash still queued is dropped; one already running finishes unused
+        future.cancel()
+        raise HashingBusy()
+
+
+@lru_cache(maxsize=16)
+def hash_prefix(method):
+    #"scrypt" and "scrypt:32768:8:1" name the same parameters; werkzeug writes the
+    #fully expanded form at the front of every hash, so compare against that
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def hash_password(password, method=None):
+    configured, salt_length = _settings()
+    return _run(generate_password_hash, password, method or configured, salt_length)
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    #werkzeug hashes are "method$salt$hash"; the salt is salt_length characters long
+    method, salt_length = _settings()
+    parts = password_hash.split('$', 2)
+    if len(parts) != 3:
+        return True
+    return parts[0] != hash_prefix(method) or len(parts[1]) != salt_length
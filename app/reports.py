@@ -0,0 +1,105 @@
+from datetime import datetime
+from sqlalchemy import func, case, select, bindparam
+from app.extensions import db
+from app.models import ParkingLot, ParkingSpot, Reservation, Payment
+from app.billing import bill
+from app.archive import archived_paid_totals
+
+
+#Financial aggregates for the admin views, computed in the database so memory
+#stays flat however many payments and reservations are stored.
+
+
+def payment_totals():
+    paid = Payment.is_paid == True
+    unpaid = Payment.is_paid == False
+    
+    row = db.session.execute(
+        select(
+            func.coalesce(func.sum(case((paid, Payment.amount), else_=0)), 0),
+            func.count(case((paid, 1))),
+            func.coalesce(func.sum(case((unpaid, Payment.amount), else_=0)), 0),
+            func.count(case((unpaid, 1))),
+        )
+    ).one()
+    
+    # Archived payments are all settled, so they only add to the paid side
+    archived = archived_paid_totals()
+    return {
+        'paid_total': row[0] + archived['paid_total'],
+        'paid_count': row[1] + archived['paid_count'],
+        'unpaid_total': row[2],
+        'unpaid_count': row[3],
+    }
+
+
+def unpaid_totals():
+    row = db.session.execute(
+        select(func.coalesce(func.sum(Payment.amount), 0), func.count(Payment.id))
+        .where(Payment.is_paid == False)
+    ).one()
+    return {'unpaid_total': row[0], 'unpaid_count': row[1]}
+
+
+def hours_since(start, end):
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 24
+    return func.extract('epoch', end - start) / 3600
+
+
+def active_cost_totals(now=None):
+    #mirrors Reservation.calculate_cost: hours since start times the snapshot price,
+    #falling back to the lot's current price when no snapshot was taken
+    now = now or datetime.now()
+    hours = hours_since(Reservation.start_time, bindparam('now', now, type_=db.DateTime))
+    price = func.coalesce(func.nullif(Reservation.price_per_hour_snapshot, 0), ParkingLot.price_per_hour, 0)
+    
+    row = db.session.execute(
+        select(
+            func.count(Reservation.id),
+            func.coalesce(func.sum(func.round(hours * price)), 0),
+        )
+        .select_from(Reservation)
+        .outerjoin(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+        .outerjoin(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+        .where(Reservation.is_active == True, Reservation.tariff_snapshot.is_(None))
+    ).one()
+    
+    # Tariff-priced bookings can't be summed in SQL; there are only as many as occupied spots
+    tariffed = Reservation.query.filter(
+        Reservation.is_active == True,
+        Reservation.tariff_snapshot.isnot(None)
+    ).all()
+    _, tariffed_costs = bill(tariffed, now)
+    
+    return {
+        'active_count': row[0] + len(tariffed),
+        'active_total': row[1] + sum(tariffed_costs),
+    }
+
+
+def financial_summary(now=None):
+    summary = payment_totals()
+    summary.update(active_cost_totals(now))
+    
+    summary['total_earnings'] = summary['paid_total']
+    summary['total_due'] = summary['unpaid_total'] + summary['active_total']
+    summary['total_revenue'] = summary['total_earnings'] + summary['total_due']
+    return summary
+
+
+def earnings_summary(now=None):
+    #same figures as financial_summary, but the paid side comes from the rollup
+    #tables so it does not grow with the payment history
+    from app import rollups
+    
+    totals = rollups.totals()
+    summary = unpaid_totals()
+    summary.update(active_cost_totals(now))
+    
+    summary['paid_total'] = totals['revenue']
+    summary['paid_count'] = totals['payments']
+    summary['total_earnings'] = summary['paid_total']
+    summary['total_due'] = summary['unpaid_total'] + summary['active_total']
+    summary['total_revenue'] = summary['total_earnings'] + summary['total_due']
+    return summary
@@ -0,0 +1,223 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app.extensions import db
+from app.models import DailyRollup, HourlyRollup, Reservation, Payment, Job, ArchivedReservation, ArchivedPayment
+from app import jobs
+
+
+#Incremental per-lot revenue and occupancy rollups. checkout adds a booking and
+#its occupancy-hours (split across the days and hours it covered) and pay_now
+#adds the revenue in the hour it was paid. Both are queued as background jobs
+#keyed by the reservation/payment id, so each is counted once, and applied in
+#the same transaction that marks the job done. The earnings report reads these
+#tables, so its cost depends on how many lots and days there are, not on how
+#many payments were ever taken.
+
+COUNTERS = ('revenue', 'payments', 'bookings', 'occupancy_hours')
+
+
+def _upsert(model, keys, increments, lot_name):
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        _increment_slow(model, keys, increments, lot_name)
+        return
+    
+    values = {counter: 0 for counter in COUNTERS}
+    values.update(increments)
+    statement = insert(table).values(lot_name=lot_name, **keys, **values)
+    updates = {name: table.c[name] + statement.excluded[name] for name in increments}
+    updates['lot_name'] = statement.excluded.lot_name
+    db.session.execute(statement.on_conflict_do_update(index_elements=list(keys), set_=updates))
+
+
+def _increment_slow(model, keys, increments, lot_name):
+    row = model.query.filter_by(**keys).with_for_update().first()
+    if row is None:
+        row = model(lot_name=lot_name, **keys, **{counter: 0 for counter in COUNTERS})
+        db.session.add(row)
+    for name, amount in increments.items():
+        setattr(row, name, getattr(row, name) + amount)
+    row.lot_name = lot_name
+
+
+def _add(lot_id, lot_name, moment, **increments):
+    _upsert(DailyRollup, {'lot_id': lot_id, 'day': moment.date()}, increments, lot_name)
+    _upsert(HourlyRollup, {'lot_id': lot_id, 'day': moment.date(), 'hour': moment.hour}, increments, lot_name)
+
+
+def hour_slices(start, end):
+    #(hour start, hours inside [start, end)) for every clock hour the interval touches
+    cursor = start
+    while cursor < end:
+        next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        stop = min(next_hour, end)
+        yield cursor, (stop - cursor).total_seconds() / 3600
+        cursor = stop
+
+
+def _lot_of(reservation):
+    if isinstance(reservation, ArchivedReservation):
+        return reservation.lot_id or 0, reservation.get_lot_name()
+    lot_id = reservation.spot.lot_id if reservation.spot else 0
+    return lot_id, reservation.get_lot_name()
+
+
+def record_checkout(reservation):
+    lot_id, lot_name = _lot_of(reservation)
+    _add(lot_id, lot_name, reservation.end_time, bookings=1)
+    
+    # Occupancy is spread over the hours the car was actually parked; daily rows
+    # get one upsert per day rather than one per hour
+    days = {}
+    for moment, hours in hour_slices(reservation.start_time, reservation.end_time):
+        _upsert(HourlyRollup, {'lot_id': lot_id, 'day': moment.date(), 'hour': moment.hour},
+                {'occupancy_hours': hours}, lot_name)
+        days[moment.date()] = days.get(moment.date(), 0) + hours
+    for day, hours in days.items():
+        _upsert(DailyRollup, {'lot_id': lot_id, 'day': day}, {'occupancy_hours': hours}, lot_name)
+
+
+def record_payment(payment):
+    lot_id, lot_name = _lot_of(payment.reservation)
+    _add(lot_id, lot_name, payment.payment_date, revenue=payment.amount, payments=1)
+
+
+@jobs.handler('rollups.checkout')
+def _checkout_job(reservation_id):
+    # A booking may have been archived before a backed-up job ran
+    reservation = db.session.get(Reservation, reservation_id) or db.session.get(ArchivedReservation, reservation_id)
+    if reservation is not None and not reservation.is_active and reservation.end_time:
+        record_checkout(reservation)
+
+
+@jobs.handler('rollups.payment')
+def _payment_job(payment_id):
+    payment = db.session.get(Payment, payment_id) or db.session.get(ArchivedPayment, payment_id)
+    if payment is not None and payment.is_paid and payment.payment_date:
+        record_payment(payment)
+
+
+def enqueue_checkout(reservation):
+    jobs.enqueue('rollups.checkout', {'reservation_id': reservation.id}, key=f'rollups.checkout:{reservation.id}')
+
+
+def enqueue_payment(payment):
+    jobs.enqueue('rollups.payment', {'payment_id': payment.id}, key=f'rollups.payment:{payment.id}')
+
+
+def rebuild():
+    #recomputes every rollup from history; for the backfill command. Rollup jobs
+    #not yet done are settled first, since the rebuild already counts their rows.
+    #That includes running ones: their worker can no longer mark them done, so
+    #its increments are rolled back. A failed job keeps its error with a note.
+    Job.query.filter(Job.kind.in_(('rollups.checkout', 'rollups.payment')),
+                     Job.status.in_(('queued', 'running', 'failed')))\
+        .update({
+            Job.status: 'done',
+            Job.finished_at: datetime.utcnow(),
+            Job.last_error: func.coalesce(Job.last_error + ' | ', '') + 'settled by rollups rebuild',
+        }, synchronize_session=False)
+    db.session.query(HourlyRollup).delete()
+    db.session.query(DailyRollup).delete()
+    
+    closed = Reservation.query.filter(Reservation.is_active == False, Reservation.end_time.isnot(None))\
+        .order_by(Reservation.id)
+    bookings = 0
+    for query in (ArchivedReservation.query.order_by(ArchivedReservation.id), closed):
+        for reservation in query.yield_per(1000):
+            record_checkout(reservation)
+            bookings += 1
+    
+    paid = Payment.query.filter(Payment.is_paid == True, Payment.payment_date.isnot(None))\
+        .order_by(Payment.id)
+    archived_paid = ArchivedPayment.query.filter(ArchivedPayment.is_paid == True, ArchivedPayment.payment_date.isnot(None))\
+        .order_by(ArchivedPayment.id)
+    payments = 0
+    for query in (archived_paid, paid):
+        for payment in query.yield_per(1000):
+            record_payment(payment)
+            payments += 1
+    return bookings, payments
+
+
+def totals():
+    row = db.session.execute(
+        select(
+            func.coalesce(func.sum(DailyRollup.revenue), 0),
+            func.coalesce(func.sum(DailyRollup.payments), 0),
+            func.coalesce(func.sum(DailyRollup.bookings), 0),
+            func.coalesce(func.sum(DailyRollup.occupancy_hours), 0),
+        )
+    ).one()
+    return dict(zip(COUNTERS, row))
+
+
+def daily_breakdown(days=30):
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    return db.session.execute(
+        select(
+            DailyRollup.day,
+            func.sum(DailyRollup.revenue).label('revenue'),
+            func.sum(DailyRollup.payments).label('payments'),
+            func.sum(DailyRollup.bookings).label('bookings'),
+            func.sum(DailyRollup.occupancy_hours).label('occupancy_hours'),
+        )
+        .where(DailyRollup.day >= since)
+        .group_by(DailyRollup.day)
+        .order_by(DailyRollup.day.desc())
+    ).all()
+
+
+def hourly_breakdown(days=30):
+    #totals by hour of day (UTC) over the last days, for spotting peak hours
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    return db.session.execute(
+        select(
+            HourlyRollup.hour,
+            func.sum(HourlyRollup.revenue).label('revenue'),
+            func.sum(HourlyRollup.payments).label('payments'),
+            func.sum(HourlyRollup.bookings).label('bookings'),
+            func.sum(HourlyRollup.occupancy_hours).label('occupancy_hours'),
+        )
+        .where(HourlyRollup.day >= since)
+        .group_by(HourlyRollup.hour)
+        .order_by(HourlyRollup.hour)
+    ).all()
+
+
+def monthly_breakdown(months=12):
+    month = func.strftime('%Y-%m', DailyRollup.day) if db.engine.dialect.name == 'sqlite' \
+        else func.to_char(DailyRollup.day, 'YYYY-MM')
+    return db.session.execute(
+        select(
+            month.label('month'),
+            func.sum(DailyRollup.revenue).label('revenue'),
+            func.sum(DailyRollup.payments).label('payments'),
+            func.sum(DailyRollup.bookings).label('bookings'),
+            func.sum(DailyRollup.occupancy_hours).label('occupancy_hours'),
+        )
+        .group_by(month)
+        .order_by(month.desc())
+        .limit(months)
+    ).all()
+
+
+def lot_breakdown():
+    return db.session.execute(
+        select(
+            DailyRollup.lot_id,
+            func.max(DailyRollup.lot_name).label('lot_name'),
+            func.sum(DailyRollup.revenue).label('revenue'),
+            func.sum(DailyRollup.payments).label('payments'),
+            func.sum(DailyRollup.bookings).label('bookings'),
+            func.sum(DailyRollup.occupancy_hours).label('occupancy_hours'),
+        )
+        .group_by(DailyRollup.lot_id)
+        .order_by(func.sum(DailyRollup.revenue).desc())
+    ).all()
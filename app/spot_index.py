@@ -0,0 +1,250 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import ParkingLot, ParkingSpot
+
+
+#In-memory index of free spots per lot, so booking can auto-assign and page
+#through free spots without scanning ParkingSpot. Each lot keeps its free spot
+#numbers in a sorted list: the next free spot is list[0], the first N free
+#spots a slice, and the free spots near number X a bisect plus a walk outwards.
+#The index is only a hint: claim_spot still takes the spot with a conditional
+#UPDATE. A spot whose claim loses a race is dropped, and a lot is reloaded
+#from the database when its entry is older than SPOT_INDEX_TTL or after a
+#resize, which bounds drift from other worker processes.
+
+
+class LotFreeSpots:
+    def __init__(self, rows):
+        #rows are (spot id, spot number) of the lot's free spots
+        self.ids = dict((number, spot_id) for spot_id, number in rows)
+        self.numbers_by_id = dict((spot_id, number) for spot_id, number in rows)
+        self.numbers = sorted(self.ids)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def first(self, count=1, after=0):
+        start = bisect_left(self.numbers, after + 1)
+        return [(number, self.ids[number]) for number in self.numbers[start:start + count]]
+
+    def last_before(self, before, count):
+        end = bisect_left(self.numbers, before)
+        return [(number, self.ids[number]) for number in self.numbers[max(end - count, 0):end]]
+
+    def near(self, target, count):
+        #the count free spots closest to target, returned in spot order
+        right = bisect_left(self.numbers, target)
+        left = right - 1
+        picked = []
+        while len(picked) < count and (left >= 0 or right < len(self.numbers)):
+            if right >= len(self.numbers) or (left >= 0 and target - self.numbers[left] <= self.numbers[right] - target):
+                picked.append(self.numbers[left])
+                left -= 1
+            else:
+                picked.append(self.numbers[right])
+                right += 1
+        return [(number, self.ids[number]) for number in sorted(picked)]
+
+    def discard(self, spot_id):
+        number = self.numbers_by_id.pop(spot_id, None)
+        if number is not None:
+            del self.ids[number]
+            del self.numbers[bisect_left(self.numbers, number)]
+
+    def add(self, number, spot_id):
+        if number not in self.ids:
+            self.ids[number] = spot_id
+            self.numbers_by_id[spot_id] = number
+            insort(self.numbers, number)
+
+
+class FreeSpotIndex:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.lots = {}
+        self.loads = 0
+        self.hits = 0
+
+    def _load(self, lot_id):
+        rows = db.session.execute(
+            select(ParkingSpot.id, ParkingSpot.spot_number)
+            .where(ParkingSpot.lot_id == lot_id, ParkingSpot.is_booked == False)
+        ).all()
+        return LotFreeSpots(rows)
+
+    def lot(self, lot_id):
+        with self.lock:
+            entry = self.lots.get(lot_id)
+            if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+                self.hits += 1
+                return entry
+        # Loaded outside the lock; a concurrent load of the same lot just wins or loses the race
+        entry = self._load(lot_id)
+        with self.lock:
+            self.lots[lot_id] = entry
+            self.loads += 1
+        return entry
+
+    def rebuild(self):
+        #every lot in one pass over the free spots
+        rows = {lot_id: [] for lot_id in db.session.execute(select(ParkingLot.id)).scalars()}
+        for lot_id, spot_id, number in db.session.execute(
+            select(ParkingSpot.lot_id, ParkingSpot.id, ParkingSpot.spot_number)
+            .where(ParkingSpot.is_booked == False)
+        ):
+            rows.setdefault(lot_id, []).append((spot_id, number))
+        
+        lots = {lot_id: LotFreeSpots(free) for lot_id, free in rows.items()}
+        with self.lock:
+            self.lots = lots
+            self.loads += len(lots)
+
+    def next_free(self, lot_id):
+        free = self.lot(lot_id)
+        with self.lock:
+            found = free.first(1)
+        return found[0] if found else None
+
+    def first(self, lot_id, count, after=0):
+        free = self.lot(lot_id)
+        with self.lock:
+            return free.first(count, after)
+
+    def last_before(self, lot_id, before, count):
+        free = self.lot(lot_id)
+        with self.lock:
+            return free.last_before(before, count)
+
+    def near(self, lot_id, target, count):
+        free = self.lot(lot_id)
+        with self.lock:
+            return free.near(target, count)
+
+    def free_count(self, lot_id):
+        free = self.lot(lot_id)
+        with self.lock:
+            return len(free)
+
+    def mark_booked(self, lot_id, spot_id):
+        with self.lock:
+            entry = self.lots.get(lot_id)
+            if entry is not None:
+                entry.discard(spot_id)
+
+    def mark_free(self, lot_id, number, spot_id):
+        with self.lock:
+            entry = self.lots.get(lot_id)
+            if entry is not None:
+                entry.add(number, spot_id)
+
+    def invalidate(self, lot_id):
+        with self.lock:
+            self.lots.pop(lot_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'lots': len(self.lots),
+                'free_spots': sum(len(entry) for entry in self.lots.values()),
+                'loads': self.loads,
+                'hits': self.hits,
+            }
+
+
+def picker_page(lot_id, size, after=None, before=None, near=None):
+    #one page of free spots for the booking picker, with cursors for its neighbours
+    index = get_spot_index()
+    if near is not None:
+        spots = index.near(lot_id, near, size)
+    elif before is not None:
+        spots = index.last_before(lot_id, before, size)
+    else:
+        spots = index.first(lot_id, size, after or 0)
+    
+    has_next = bool(spots) and bool(index.first(lot_id, 1, spots[-1][0]))
+    has_prev = bool(spots) and bool(index.last_before(lot_id, spots[0][0], 1))
+    
+    return {
+        'spots': spots,
+        'next_after': spots[-1][0] if has_next else None,
+        'prev_before': spots[0][0] if has_prev else None,
+    }
+
+
+def init_spot_index(app):
+    index = FreeSpotIndex(ttl = app.config.get('SPOT_INDEX_TTL', 60))
+    app.extensions['spot_index'] = index
+    
+    # Built up front when the schema exists; otherwise (fresh database, migrations) lots load on first use
+    if app.config.get('SPOT_INDEX_WARM', True):
+        with app.app_context():
+            if inspect(db.engine).has_table(ParkingSpot.__tablename__):
+                index.rebuild()
+            # Nothing pooled survives into workers forked after create_app (gunicorn --preload)
+            db.session.remove()
+            db.engine.dispose()
+    return index
+
+
+def get_spot_index():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('spot_index')
+
+
+#Frees and reloads are queued on the session and applied once the transaction
+#commits. A claimed spot leaves the index straight away so concurrent
+#auto-assigns skip it; if that transaction rolls back its lot is reloaded.
+
+def _queue(change):
+    db.session.info.setdefault('spot_index_changes', []).append(change)
+
+
+def spot_claimed(lot_id, spot_id):
+    index = get_spot_index()
+    if index is not None:
+        index.mark_booked(lot_id, spot_id)
+        _queue(('booked', lot_id, None, spot_id))
+
+
+def spot_freed(spot):
+    _queue(('freed', spot.lot_id, spot.spot_number, spot.id))
+
+
+def lot_changed(lot_id):
+    _queue(('reload', lot_id, None, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop('spot_index_changes', None)
+    if not changes:
+        return
+    index = get_spot_index()
+    if index is None:
+        return
+    for kind, lot_id, number, spot_id in changes:
+        if kind == 'booked':
+            index.mark_booked(lot_id, spot_id)
+        elif kind == 'freed':
+            index.mark_free(lot_id, number, spot_id)
+        else:
+            index.invalidate(lot_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    changes = session.info.pop('spot_index_changes', None)
+    index = get_spot_index()
+    if not changes or index is None:
+        return
+    for kind, lot_id, number, spot_id in changes:
+        if kind == 'booked':
+            index.invalidate(lot_id)
@@ -0,0 +1,134 @@
+import json
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+
+#Tariffs: time-of-day rate bands, an optional daily cap and a grace period,
+#compiled into a piecewise-linear table of cumulative cost over one day. The
+#cost of any interval is then a couple of bisects into that table (O(log
+#bands)), whatever its length, and a batch of intervals is evaluated with the
+#same arithmetic over NumPy arrays.
+
+EPOCH = datetime(1970, 1, 1)
+US_PER_HOUR = 3_600 * 1_000_000
+DAY_US = 24 * US_PER_HOUR
+
+
+def to_us(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def parse_clock(value):
+    #"HH:MM" -> microseconds since midnight, "24:00" allowed as the end of the day
+    hours, minutes = value.strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ValueError(f'Invalid time of day: {value}')
+    return (hours * 60 + minutes) * 60 * 1_000_000
+
+
+class CompiledTariff:
+    def __init__(self, breakpoints, rates, daily_cap=None, grace_minutes=0):
+        self.breakpoints = breakpoints
+        self.rates = rates
+        self.daily_cap = daily_cap or None
+        self.grace_us = int(grace_minutes or 0) * 60 * 1_000_000
+        
+        # Cumulative cost at the start of each band
+        self.cumulative = [0.0]
+        for i in range(1, len(breakpoints)):
+            span = breakpoints[i] - breakpoints[i - 1]
+            self.cumulative.append(self.cumulative[-1] + span / US_PER_HOUR * rates[i - 1])
+        last = DAY_US - breakpoints[-1]
+        self.day_cost = self.cumulative[-1] + last / US_PER_HOUR * rates[-1]
+        
+        if np is not None:
+            self._bp = np.array(breakpoints, dtype=np.int64)
+            self._rates = np.array(rates, dtype=np.float64)
+            self._cumulative = np.array(self.cumulative, dtype=np.float64)
+    
+    def _cap(self, amount):
+        return min(amount, self.daily_cap) if self.daily_cap else amount
+    
+    def _prefix(self, offset):
+        #cost from midnight to offset microseconds into the day
+        i = bisect_right(self.breakpoints, offset) - 1
+        return self.cumulative[i] + (offset - self.breakpoints[i]) / US_PER_HOUR * self.rates[i]
+    
+    def cost_us(self, start, end):
+        if end - start <= self.grace_us:
+            return 0.0
+        
+        start_day, start_offset = divmod(start, DAY_US)
+        end_day, end_offset = divmod(end, DAY_US)
+        if start_day == end_day:
+            return self._cap(self._prefix(end_offset) - self._prefix(start_offset))
+        
+        first = self._cap(self.day_cost - self._prefix(start_offset))
+        last = self._cap(self._prefix(end_offset))
+        return first + (end_day - start_day - 1) * self._cap(self.day_cost) + last
+    
+    def cost(self, start_time, end_time):
+        return self.cost_us(to_us(start_time), to_us(end_time))
+    
+    def _prefix_batch(self, offsets):
+        i = np.searchsorted(self._bp, offsets, side='right') - 1
+        return self._cumulative[i] + (offsets - self._bp[i]) / US_PER_HOUR * self._rates[i]
+    
+    def _cap_batch(self, amounts):
+        return np.minimum(amounts, self.daily_cap) if self.daily_cap else amounts
+    
+    def cost_us_batch(self, starts, ends):
+        #same arithmetic as cost_us, elementwise over int64 arrays
+        start_day, start_offset = np.divmod(starts, DAY_US)
+        end_day, end_offset = np.divmod(ends, DAY_US)
+        start_prefix = self._prefix_batch(start_offset)
+        end_prefix = self._prefix_batch(end_offset)
+        
+        same_day = self._cap_batch(end_prefix - start_prefix)
+        first = self._cap_batch(self.day_cost - start_prefix)
+        last = self._cap_batch(end_prefix)
+        spanning = first + (end_day - start_day - 1) * self._cap(self.day_cost) + last
+        
+        costs = np.where(start_day == end_day, same_day, spanning)
+        return np.where(ends - starts <= self.grace_us, 0.0, costs)
+
+
+def compile_spec(spec):
+    #spec: {"default_rate", "bands": [{"start": "HH:MM", "end": "HH:MM", "rate"}], "daily_cap", "grace_minutes"}
+    default_rate = float(spec.get('default_rate') or 0)
+    bands = sorted(
+        (parse_clock(band['start']), parse_clock(band['end']), float(band['rate']))
+        for band in spec.get('bands', [])
+    )
+    
+    breakpoints, rates = [], []
+    cursor = 0
+    for start, end, rate in bands:
+        if end <= start:
+            raise ValueError('A rate band must end after it starts.')
+        if start < cursor:
+            raise ValueError('Rate bands must not overlap.')
+        if start > cursor:
+            breakpoints.append(cursor)
+            rates.append(default_rate)
+        breakpoints.append(start)
+        rates.append(rate)
+        cursor = end
+    if cursor < DAY_US:
+        breakpoints.append(cursor)
+        rates.append(default_rate)
+    
+    return CompiledTariff(breakpoints, rates, spec.get('daily_cap'), spec.get('grace_minutes'))
+
+
+@lru_cache(maxsize=256)
+def compile_snapshot(snapshot):
+    #snapshots are JSON strings, so each distinct tariff is compiled once per process
+    return compile_spec(json.loads(snapshot))
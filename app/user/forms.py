@@ -1,8 +1,8 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, HiddenField, SubmitField
-from wtforms.validators import DataRequired, Length
+from wtforms.validators import DataRequired, Length, Optional
 
 class BookingForm(FlaskForm):
-    spot_id = HiddenField('Spot ID', validators=[DataRequired()])
+    spot_id = HiddenField('Spot ID', validators=[Optional()])
     vehicle_number = StringField('Vehicle Number', validators=[DataRequired(), Length(min=3, max=20)])
     submit = SubmitField('Book Spot')
\ No newline at end of file
@@ -1,8 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, current_app
 from flask_login import login_required, current_user
 from app.extensions import db
-from app.models import ParkingLot, ParkingSpot, Reservation, Payment
+from app.models import ParkingLot, ParkingSpot, Reservation, Payment, loaders
 from app.user.forms import BookingForm
+from app import allocation, rollups, events, spot_index, archive
+from app.billing import apply_billing
 from datetime import datetime
 
 from . import user_bp
@@ -19,6 +21,7 @@ def dashboard():
     
     try:
         # Get all parking lots
+        since = events.last_event_id()
         lots = ParkingLot.query.all()
         
         # Get user's active reservation
@@ -27,19 +30,24 @@ def dashboard():
             is_active=True
         ).first()
         
-        # Get previous reservations
-        previous_reservations = Reservation.query.filter_by(
-            user_id=current_user.id,
-            is_active=False
-        ).order_by(Reservation.end_time.desc()).all()
+        # Get previous reservations, live and archived, one page at a time
+        history = archive.user_history_page(
+            current_user.id,
+            request.args.get('cursor'),
+            current_app.config.get('HISTORY_PAGE_SIZE', 20)
+        )
+        
+        apply_billing(history.items)
         
         return render_template('user_dashboard.html', 
+                             since=since,
                              lots=lots, 
                              active_reservation=active_reservation,
-                             previous_reservations=previous_reservations)
+                             previous_reservations=history.items,
+                             next_cursor=history.next_cursor)
     except Exception as e:
         flash(f'An error occurred: {str(e)}', 'danger')
-        return render_template('user_dashboard.html', lots=[], active_reservation=None, previous_reservations=[])
+        return render_template('user_dashboard.html', since=None, lots=[], active_reservation=None, previous_reservations=[], next_cursor=None)
     
     
     
@@ -68,28 +76,40 @@ def book_lot(lot_id):
         form = BookingForm()
         
         if form.validate_on_submit():
-            spot = ParkingSpot.query.get(form.spot_id.data)
-            if not spot or spot.is_booked:
-                flash('This spot is no longer available.', 'danger')
+            # Claim the chosen spot, or auto-assign the lowest free one
+            spot_id = int(form.spot_id.data) if form.spot_id.data else None
+            try:
+                spot = allocation.claim_spot(lot.id, spot_id)
+            except allocation.SpotUnavailable as e:
+                db.session.rollback()
+                flash(str(e), 'danger')
                 return redirect(url_for('user.book_lot', lot_id=lot_id))
             
             # Create reservation with snapshot
             reservation = Reservation(
                 user_id=current_user.id,
-                spot_id=spot.id,
+                spot=spot,
                 vehicle_number=form.vehicle_number.data,
                 is_active = True
             )
             reservation.save_snapshot()  # Save lot and spot details
-            spot.is_booked = True
             
             db.session.add(reservation)
+            events.spot_changed(spot)
             db.session.commit()
             
             flash(f'Successfully booked Spot {spot.spot_number}!', 'success')
             return redirect(url_for('user.dashboard'))
         
-        return render_template('booking.html', lot=lot, form=form)
+        # Picker: one page of free spots, paged by spot number or centred on ?near=
+        picker = spot_index.picker_page(
+            lot.id, current_app.config.get('BOOKING_PICKER_PAGE_SIZE', 60),
+            after=request.args.get('after', type=int),
+            before=request.args.get('before', type=int),
+            near=request.args.get('near', type=int)
+        )
+        return render_template('booking.html', lot=lot, form=form, picker=picker,
+                               near=request.args.get('near', type=int))
     except Exception as e:
         db.session.rollback()
         flash(f'An error occurred: {str(e)}', 'danger')
@@ -124,8 +144,11 @@ def checkout(reservation_id):
         
         # Free up the spot
         spot = ParkingSpot.query.get(reservation.spot_id)
-        if spot:
+        if spot and spot.is_booked:
             spot.is_booked = False
+            ParkingLot.adjust_booked_spots(spot.lot_id, -1)
+            events.spot_changed(spot)
+            spot_index.spot_freed(spot)
         
         # Calculate payment
         amount = reservation.calculate_cost()
@@ -136,6 +159,9 @@ def checkout(reservation_id):
         )
         
         db.session.add(payment)
+        
+        # Only the state change is committed here; the rollup update runs in the background
+        rollups.enqueue_checkout(reservation)
         db.session.commit()
         
         # Redirect to payment options page
@@ -189,9 +215,14 @@ def pay_now(payment_id):
             flash('Unauthorized access.', 'danger')
             return redirect(url_for('user.dashboard'))
         
+        if payment.is_paid:
+            flash('This payment has already been made.', 'info')
+            return redirect(url_for('user.dashboard'))
+        
         # Mark as paid
         payment.is_paid = True
         payment.payment_date = datetime.utcnow()
+        rollups.enqueue_payment(payment)
         
         db.session.commit()
         
@@ -0,0 +1,113 @@
+import os
+import time
+from contextlib import contextmanager
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from app.extensions import db
+
+
+#Cold start. create_app records how long each of its phases took, and with
+#WARMUP_ON_START it also does the work a new worker would otherwise do on its
+#first requests: every template is compiled (and written to the Jinja bytecode
+#cache under JINJA_BYTECODE_CACHE_DIR, so the next process only unmarshals
+#them), the mappers are configured and the pool opens a few connections,
+#which also initializes the dialect once. Servers that load the app and then
+#fork (gunicorn --preload) run all of this once in the parent; the pool is
+#emptied before the fork and each child drops what it inherited, so workers
+#never share a database connection.
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.finished = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def stats(self):
+        end = self.finished or time.perf_counter()
+        return {
+            'phases_ms': dict(self.phases),
+            'total_ms': round((end - self.started) * 1000, 2),
+            'pid': os.getpid(),
+        }
+
+
+def init_bytecode_cache(app):
+    #must run before the first template is loaded
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    return app.jinja_env.bytecode_cache
+
+
+def compile_templates(app):
+    #loads every template once, from the bytecode cache when it is current; returns how many
+    names = app.jinja_env.list_templates(extensions=('html',))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def prime_pool(app, connections=None):
+    #opens up to `connections` pooled connections at once and hands them back
+    connections = connections or app.config.get('WARMUP_POOL_CONNECTIONS', 4)
+    with app.app_context():
+        engine = db.engine
+    size = getattr(engine.pool, 'size', None)
+    if callable(size):
+        connections = min(connections, size())
+
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            connection.execute(text('SELECT 1'))
+            opened.append(connection)
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+def _forget_inherited_connections(engine):
+    # The parent's sockets and file handles stay with the parent
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def warmup(app, timer=None, pre_fork=True):
+    timer = timer or StartupTimer()
+    with timer.phase('templates'):
+        templates = compile_templates(app)
+    with timer.phase('mappers'):
+        configure_mappers()
+    with timer.phase('pool'):
+        connections = prime_pool(app)
+        if pre_fork:
+            with app.app_context():
+                engine = db.engine
+            engine.dispose()
+            _forget_inherited_connections(engine)
+    return {'templates': templates, 'connections': connections}
+
+
+def startup_stats(app):
+    timer = app.extensions.get('startup')
+    if timer is None:
+        return None
+    stats = timer.stats()
+    stats['warmup'] = app.extensions.get('warmup')
+    return stats
@@ -0,0 +1,13 @@
+#Load-testing and benchmark harness for the booking lifecycle.
+#
+#    python -m benchmarks.run --scale small
+#    python -m benchmarks.run --scale medium --driver wsgi --compare
+#    python -m benchmarks.run --scale small --save-baseline
+#
+#seed.py builds a synthetic dataset (users, lots, spots and months or years of
+#reservation/payment history), scenarios.py drives the real app through
+#register -> login -> book -> checkout -> pay and the admin report pages,
+#micro.py times individual subsystems against the code they replaced (boot.py
+#is its fresh-interpreter worker boot), and
+#report.py prints p50/p95/p99 latency, throughput and SQL statements per
+#endpoint and compares a run against benchmarks/baseline.json.
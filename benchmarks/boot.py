@@ -0,0 +1,90 @@
+import argparse
+import encodings.idna  # noqa: F401 - the test client's first URL would import it inside the timing
+import json
+import os
+import sys
+import time
+
+
+#One worker boot, run in a fresh interpreter by micro.startup:
+#
+#    python -m benchmarks.boot --db /tmp/x/benchmark.db --workdir /tmp/x [--warm] [--cache-dir DIR]
+#
+#Times importing the app package and create_app, then forks the way a
+#pre-forking server does and times the child's first requests to a few
+#template-heavy pages. Prints one JSON object.
+
+FIRST_PAGES = ('/', '/auth/login', '/auth/register')
+
+
+def _first_requests(app):
+    timings = {}
+    client = app.test_client()
+    for url in FIRST_PAGES:
+        started = time.perf_counter()
+        status = client.get(url).status_code
+        timings[url] = (round((time.perf_counter() - started) * 1000, 3), status)
+    started = time.perf_counter()
+    client.get(FIRST_PAGES[-1])
+    timings['repeat'] = (round((time.perf_counter() - started) * 1000, 3), 200)
+    return timings
+
+
+def _in_child(app):
+    #first requests in a forked child, as a pre-forked worker would serve them
+    if not hasattr(os, 'fork'):
+        return _first_requests(app)
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        try:
+            payload = json.dumps(_first_requests(app)).encode()
+        except Exception as e:
+            payload = json.dumps({'error': str(e)}).encode()
+        with os.fdopen(write_end, 'wb') as pipe:
+            pipe.write(payload)
+        os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end, 'rb') as pipe:
+        payload = pipe.read()
+    os.waitpid(pid, 0)
+    return json.loads(payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time one app boot and its first requests.')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--workdir', required=True)
+    parser.add_argument('--warm', action='store_true', help='boot with WARMUP_ON_START')
+    parser.add_argument('--cache-dir', default='', help='JINJA_BYTECODE_CACHE_DIR (empty: none)')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+
+    from .harness import bench_config
+    config = bench_config(args.db, args.workdir, SQL_INSTRUMENTATION=False, JOB_WORKER_THREADS=0,
+                          WARMUP_ON_START=args.warm, JINJA_BYTECODE_CACHE_DIR=args.cache_dir)
+    created = time.perf_counter()
+    app = create_app(config)
+    ready = time.perf_counter()
+
+    first = _in_child(app)
+    if 'error' in first:
+        print(json.dumps(first))
+        return 1
+
+    print(json.dumps({
+        'import_ms': round((imported - started) * 1000, 2),
+        'create_app_ms': round((ready - created) * 1000, 2),
+        'phases_ms': app.extensions['startup'].stats()['phases_ms'],
+        'first_request_ms': {url: ms for url, (ms, _) in first.items()},
+        'statuses_ok': all(status == 200 for _, status in first.values()),
+    }))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import http.client
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from werkzeug.serving import make_server
+from app.config import SQLiteConfig
+
+
+#Plumbing shared by the scenarios: the app config a benchmark runs under, a
+#thread-safe latency recorder, and two drivers that give each virtual user a
+#session with its own cookies. ClientDriver goes through Flask's test client
+#in the calling thread; WSGIDriver serves the app from a threaded werkzeug
+#server and talks HTTP to it, so requests really run concurrently in server
+#threads. Redirects are not followed; scenarios request the next page
+#themselves, so every hop is timed and counted.
+
+
+def bench_config(db_path, workdir, **overrides):
+    class BenchConfig(SQLiteConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(db_path)
+        WTF_CSRF_ENABLED = False
+        SQL_INSTRUMENTATION = True
+        SQL_INSTRUMENTATION_LOG = os.path.join(workdir, 'sql_profile.log')
+        #viewers of abandoned streams notice the closed socket at the next keepalive
+        SSE_HEARTBEAT = 1
+        #every virtual user comes from 127.0.0.1, so per-address buckets would throttle
+        #the whole run; micro.admission switches it on for its own measurements
+        ADMISSION_ENABLED = False
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+    return BenchConfig
+
+
+def percentile(values, p):
+    #nearest rank on sorted values
+    if not values:
+        return None
+    return values[min(max(math.ceil(p * len(values)) - 1, 0), len(values) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.notes = defaultdict(int)
+
+    def record(self, label, seconds, ok=True):
+        with self.lock:
+            self.samples[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def note(self, name, count=1):
+        with self.lock:
+            self.notes[name] += count
+
+    def summary(self, wall):
+        endpoints = {}
+        with self.lock:
+            for label, samples in sorted(self.samples.items()):
+                ms = sorted(s * 1000 for s in samples)
+                endpoints[label] = {
+                    'requests': len(ms),
+                    'errors': self.errors.get(label, 0),
+                    'mean_ms': round(sum(ms) / len(ms), 3),
+                    'p50_ms': round(percentile(ms, 0.50), 3),
+                    'p95_ms': round(percentile(ms, 0.95), 3),
+                    'p99_ms': round(percentile(ms, 0.99), 3),
+                    'max_ms': round(ms[-1], 3),
+                }
+            requests = sum(len(samples) for samples in self.samples.values())
+            return {
+                'wall_s': round(wall, 3),
+                'requests': requests,
+                'errors': sum(self.errors.values()),
+                'throughput_rps': round(requests / wall, 2) if wall else None,
+                'notes': dict(self.notes),
+                'endpoints': endpoints,
+            }
+
+
+class Reply:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', 'replace')
+
+    @property
+    def location(self):
+        #path part only; the test client and werkzeug differ on absolute redirects
+        location = self.headers.get('Location')
+        return urlsplit(location).path if location else None
+
+
+class _Session:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def get(self, label, path, expect=(200,)):
+        return self.request('GET', label, path, None, expect)
+
+    def post(self, label, path, data, expect=(302,)):
+        return self.request('POST', label, path, data, expect)
+
+    def request(self, method, label, path, data, expect):
+        started = time.perf_counter()
+        reply = self._send(method, path, data)
+        self.recorder.record(label, time.perf_counter() - started, reply.status in expect)
+        return reply
+
+    def close(self):
+        pass
+
+
+class ClientSession(_Session):
+    def __init__(self, app, recorder):
+        super().__init__(recorder)
+        self.client = app.test_client()
+
+    def _send(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        payload = response.get_data()
+        #a WSGI server closes the body once it is sent; the profile of a streamed response is kept until then
+        response.close()
+        return Reply(response.status_code, response.headers, payload)
+
+
+class HTTPSession(_Session):
+    def __init__(self, host, port, recorder):
+        super().__init__(recorder)
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def _send(self, method, path, data):
+        headers = {}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        payload = response.read()
+        for header in response.msg.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                if morsel['expires'] and 'Thu, 01 Jan 1970' in morsel['expires']:
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+        return Reply(response.status, response.msg, payload)
+
+    def close(self):
+        self.connection.close()
+
+
+class ClientDriver:
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def start(self):
+        return self
+
+    def session(self, recorder):
+        return ClientSession(self.app, recorder)
+
+    def stop(self):
+        pass
+
+
+class WSGIDriver:
+    name = 'wsgi'
+
+    def __init__(self, app, host='127.0.0.1'):
+        self.app = app
+        self.host = host
+        self.server = None
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_port
+
+    def start(self):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server(self.host, 0, self.app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, name='bench-wsgi', daemon=True)
+        self.thread.start()
+        return self
+
+    def session(self, recorder):
+        return HTTPSession(self.host, self.port, recorder)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+
+DRIVERS = {
+    'client': ClientDriver,
+    'wsgi': WSGIDriver,
+}
+
+
+def run_workers(threads, items, work, recorder):
+    #work(item) for every item across threads; returns the wall time in seconds
+    pending = queue.Queue()
+    for item in items:
+        pending.put(item)
+
+    def loop():
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                work(item)
+            except Exception as e:
+                recorder.note(f'exception: {type(e).__name__}: {e}'[:200])
+
+    workers = [threading.Thread(target=loop, name=f'bench-{number}') for number in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
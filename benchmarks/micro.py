@@ -0,0 +1,939 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select, update
+from app import allocation, archive, billing, create_app, jobs, occupancy, reports, rollups, spot_index
+from app.admin import provisioning
+from app.extensions import db
+from app.instrumentation import StatementCounter
+from app.models import User, ParkingLot, ParkingSpot, Reservation, Payment, Tariff, ArchivedReservation
+from app.models.query_plans import StatementCapture, check_query_plans
+from app.pagination import merged_keyset_page
+from . import scenarios
+from .harness import ClientDriver, Recorder, WSGIDriver, bench_config, percentile, run_workers
+from .seed import ADMIN_EMAIL, ADMIN_PASSWORD, USER_PASSWORD, seed_synthetic, user_email
+
+
+#Benchmarks of single subsystems, each timed against the code it replaced or
+#the load it is meant to absorb. Every function takes the app plus its own
+#sizes and returns a flat dict: keys ending in _ms/_us are lower-is-better,
+#_per_s higher-is-better, 'checks' holds invariants that must stay true and
+#anything else is context. Functions that need their own lot create one and
+#drop it afterwards, so they can run in any order on the seeded database.
+
+
+def _best(fn, repeats=3):
+    #best wall time of fn() in seconds, and its last result
+    best, result = None, None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _mean_us(fn, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return round((time.perf_counter() - started) / calls * 1e6, 2)
+
+
+def _scratch_lot(name, spots, price=10.0):
+    lot = ParkingLot(name=name, total_spots=spots, price_per_hour=price)
+    db.session.add(lot)
+    db.session.flush()
+    provisioning.create_spots(lot.id, 1, spots)
+    db.session.commit()
+    return lot.id
+
+
+def _drop_lot(lot_id):
+    spot_ids = select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id).scalar_subquery()
+    reservation_ids = select(Reservation.id).where(Reservation.spot_id.in_(spot_ids)).scalar_subquery()
+    db.session.execute(delete(Payment).where(Payment.reservation_id.in_(reservation_ids)))
+    db.session.execute(delete(Reservation).where(Reservation.spot_id.in_(spot_ids)))
+    db.session.execute(delete(ParkingSpot).where(ParkingSpot.lot_id == lot_id))
+    db.session.execute(delete(ParkingLot).where(ParkingLot.id == lot_id))
+    spot_index.lot_changed(lot_id)
+    db.session.commit()
+
+
+def double_booking(app, spots=20, threads=16):
+    #every thread races for the same spot, then all auto-assign until the lot is full
+    with app.app_context():
+        lot_id = _scratch_lot('Bench stress', spots)
+        target = db.session.execute(
+            select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id, ParkingSpot.spot_number == 1)
+        ).scalar()
+        user_ids = db.session.execute(
+            select(User.id).where(User.is_admin == False).order_by(User.id).limit(threads)
+        ).scalars().all()
+
+    counts = {'same_spot_wins': 0, 'claims': 0, 'gave_up': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def book(user_id, spot_id=None):
+        spot = allocation.claim_spot(lot_id, spot_id)
+        reservation = Reservation(user_id=user_id, spot=spot, vehicle_number='STRESS', is_active=True)
+        db.session.add(reservation)
+        reservation.save_snapshot()
+        db.session.commit()
+
+    def racer(number):
+        user_id = user_ids[number % len(user_ids)]
+        with app.app_context():
+            barrier.wait()
+            try:
+                book(user_id, target)
+                with lock:
+                    counts['same_spot_wins'] += 1
+            except allocation.SpotUnavailable:
+                db.session.rollback()
+            while True:
+                try:
+                    book(user_id)
+                    with lock:
+                        counts['claims'] += 1
+                except allocation.SpotUnavailable:
+                    # Losing every attempt to other threads is not the same as a full lot
+                    db.session.rollback()
+                    if allocation.lowest_free_spot_id(lot_id) is None:
+                        return
+                    with lock:
+                        counts['gave_up'] += 1
+                except Exception:
+                    db.session.rollback()
+                    with lock:
+                        counts['errors'] += 1
+                    return
+
+    wall = run_workers(threads, range(threads), racer, Recorder())
+
+    with app.app_context():
+        doubled = db.session.execute(
+            select(Reservation.spot_id)
+            .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+            .where(ParkingSpot.lot_id == lot_id, Reservation.is_active == True)
+            .group_by(Reservation.spot_id)
+            .having(func.count(Reservation.id) > 1)
+        ).scalars().all()
+        booked = db.session.execute(
+            select(func.count(ParkingSpot.id)).where(ParkingSpot.lot_id == lot_id, ParkingSpot.is_booked == True)
+        ).scalar()
+        active = db.session.execute(
+            select(func.count(Reservation.id))
+            .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+            .where(ParkingSpot.lot_id == lot_id, Reservation.is_active == True)
+        ).scalar()
+        counter = db.session.get(ParkingLot, lot_id).booked_spots
+        _drop_lot(lot_id)
+
+    claims = counts['claims'] + counts['same_spot_wins']
+    return {
+        'threads': threads,
+        'spots': spots,
+        'claims': claims,
+        'gave_up': counts['gave_up'],
+        'errors': counts['errors'],
+        'wall_ms': round(wall * 1000, 2),
+        'claims_per_s': round(claims / wall, 1),
+        'checks': {
+            'one_winner_for_same_spot': counts['same_spot_wins'] == 1,
+            'no_double_bookings': not doubled,
+            'lot_filled': booked == spots == active,
+            'counter_matches': counter == booked,
+        },
+    }
+
+
+def _renumber_check(spots=200):
+    #a legacy lot whose ids run against its numbers (gaps included) comes out as 1..n
+    lot = ParkingLot(name='renumber', total_spots=spots, price_per_hour=10.0)
+    db.session.add(lot)
+    db.session.flush()
+    numbers = [11, 10, 1] + [3 * number for number in range(spots - 3 + 10, 10, -1)]
+    db.session.execute(insert(ParkingSpot.__table__), [
+        {'lot_id': lot.id, 'spot_number': number, 'is_booked': False} for number in numbers
+    ])
+    provisioning.renumber_spots(lot.id)
+    db.session.commit()
+    renumbered = db.session.execute(
+        select(ParkingSpot.spot_number).where(ParkingSpot.lot_id == lot.id).order_by(ParkingSpot.id)
+    ).scalars().all()
+    expected = {number: rank for rank, number in enumerate(sorted(numbers), 1)}
+    return renumbered == [expected[number] for number in numbers]
+
+
+def provisioning_bench(app, workdir, sizes=(500, 5000)):
+    #ORM add_all loop against the set-based create_spots, on a scratch database
+    path = os.path.join(workdir, 'provisioning.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    scratch = create_app(bench_config(path, workdir, SQL_INSTRUMENTATION=False, SPOT_INDEX_WARM=False,
+                                      JOB_WORKER_THREADS=0))
+
+    result = {}
+    with scratch.app_context():
+        db.create_all()
+        for size in sizes:
+            def orm():
+                lot = ParkingLot(name='orm', total_spots=size, price_per_hour=10.0)
+                db.session.add(lot)
+                db.session.flush()
+                db.session.add_all(ParkingSpot(lot_id=lot.id, spot_number=number, is_booked=False)
+                                   for number in range(1, size + 1))
+                db.session.commit()
+
+            def bulk():
+                lot = ParkingLot(name='bulk', total_spots=size, price_per_hour=10.0)
+                db.session.add(lot)
+                db.session.flush()
+                provisioning.create_spots(lot.id, 1, size)
+                db.session.commit()
+
+            orm_s, _ = _best(orm, 1)
+            bulk_s, _ = _best(bulk, 1)
+            result[f'orm_ms_{size}'] = round(orm_s * 1000, 2)
+            result[f'bulk_ms_{size}'] = round(bulk_s * 1000, 2)
+            result[f'speedup_{size}'] = round(orm_s / bulk_s, 1)
+        result['checks'] = {'renumbered_in_order': _renumber_check()}
+        db.session.remove()
+        db.engine.dispose()
+    return result
+
+
+def user_cache(app, requests=200):
+    #statements and time per authenticated request with the principal cache on and defeated
+    cache = app.extensions['principal_cache']
+    client = app.test_client()
+    client.post('/auth/login', data={'email': user_email(1), 'password': USER_PASSWORD})
+    with app.app_context():
+        engine = db.engine
+
+    def measure(clear):
+        statements = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            if clear:
+                cache.clear()
+            with StatementCounter(engine) as counter:
+                client.get('/api/me/reservation')
+            statements += counter.count
+        return statements / requests, (time.perf_counter() - started) / requests
+
+    uncached_statements, uncached_s = measure(True)
+    cached_statements, cached_s = measure(False)
+    client.get('/auth/logout')
+    return {
+        'cached_statements': round(cached_statements, 2),
+        'uncached_statements': round(uncached_statements, 2),
+        'cached_us': round(cached_s * 1e6, 1),
+        'uncached_us': round(uncached_s * 1e6, 1),
+        'checks': {'cache_saves_a_statement': cached_statements < uncached_statements},
+    }
+
+
+def fragment_cache(app, lots=200, requests=30):
+    #both dashboards with that many lots, rendering every card against serving them from the fragment cache
+    cache = app.extensions['fragment_cache']
+    with app.app_context():
+        lot_ids = [_scratch_lot(f'Bench card {number}', 5) for number in range(lots)]
+
+    admin = app.test_client()
+    admin.post('/auth/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    user = app.test_client()
+    user.post('/auth/login', data={'email': user_email(1), 'password': USER_PASSWORD})
+
+    def measure(client, url, clear):
+        samples, body = [], None
+        for _ in range(requests):
+            if clear:
+                cache.clear()
+            started = time.perf_counter()
+            body = client.get(url).get_data()
+            samples.append((time.perf_counter() - started) * 1000)
+        return sorted(samples), body
+
+    result, same = {}, True
+    for name, client, url in (('admin', admin, '/admin/dashboard'), ('user', user, '/user/dashboard')):
+        cold, cold_body = measure(client, url, True)
+        warm, warm_body = measure(client, url, False)
+        same = same and cold_body == warm_body
+        result[f'{name}_cold_p50_ms'] = round(percentile(cold, 0.5), 3)
+        result[f'{name}_warm_p50_ms'] = round(percentile(warm, 0.5), 3)
+        result[f'{name}_speedup'] = round(percentile(cold, 0.5) / percentile(warm, 0.5), 1)
+
+    # One booking changes one lot's version: one card and the header are rendered again
+    admin.get('/admin/dashboard')
+    with app.app_context():
+        ParkingLot.adjust_booked_spots(lot_ids[0], 1)
+        db.session.commit()
+    before = cache.stats()['by_kind']
+    admin.get('/admin/dashboard')
+    after = cache.stats()['by_kind']
+    stats = cache.stats()
+
+    admin.get('/auth/logout')
+    user.get('/auth/logout')
+    with app.app_context():
+        for lot_id in lot_ids:
+            _drop_lot(lot_id)
+
+    result.update({
+        'lots': lots,
+        'hit_rate': stats['hit_rate'],
+        'cache_kb': round(stats['bytes'] / 1024, 1),
+        'checks': {
+            'cached_pages_match': same,
+            'booking_rerenders_one_card': after['lot_card']['misses'] - before['lot_card']['misses'] == 1,
+            'booking_rerenders_header': after['summary']['misses'] - before['summary']['misses'] == 1,
+        },
+    })
+    return result
+
+
+def _storm(app, lot_id, user_ids):
+    #every user posts a booking for the lot at the same moment; returns (ms, status, retry_after) per request
+    outcomes = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(user_ids))
+
+    def book(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        barrier.wait()
+        started = time.perf_counter()
+        response = client.post(f'/user/book/{lot_id}', data={'vehicle_number': 'STORM1', 'spot_id': ''})
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            outcomes.append((elapsed, response.status_code, response.headers.get('Retry-After')))
+
+    run_workers(len(user_ids), user_ids, book, Recorder())
+    return outcomes
+
+
+def _lot_bookings(lot_id):
+    active = db.session.execute(
+        select(Reservation.spot_id)
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+        .where(ParkingSpot.lot_id == lot_id, Reservation.is_active == True)
+    ).scalars().all()
+    return len(active), len(active) == len(set(active))
+
+
+def admission(app, threads=64):
+    #a booking storm with admission control off and on: latency of the bookings that
+    #go through, how fast the rest are turned away, and the gate counters
+    control = app.extensions['admission']
+    gate = control.gates['user.book_lot']
+    with app.app_context():
+        booked = select(Reservation.user_id).where(Reservation.is_active == True)
+        user_ids = db.session.execute(
+            select(User.id).where(User.is_admin == False, User.id.not_in(booked)).order_by(User.id).limit(threads)
+        ).scalars().all()
+
+    result, distinct = {'threads': len(user_ids)}, True
+    enabled = control.enabled
+    try:
+        for name, on in (('open', False), ('gated', True)):
+            control.enabled = on
+            with app.app_context():
+                lot_id = _scratch_lot(f'Bench storm {name}', len(user_ids))
+            before = gate.stats()
+            outcomes = _storm(app, lot_id, user_ids)
+            after = gate.stats()
+            with app.app_context():
+                bookings, unique = _lot_bookings(lot_id)
+                _drop_lot(lot_id)
+            distinct = distinct and unique
+
+            served = sorted(ms for ms, status, _ in outcomes if status != 429)
+            rejected = [(ms, retry) for ms, status, retry in outcomes if status == 429]
+            result[f'{name}_bookings'] = bookings
+            result[f'{name}_p50_ms'] = round(percentile(served, 0.5), 3)
+            result[f'{name}_p99_ms'] = round(percentile(served, 0.99), 3)
+            result[f'{name}_errors'] = sum(1 for _, status, _ in outcomes if status >= 500)
+            if on:
+                counts = {key: after[key] - before[key] for key in ('admitted', 'queued', 'shed', 'throttled')}
+                result.update({f'gated_{key}': value for key, value in counts.items()})
+                result['gated_max_waiting'] = after['max_waiting']
+                result['gated_rejected'] = len(rejected)
+                result['gated_rejected_p99_ms'] = round(percentile(sorted(ms for ms, _ in rejected), 0.99), 3) \
+                    if rejected else None
+                retry_after_ok = all(retry for _, retry in rejected)
+                counted = counts['admitted'] + counts['shed'] + counts['throttled'] == len(outcomes)
+    finally:
+        control.enabled = enabled
+
+    result['checks'] = {
+        'no_double_bookings': distinct,
+        'rejections_have_retry_after': retry_after_ok,
+        'counters_add_up': counted,
+        'admitted_all_booked': result['gated_bookings'] == result['gated_admitted'],
+    }
+    return result
+
+
+def _method_label(method):
+    #"scrypt:32768:8:1" -> scrypt_32768, "pbkdf2:sha256:600000" -> pbkdf2_600000
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2' and len(parts) > 2:
+        return f'pbkdf2_{parts[2]}'
+    return '_'.join(parts[:2])
+
+
+def password_hashing(app, methods, logins=8, threads=4):
+    #successful logins per second for each hash setting, with concurrent clients
+    original = app.config['PASSWORD_HASH_METHOD']
+    email = user_email(2)
+    result = {}
+    try:
+        for method in methods:
+            app.config['PASSWORD_HASH_METHOD'] = method
+            with app.app_context():
+                User.query.filter_by(email=email).first().set_password(USER_PASSWORD)
+                db.session.commit()
+
+            recorder = Recorder()
+
+            def login(number):
+                client = app.test_client()
+                started = time.perf_counter()
+                response = client.post('/auth/login', data={'email': email, 'password': USER_PASSWORD})
+                recorder.record('login', time.perf_counter() - started, response.status_code == 302)
+
+            wall = run_workers(threads, range(logins), login, recorder)
+            summary = recorder.summary(wall)['endpoints']['login']
+            label = _method_label(method)
+            result[f'{label}_logins_per_s'] = round(logins / wall, 2)
+            result[f'{label}_p50_ms'] = summary['p50_ms']
+            result.setdefault('checks', {})[f'{label}_logins_ok'] = summary['errors'] == 0
+    finally:
+        app.config['PASSWORD_HASH_METHOD'] = original
+        with app.app_context():
+            User.query.filter_by(email=email).first().set_password(USER_PASSWORD)
+            db.session.commit()
+    return result
+
+
+def billing_bench(app, sizes=(10000,)):
+    #batched bill() against Reservation.calculate_cost() one row at a time; every
+    #tenth row predates price snapshots and is priced from its spot's lot
+    now = datetime.utcnow()
+    with app.app_context():
+        tariff = Tariff.query.first()
+        snapshot = tariff.snapshot(20.0) if tariff else None
+        spot_ids = db.session.execute(select(ParkingSpot.id).order_by(ParkingSpot.id).limit(50)).scalars().all()
+
+    largest = max(sizes)
+    reservations = []
+    for number in range(largest):
+        start = now - timedelta(minutes=30 + number % 5000)
+        reservations.append(Reservation(
+            start_time=start,
+            end_time=start + timedelta(minutes=10 + number % 900) if number % 4 else None,
+            spot_id=spot_ids[number % len(spot_ids)],
+            price_per_hour_snapshot=None if number % 10 == 5 else (10.0, 20.0, 40.0)[number % 3],
+            tariff_snapshot=snapshot if number % 3 == 0 else None,
+        ))
+
+    result = {'numpy': billing.np is not None}
+    checks = {}
+    with app.app_context():
+        for size in sizes:
+            rows = reservations[:size]
+            per_row_s, per_row = _best(lambda: [r.calculate_cost(now) for r in rows], 1)
+            batch_s, (_, batch) = _best(lambda: billing.bill(rows, now), 3 if size <= 100000 else 1)
+            result[f'per_row_ms_{size}'] = round(per_row_s * 1000, 2)
+            result[f'batch_ms_{size}'] = round(batch_s * 1000, 2)
+            result[f'speedup_{size}'] = round(per_row_s / batch_s, 1)
+            checks[f'same_costs_{size}'] = per_row == batch
+    result['checks'] = checks
+    return result
+
+
+def earnings(app, repeats=3):
+    #earnings totals from the rollup tables against a scan of every payment
+    with app.app_context():
+        payments = db.session.execute(select(func.count(Payment.id))).scalar()
+        scan_s, scanned = _best(reports.payment_totals, repeats)
+        rollup_s, rolled = _best(rollups.totals, repeats)
+        summary_s, _ = _best(reports.earnings_summary, repeats)
+        daily_s, daily = _best(lambda: rollups.daily_breakdown(app.config['EARNINGS_DAILY_DAYS']), repeats)
+        hourly_s, hourly = _best(lambda: rollups.hourly_breakdown(app.config['EARNINGS_DAILY_DAYS']), repeats)
+    return {
+        'payments': payments,
+        'scan_ms': round(scan_s * 1000, 3),
+        'rollup_ms': round(rollup_s * 1000, 3),
+        'summary_ms': round(summary_s * 1000, 3),
+        'daily_breakdown_ms': round(daily_s * 1000, 3),
+        'hourly_breakdown_ms': round(hourly_s * 1000, 3),
+        'checks': {
+            'hourly_matches_daily': abs(sum(row.revenue for row in hourly) - sum(row.revenue for row in daily)) < 0.01
+                                    and sum(row.bookings for row in hourly) == sum(row.bookings for row in daily),
+            'paid_total_matches': abs(scanned['paid_total'] - rolled['revenue']) < 0.01,
+            'paid_count_matches': scanned['paid_count'] == rolled['payments'],
+        },
+    }
+
+
+def sse_viewers(app, viewers=100):
+    #many open /api/stream/lots connections on the threaded server, then one event to all
+    driver = WSGIDriver(app).start()
+    hub = app.extensions['event_hub']
+    with app.app_context():
+        pool = db.engine.pool
+    sockets = []
+    try:
+        # Streams are for signed-in users; every viewer reuses one session
+        session = driver.session(Recorder())
+        anonymous = session.get('GET api.lots_stream', '/api/stream/lots', expect=(401,)).status
+        session.post('POST auth.login', '/auth/login', {'email': user_email(1), 'password': USER_PASSWORD})
+        cookie = '; '.join(f'{name}={value}' for name, value in session.cookies.items())
+        session.close()
+        request = f'GET /api/stream/lots HTTP/1.1\r\nHost: bench\r\nCookie: {cookie}\r\n\r\n'.encode()
+
+        started = time.perf_counter()
+        for _ in range(viewers):
+            sock = socket.create_connection((driver.host, driver.port), timeout=30)
+            sock.sendall(request)
+            sockets.append(sock)
+        for sock in sockets:
+            sock.recv(4096)
+        connect_s = time.perf_counter() - started
+
+        subscribers = hub.stats()['subscribers']
+        checked_out = pool.checkedout()
+
+        received = []
+        lock = threading.Lock()
+
+        def watch(sock):
+            buffer = b''
+            while b'event: bench' not in buffer:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+            with lock:
+                received.append(time.perf_counter())
+
+        watchers = [threading.Thread(target=watch, args=(sock,), daemon=True) for sock in sockets]
+        for watcher in watchers:
+            watcher.start()
+        published = time.perf_counter()
+        hub.publish(('lots',), {'type': 'bench', 'lot_id': 0})
+        for watcher in watchers:
+            watcher.join(30)
+        delays = sorted((moment - published) * 1000 for moment in received)
+    finally:
+        for sock in sockets:
+            sock.close()
+        driver.stop()
+
+    return {
+        'viewers': viewers,
+        'connect_ms': round(connect_s * 1000, 1),
+        'fanout_p50_ms': round(percentile(delays, 0.5), 2) if delays else None,
+        'fanout_ms': round(delays[-1], 2) if delays else None,
+        'pool_checked_out': checked_out,
+        'checks': {
+            'all_subscribed': subscribers >= viewers,
+            'all_delivered': len(delays) == viewers,
+            'no_connections_held': checked_out == 0,
+            'anonymous_refused': anonymous == 401,
+        },
+    }
+
+
+def spot_index_bench(app, spots=5000, calls=1000):
+    #free-spot index lookups against the database query and the old full-lot booking page
+    page_size = app.config.get('BOOKING_PICKER_PAGE_SIZE', 60)
+    with app.app_context():
+        lot_id = _scratch_lot('Bench index', spots)
+        db.session.execute(
+            update(ParkingSpot)
+            .where(ParkingSpot.lot_id == lot_id, ParkingSpot.spot_number % 4 == 1)
+            .values(is_booked=True)
+        )
+        db.session.commit()
+
+        index = spot_index.get_spot_index()
+        index.invalidate(lot_id)
+        load_s, _ = _best(lambda: index._load(lot_id), 1)
+        index.lot(lot_id)
+
+        expected = allocation.lowest_free_spot_id(lot_id)
+        found = index.next_free(lot_id)
+        result = {
+            'spots': spots,
+            'load_ms': round(load_s * 1000, 2),
+            'next_free_us': _mean_us(lambda: index.next_free(lot_id), calls),
+            'db_next_free_us': _mean_us(lambda: allocation.lowest_free_spot_id(lot_id), max(calls // 5, 1)),
+            'page_us': _mean_us(lambda: spot_index.picker_page(lot_id, page_size), calls),
+            'near_page_us': _mean_us(lambda: spot_index.picker_page(lot_id, page_size, near=spots // 2), calls),
+        }
+        full_s, _ = _best(lambda: ParkingSpot.query.filter_by(lot_id=lot_id).order_by(ParkingSpot.spot_number).all())
+        result['full_lot_ms'] = round(full_s * 1000, 2)
+        result['checks'] = {'index_agrees_with_db': found is not None and found[1] == expected}
+        _drop_lot(lot_id)
+    return result
+
+
+def _count_jobs(*statuses):
+    return db.session.execute(select(func.count(jobs.Job.id)).where(jobs.Job.status.in_(statuses))).scalar()
+
+
+def _wait_for_jobs(timeout=120):
+    deadline = time.perf_counter() + timeout
+    while _count_jobs('queued', 'running') and time.perf_counter() < deadline:
+        time.sleep(0.02)
+
+
+@jobs.handler('bench.noop')
+def _noop(number=0):
+    pass
+
+
+def job_queue(app, checkouts=100, count=500):
+    #checkout with the rollup update inline against enqueued, then queue throughput
+    worker = app.extensions.get('job_worker')
+    if worker is not None and not worker.workers:
+        worker.start()
+
+    now = datetime.utcnow()
+    with app.app_context():
+        user_id = db.session.execute(select(User.id).where(User.is_admin == False).limit(1)).scalar()
+        first_id = (db.session.execute(select(func.max(Reservation.id))).scalar() or 0) + 1
+        # Closed reservations with no spot, so rollups file them under the "deleted lot" row
+        db.session.execute(insert(Reservation.__table__), [
+            {'id': first_id + number, 'user_id': user_id, 'spot_id': None, 'vehicle_number': 'JOBS',
+             'start_time': now - timedelta(hours=3), 'end_time': now, 'is_active': False,
+             'lot_name_snapshot': 'Bench jobs', 'spot_number_snapshot': number + 1, 'price_per_hour_snapshot': 10.0}
+            for number in range(checkouts * 2)
+        ])
+        db.session.commit()
+        reservations = Reservation.query.filter(Reservation.id >= first_id).order_by(Reservation.id).all()
+
+        def timed(items, fn):
+            samples = []
+            for reservation in items:
+                started = time.perf_counter()
+                fn(reservation)
+                db.session.commit()
+                samples.append((time.perf_counter() - started) * 1000)
+            return sorted(samples)
+
+        # Commits don't wake the workers while timing, so their writes stay out of the way
+        app.extensions.pop('job_worker', None)
+        try:
+            inline = timed(reservations[:checkouts], rollups.record_checkout)
+            queued = timed(reservations[checkouts:], rollups.enqueue_checkout)
+        finally:
+            if worker is not None:
+                app.extensions['job_worker'] = worker
+                worker.wake()
+
+        _wait_for_jobs()
+        before = _count_jobs('done')
+        started = time.perf_counter()
+        for number in range(count):
+            jobs.enqueue('bench.noop', {'number': number})
+        db.session.commit()
+        _wait_for_jobs()
+        wall = time.perf_counter() - started
+        done = _count_jobs('done')
+        stats = jobs.queue_stats(sample=count)
+
+    return {
+        'inline_checkout_p50_ms': round(percentile(inline, 0.5), 3),
+        'enqueue_checkout_p50_ms': round(percentile(queued, 0.5), 3),
+        'inline_checkout_p95_ms': round(percentile(inline, 0.95), 3),
+        'enqueue_checkout_p95_ms': round(percentile(queued, 0.95), 3),
+        'jobs': count,
+        'jobs_per_s': round((done - before) / wall, 1),
+        'queue_latency_p50_ms': stats['latency_ms']['p50'],
+        'queue_latency_p95_ms': stats['latency_ms']['p95'],
+        'checks': {'all_jobs_done': done - before == count, 'no_failed_jobs': stats['failed'] == 0},
+    }
+
+
+def _booking_cycle(user_id, lot_id):
+    #book, dashboard history, checkout and pay, as the user routes do them
+    spot = allocation.claim_spot(lot_id)
+    reservation = Reservation(user_id=user_id, spot=spot, vehicle_number='GROWTH', is_active=True)
+    db.session.add(reservation)
+    reservation.save_snapshot()
+    db.session.commit()
+
+    archive.user_history_page(user_id, None, 20)
+
+    reservation.end_time = datetime.utcnow()
+    reservation.is_active = False
+    spot.is_booked = False
+    ParkingLot.adjust_booked_spots(lot_id, -1)
+    spot_index.spot_freed(spot)
+    payment = Payment(reservation_id=reservation.id, amount=reservation.calculate_cost(), is_paid=False)
+    db.session.add(payment)
+    rollups.enqueue_checkout(reservation)
+    db.session.commit()
+
+    payment.is_paid = True
+    payment.payment_date = datetime.utcnow()
+    rollups.enqueue_payment(payment)
+    db.session.commit()
+
+
+def _keyset_check(rows=125, page_size=50):
+    #bookings that all start in one second page through live and archived history once each
+    lot_id = _scratch_lot('keyset', 1)
+    spot_id = db.session.execute(select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)).scalar()
+    user_id = db.session.execute(select(User.id).order_by(User.id)).scalars().first()
+    db.session.execute(insert(Reservation.__table__),
+                       [{'user_id': user_id, 'spot_id': spot_id, 'vehicle_number': 'KEYSET', 'is_active': False}
+                        for _ in range(rows)])
+    db.session.commit()
+    try:
+        # Stored in the form a cursor binds, then all moved to the same instant
+        long_form = db.session.execute(select(func.min(func.length(Reservation.start_time)))
+                                       .where(Reservation.spot_id == spot_id)).scalar() == 26
+        db.session.execute(update(Reservation).where(Reservation.spot_id == spot_id)
+                           .values(start_time=datetime.utcnow().replace(microsecond=0) - timedelta(days=1)))
+        expected = set(db.session.execute(select(Reservation.id).where(Reservation.spot_id == spot_id)).scalars())
+        sources = [
+            (Reservation.query.filter_by(spot_id=spot_id), Reservation.start_time, Reservation.id),
+            (ArchivedReservation.query.filter_by(spot_id=spot_id), ArchivedReservation.start_time, ArchivedReservation.id),
+        ]
+        seen, cursor = [], None
+        for _ in range(rows // page_size + 2):
+            page = merged_keyset_page(sources, cursor, page_size)
+            seen.extend(item.id for item in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        return long_form and len(seen) == len(set(seen)) and set(seen) == expected and not page.has_next
+    finally:
+        db.session.rollback()
+        _drop_lot(lot_id)
+
+
+def archive_growth(app, workdir, history_days=(60, 240), reservations_per_day=20, keep_days=30, cycles=50):
+    #booking cycle and history page as settled history grows, with everything in
+    #the live tables and again after archive_closed leaves keep_days behind
+    path = os.path.join(workdir, 'archive.db')
+    result = {}
+    live_after, preserved = [], True
+    for days in history_days:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        scratch = create_app(bench_config(path, workdir, SQL_INSTRUMENTATION=False, SPOT_INDEX_WARM=False,
+                                          JOB_WORKER_THREADS=0))
+        with scratch.app_context():
+            seed_synthetic(users=100, lots=4, spots_per_lot=100, history_days=days,
+                           reservations_per_day=reservations_per_day, occupancy=0.3, paid_ratio=1.0,
+                           progress=lambda message: None)
+            lot_ids = db.session.execute(select(ParkingLot.id).order_by(ParkingLot.id)).scalars().all()
+            user_ids = db.session.execute(
+                select(User.id).where(User.is_admin == False).order_by(User.id)).scalars().all()
+
+            def timed():
+                cycle, history = [], []
+                for number in range(cycles):
+                    user_id = user_ids[number % len(user_ids)]
+                    started = time.perf_counter()
+                    _booking_cycle(user_id, lot_ids[number % len(lot_ids)])
+                    cycle.append((time.perf_counter() - started) * 1000)
+                    started = time.perf_counter()
+                    archive.user_history_page(user_id, None, 20)
+                    history.append((time.perf_counter() - started) * 1000)
+                return sorted(cycle), sorted(history)
+
+            def history_count(user_id):
+                page = archive.user_history_page(user_id, None, 500)
+                counted = len(page.items)
+                while page.has_next:
+                    page = archive.user_history_page(user_id, page.next_cursor, 500)
+                    counted += len(page.items)
+                return counted
+
+            live_before = db.session.execute(select(func.count(Reservation.id))).scalar()
+            cycle, history = timed()
+            counted = history_count(user_ids[0])
+
+            started = time.perf_counter()
+            moved = archive.archive_closed(after_days=keep_days)
+            archive_s = time.perf_counter() - started
+            live = db.session.execute(select(func.count(Reservation.id))).scalar()
+            preserved = preserved and history_count(user_ids[0]) == counted
+            archived_cycle, archived_history = timed()
+
+            result[f'live_rows_{days}d'] = live_before
+            result[f'live_rows_archived_{days}d'] = live
+            result[f'archive_ms_{days}d'] = round(archive_s * 1000, 2)
+            result[f'archive_rows_per_s_{days}d'] = round(moved / archive_s, 1) if moved else None
+            result[f'cycle_p50_ms_{days}d'] = round(percentile(cycle, 0.5), 3)
+            result[f'cycle_archived_p50_ms_{days}d'] = round(percentile(archived_cycle, 0.5), 3)
+            result[f'history_p50_ms_{days}d'] = round(percentile(history, 0.5), 3)
+            result[f'history_archived_p50_ms_{days}d'] = round(percentile(archived_history, 0.5), 3)
+            live_after.append(live)
+            db.session.remove()
+            db.engine.dispose()
+
+    with app.app_context():
+        keyset_ok = _keyset_check()
+
+    # With every old booking settled, the live table holds about keep_days of history at any size
+    result['checks'] = {
+        'one_second_pages_distinct': keyset_ok,
+        'history_preserved': preserved,
+        'live_rows_flat': max(live_after) <= min(live_after) * 1.1,
+    }
+    return result
+
+
+def _boot(db_path, workdir, warm, cache_dir):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-m', 'benchmarks.boot', '--db', db_path, '--workdir', workdir, '--cache-dir', cache_dir]
+    if warm:
+        command.append('--warm')
+    output = subprocess.run(command, cwd=root, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def startup(app, workdir, boots=3):
+    #fresh-interpreter boots: no bytecode cache, a filled one, and a filled one plus
+    #WARMUP_ON_START; each then forks and times the child's first page views
+    db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '', 1)
+    cache_dir = os.path.join(workdir, 'jinja-cache')
+    modes = {
+        'cold': lambda number: _boot(db_path, workdir, False, os.path.join(workdir, f'jinja-cold-{number}')),
+        'bytecode': lambda number: _boot(db_path, workdir, False, cache_dir),
+        'warm': lambda number: _boot(db_path, workdir, True, cache_dir),
+    }
+    _boot(db_path, workdir, True, cache_dir)
+    with app.app_context():
+        templates = len(app.jinja_env.list_templates(extensions=('html',)))
+
+    result, statuses_ok = {}, True
+    for mode, boot in modes.items():
+        runs = [boot(number) for number in range(boots)]
+        statuses_ok = statuses_ok and all(run['statuses_ok'] for run in runs)
+        first = [sum(ms for url, ms in run['first_request_ms'].items() if url != 'repeat') for run in runs]
+        result[f'{mode}_import_ms'] = round(statistics.median(run['import_ms'] for run in runs), 2)
+        result[f'{mode}_create_app_ms'] = round(statistics.median(run['create_app_ms'] for run in runs), 2)
+        result[f'{mode}_first_requests_ms'] = round(statistics.median(first), 2)
+        result[f'{mode}_repeat_request_ms'] = round(
+            statistics.median(run['first_request_ms']['repeat'] for run in runs), 2)
+        if mode == 'warm':
+            result['warm_phases'] = runs[-1]['phases_ms']
+
+    result['checks'] = {
+        'pages_ok': statuses_ok,
+        'bytecode_cache_filled': len(os.listdir(cache_dir)) >= templates,
+    }
+    return result
+
+
+def _hourly_by_query(statement, edges, origin):
+    #the per-hour way: one overlap query for each hour, occupied seconds per lot
+    intervals = statement.subquery()
+    occupied = {}
+    for left, right in zip(edges, edges[1:]):
+        start, end = origin + left, origin + right
+        overlap = func.max(0, func.min(intervals.c.end, end) - func.max(intervals.c.start, start))
+        rows = db.session.execute(
+            select(intervals.c.lot_id, func.sum(overlap))
+            .where(intervals.c.start < end, intervals.c.end > start)
+            .group_by(intervals.c.lot_id)
+        ).all()
+        for lot_id, seconds in rows:
+            occupied[lot_id] = occupied.get(lot_id, 0) + seconds
+    return occupied
+
+
+def _peaks_by_loop(lots, starts, ends):
+    #highest concurrency per lot from a plain Python walk over the sorted events
+    events = sorted([(lot, start, 1) for lot, start in zip(lots, starts)] +
+                    [(lot, end, -1) for lot, end in zip(lots, ends)])
+    peaks, level, current = {}, 0, None
+    for lot, _, delta in events:
+        if lot != current:
+            current, level = lot, 0
+        level += delta
+        peaks[lot] = max(peaks.get(lot, 0), level)
+    return peaks
+
+
+def occupancy_bench(app, days=365, query_days=7, repeats=3):
+    #the sweep-line report over `days` of bookings, and over `query_days` against
+    #one overlap query per hour; peaks are checked against a plain Python sweep
+    until = datetime.utcnow()
+    with app.app_context():
+        year_s, report = _best(lambda: occupancy.analyse(days, until=until), repeats)
+        week_s, week = _best(lambda: occupancy.analyse(query_days, until=until), repeats)
+
+        since = week['since']
+        origin = (since - datetime(1970, 1, 1)).total_seconds()
+        span = (until - since).total_seconds()
+        edges = list(range(0, int(span), 3600)) + [span]
+        statement = occupancy.interval_statement(since, until)
+        query_s, by_query = _best(lambda: _hourly_by_query(statement, edges, origin), 1)
+
+        lots, starts, ends, _ = occupancy.load_intervals(report['since'], until)
+        since_s = (report['since'] - datetime(1970, 1, 1)).total_seconds()
+        until_s = (until - datetime(1970, 1, 1)).total_seconds()
+        starts, ends = starts.clip(since_s, until_s), ends.clip(since_s, until_s)
+        kept = ends > starts
+        peaks = _peaks_by_loop(lots[kept].tolist(), starts[kept].tolist(), ends[kept].tolist())
+
+    swept = {row['lot_id']: row['occupied_hours'] for row in week['lots']}
+    return {
+        'intervals': int(kept.sum()),
+        'lots': len(report['lots']),
+        f'sweep_ms_{days}d': round(year_s * 1000, 2),
+        f'sweep_ms_{query_days}d': round(week_s * 1000, 2),
+        f'per_hour_queries_ms_{query_days}d': round(query_s * 1000, 2),
+        'speedup': round(query_s / week_s, 1),
+        'checks': {
+            'hours_match_queries': all(abs(swept.get(lot_id, 0) - seconds / 3600) < 0.1
+                                       for lot_id, seconds in by_query.items()),
+            'peaks_match_loop': all(row['peak'] == peaks.get(row['lot_id'], 0) for row in report['lots']),
+            'under_a_second': year_s < 1.0,
+        },
+    }
+
+
+def query_plans(app, users=8, iterations=1):
+    #explains every SELECT the lifecycle and admin scenarios run, one check per endpoint
+    driver = ClientDriver(app)
+    with app.app_context():
+        capture = StatementCapture(db.engine)
+    with capture:
+        scenarios.lifecycle(app, driver, users, threads=2)
+        scenarios.admin_reports(app, driver, iterations, threads=1)
+    with app.app_context():
+        results = check_query_plans(capture.selects)
+
+    checks = {}
+    for result in results:
+        key = f"{result['endpoint']}_uses_indexes"
+        checks[key] = checks.get(key, True) and not result['full_scan']
+    return {
+        'statements_explained': len(results),
+        'full_scans': [f"{result['endpoint']}: {' | '.join(result['plan'])}: {result['sql']}"
+                       for result in results if result['full_scan']],
+        'checks': checks,
+    }
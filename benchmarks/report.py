@@ -0,0 +1,122 @@
+import json
+
+
+#Printing a run and comparing it with a stored baseline. Statement counts do
+#not depend on the machine, so an endpoint averaging half a statement more per
+#request is a regression (caches make single requests vary by one). Timings
+#are only flagged when they are worse by more than the tolerance (a ratio) and
+#by more than a small absolute margin, so scheduler noise does not fail a run.
+#Failed checks always fail. Entries missing on either side are skipped.
+
+#absolute margins below which a timing change is treated as noise
+MARGINS = {'_ms': 5.0, '_us': 20.0}
+
+STATEMENT_MARGIN = 0.5
+
+#endpoints seen fewer times than this (login, logout) are too small a sample to gate on
+MIN_REQUESTS = 5
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def print_results(results, out=print):
+    meta = results['meta']
+    out(f"ParkSync benchmark: scale={meta['scale']} drivers={','.join(meta['drivers'])} "
+        f"threads={meta['threads']} python={meta['python']} sqlite={meta['sqlite']}")
+    out(f"dataset: {', '.join(f'{k}={v}' for k, v in meta['dataset'].items())}")
+
+    for name, scenario in results['scenarios'].items():
+        out('')
+        out(f"== {name}: {scenario['requests']} requests in {scenario['wall_s']}s, "
+            f"{scenario['throughput_rps']} req/s, {scenario['errors']} errors")
+        if scenario.get('notes'):
+            out('   ' + ', '.join(f'{k}={v}' for k, v in sorted(scenario['notes'].items())))
+        if scenario.get('jobs'):
+            out(f"   jobs: {scenario['jobs']}")
+        out(f"   {'endpoint':<32}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'stmts':>8}{'max':>5}")
+        statements = scenario.get('statements', {})
+        for label, stats in scenario['endpoints'].items():
+            counted = statements.get(label.split(' ', 1)[-1], {})
+            out(f"   {label:<32}{stats['requests']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+                f"{stats['p99_ms']:>10}{counted.get('avg', ''):>8}{counted.get('max', ''):>5}")
+        for check, ok in scenario.get('checks', {}).items():
+            if not ok:
+                out(f'   FAIL {check}')
+
+    for name, metrics in results['micro'].items():
+        out('')
+        out(f'== {name}')
+        for key, value in metrics.items():
+            if key == 'checks':
+                for check, ok in value.items():
+                    out(f"   {'ok  ' if ok else 'FAIL'} {check}")
+            else:
+                out(f'   {key}: {value}')
+
+
+def _worse(key, current, baseline, tolerance):
+    if current is None or baseline is None:
+        return False
+    if key.endswith('_per_s') or key.endswith('_rps'):
+        return current < baseline / (1 + tolerance)
+    for suffix, margin in MARGINS.items():
+        if key.endswith(suffix):
+            return current > baseline * (1 + tolerance) and current - baseline > margin
+    return False
+
+
+def compare(results, baseline, tolerance=1.0):
+    #returns (regressions, notes) as lists of readable lines
+    regressions, notes = [], []
+    if results['meta']['scale'] != baseline['meta']['scale']:
+        notes.append(f"baseline was recorded at scale {baseline['meta']['scale']}, "
+                     f"this run is {results['meta']['scale']}; timings are not comparable")
+
+    for name, scenario in results['scenarios'].items():
+        for check, ok in scenario.get('checks', {}).items():
+            if not ok:
+                regressions.append(f'{name}: check {check} failed')
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        if _worse('throughput_rps', scenario['throughput_rps'], old['throughput_rps'], tolerance):
+            regressions.append(f"{name}: throughput {old['throughput_rps']} -> {scenario['throughput_rps']} req/s")
+        if scenario['errors'] > old['errors']:
+            regressions.append(f"{name}: errors {old['errors']} -> {scenario['errors']}")
+
+        for endpoint, counted in scenario.get('statements', {}).items():
+            before = old.get('statements', {}).get(endpoint)
+            if before is None or min(counted['requests'], before['requests']) < MIN_REQUESTS:
+                continue
+            if counted['avg'] >= before['avg'] + STATEMENT_MARGIN:
+                regressions.append(f"{name}: {endpoint} statements per request {before['avg']} -> {counted['avg']}")
+            elif counted['avg'] <= before['avg'] - STATEMENT_MARGIN:
+                notes.append(f"{name}: {endpoint} statements per request {before['avg']} -> {counted['avg']}")
+
+        for label, stats in scenario['endpoints'].items():
+            before = old['endpoints'].get(label)
+            if before is None or min(stats['requests'], before['requests']) < MIN_REQUESTS:
+                continue
+            # p50: tails are too noisy on a shared machine to gate on
+            if _worse('p50_ms', stats['p50_ms'], before['p50_ms'], tolerance):
+                regressions.append(f"{name}: {label} p50 {before['p50_ms']} -> {stats['p50_ms']} ms")
+
+    for name, metrics in results['micro'].items():
+        old = baseline['micro'].get(name, {})
+        for check, ok in metrics.get('checks', {}).items():
+            if not ok:
+                regressions.append(f'{name}: check {check} failed')
+        for key, value in metrics.items():
+            if key != 'checks' and _worse(key, value, old.get(key), tolerance):
+                regressions.append(f'{name}: {key} {old[key]} -> {value}')
+
+    return regressions, notes
@@ -0,0 +1,190 @@
+import argparse
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+from app import create_app
+from app.spot_index import get_spot_index
+from . import micro, report, scenarios
+from .harness import DRIVERS, bench_config
+from .seed import seed_synthetic
+
+
+#python -m benchmarks.run [--scale small|medium|large] [--driver client|wsgi]
+#                         [--only name ...] [--compare [baseline.json]]
+#                         [--save results.json] [--save-baseline]
+#                         [--db path.db [--reuse]]
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+SCALES = {
+    'small': {
+        'seed': {'users': 200, 'lots': 4, 'spots_per_lot': 100, 'history_days': 90, 'reservations_per_day': 20},
+        'lifecycle_users': 40, 'admin_iterations': 10,
+        'stress_spots': 20, 'storm_threads': 64, 'provisioning_sizes': (500, 5000), 'billing_sizes': (10000,),
+        'hash_logins': 8, 'sse_viewers': 50, 'card_lots': 200, 'index_spots': 5000, 'job_count': 300,
+        'archive_days': (60, 240), 'occupancy_days': 365,
+    },
+    'medium': {
+        'seed': {'users': 2000, 'lots': 10, 'spots_per_lot': 500, 'history_days': 365, 'reservations_per_day': 60},
+        'lifecycle_users': 200, 'admin_iterations': 5,
+        'stress_spots': 100, 'storm_threads': 128, 'provisioning_sizes': (500, 5000, 50000), 'billing_sizes': (10000, 100000),
+        'hash_logins': 16, 'sse_viewers': 200, 'card_lots': 500, 'index_spots': 20000, 'job_count': 1000,
+        'archive_days': (90, 730), 'occupancy_days': 365,
+    },
+    'large': {
+        'seed': {'users': 20000, 'lots': 20, 'spots_per_lot': 2000, 'history_days': 3 * 365, 'reservations_per_day': 150},
+        'lifecycle_users': 1000, 'admin_iterations': 5,
+        'stress_spots': 200, 'storm_threads': 256, 'provisioning_sizes': (500, 5000, 50000), 'billing_sizes': (10000, 1000000),
+        'hash_logins': 32, 'sse_viewers': 500, 'card_lots': 1000, 'index_spots': 50000, 'job_count': 5000,
+        'archive_days': (90, 3 * 365), 'occupancy_days': 3 * 365,
+    },
+}
+
+HASH_METHODS = ('scrypt:32768:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000')
+
+MICRO = ('double_booking', 'admission', 'provisioning', 'user_cache', 'fragment_cache', 'password_hashing',
+         'billing', 'earnings', 'occupancy', 'sse_viewers', 'spot_index', 'job_queue', 'archive_growth', 'startup',
+         'query_plans')
+
+
+def run_micro(name, app, preset, args):
+    if name == 'double_booking':
+        return micro.double_booking(app, preset['stress_spots'], max(args.threads * 4, 8))
+    if name == 'admission':
+        return micro.admission(app, preset['storm_threads'])
+    if name == 'provisioning':
+        return micro.provisioning_bench(app, args.workdir, preset['provisioning_sizes'])
+    if name == 'user_cache':
+        return micro.user_cache(app)
+    if name == 'fragment_cache':
+        return micro.fragment_cache(app, preset['card_lots'])
+    if name == 'password_hashing':
+        return micro.password_hashing(app, args.hash_methods, preset['hash_logins'], args.threads)
+    if name == 'billing':
+        return micro.billing_bench(app, preset['billing_sizes'])
+    if name == 'earnings':
+        return micro.earnings(app)
+    if name == 'occupancy':
+        return micro.occupancy_bench(app, preset['occupancy_days'])
+    if name == 'sse_viewers':
+        return micro.sse_viewers(app, preset['sse_viewers'])
+    if name == 'spot_index':
+        return micro.spot_index_bench(app, preset['index_spots'])
+    if name == 'job_queue':
+        return micro.job_queue(app, count=preset['job_count'])
+    if name == 'archive_growth':
+        return micro.archive_growth(app, args.workdir, preset['archive_days'],
+                                    preset['seed']['reservations_per_day'])
+    if name == 'startup':
+        return micro.startup(app, args.workdir)
+    if name == 'query_plans':
+        return micro.query_plans(app)
+    raise ValueError(f'unknown benchmark "{name}"')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a synthetic dataset and benchmark ParkSync.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--driver', action='append', choices=sorted(DRIVERS), dest='drivers',
+                        help='how requests reach the app (repeatable, default: both)')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent virtual users')
+    parser.add_argument('--only', nargs='+', choices=tuple(scenarios.SCENARIOS) + MICRO,
+                        help='run just these scenarios/benchmarks')
+    parser.add_argument('--db', help='benchmark database (default: a fresh one in the run\'s temp directory)')
+    parser.add_argument('--reuse', action='store_true', help='keep an existing --db instead of reseeding')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--hash-method', default=None,
+                        help='PASSWORD_HASH_METHOD for the scenarios (default: the app default)')
+    parser.add_argument('--hash-methods', nargs='+', default=HASH_METHODS,
+                        help='settings compared by the password_hashing benchmark')
+    parser.add_argument('--save', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f'write the results to {BASELINE}')
+    parser.add_argument('--compare', nargs='?', const=BASELINE, metavar='BASELINE',
+                        help='compare with a baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='allowed slowdown ratio for timings when comparing (1.0 = twice as slow)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.drivers = args.drivers or ['client', 'wsgi']
+    args.workdir = tempfile.mkdtemp(prefix='parksync-bench-')
+    args.db = args.db or os.path.join(args.workdir, 'benchmark.db')
+    preset = SCALES[args.scale]
+    selected = args.only or tuple(scenarios.SCENARIOS) + MICRO
+
+    overrides = {'SPOT_INDEX_WARM': False}
+    if args.hash_method:
+        overrides['PASSWORD_HASH_METHOD'] = args.hash_method
+    if not args.reuse:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    app = create_app(bench_config(args.db, args.workdir, **overrides))
+
+    with app.app_context():
+        if args.reuse and os.path.exists(args.db):
+            dataset = {'reused': args.db}
+        else:
+            dataset = seed_synthetic(seed=args.seed, **preset['seed'])
+        get_spot_index().rebuild()
+
+    results = {
+        'meta': {
+            'scale': args.scale,
+            'drivers': args.drivers,
+            'threads': args.threads,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'dataset': dataset,
+        },
+        'scenarios': {},
+        'micro': {},
+    }
+
+    for driver_name in args.drivers:
+        driver = DRIVERS[driver_name](app).start()
+        try:
+            if 'lifecycle' in selected:
+                print(f'Running lifecycle [{driver_name}]...', file=sys.stderr)
+                results['scenarios'][f'lifecycle[{driver_name}]'] = scenarios.lifecycle(
+                    app, driver, preset['lifecycle_users'], args.threads)
+            if 'admin' in selected:
+                print(f'Running admin reports [{driver_name}]...', file=sys.stderr)
+                results['scenarios'][f'admin[{driver_name}]'] = scenarios.admin_reports(
+                    app, driver, preset['admin_iterations'], max(args.threads // 2, 1))
+        finally:
+            driver.stop()
+
+    for name in MICRO:
+        if name in selected:
+            print(f'Running {name}...', file=sys.stderr)
+            results['micro'][name] = run_micro(name, app, preset, args)
+
+    worker = app.extensions.get('job_worker')
+    if worker is not None:
+        worker.stop(timeout=5)
+
+    report.print_results(results)
+    if args.save:
+        report.save(results, args.save)
+    if args.save_baseline:
+        report.save(results, BASELINE)
+
+    if args.compare:
+        regressions, notes = report.compare(results, report.load(args.compare), args.tolerance)
+        print('')
+        for line in notes:
+            print(f'note: {line}')
+        for line in regressions:
+            print(f'REGRESSION: {line}')
+        print(f'{len(regressions)} regression(s) against {args.compare}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
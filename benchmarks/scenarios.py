@@ -0,0 +1,173 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from app import jobs
+from app.models import ParkingLot
+from .harness import Recorder, run_workers
+from .seed import ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+#End-to-end scenarios against the real app. Each one returns the recorder
+#summary (latency per endpoint, throughput, errors) plus the statement counts
+#the request profiler saw per endpoint while it ran, and a check per endpoint
+#with a statement budget that no request went over it.
+
+#text the dashboard shows when a booking or checkout failed
+ERROR_MARKERS = ('An error occurred', 'database is locked')
+
+
+def _statements(app):
+    profiler = app.extensions.get('request_profiler')
+    if profiler is None:
+        return {}
+    return {
+        endpoint: {'avg': stats['avg_statements'], 'max': stats['max_statements'], 'requests': stats['requests'],
+                   'budget': stats['budget'], 'over_budget': stats['over_budget']}
+        for endpoint, stats in profiler.snapshot().items()
+    }
+
+
+def _budget_checks(statements):
+    return {
+        f"{endpoint}_within_{counted['budget']}_statements": counted['over_budget'] == 0
+        for endpoint, counted in statements.items() if counted['budget'] is not None
+    }
+
+
+def _reset_profiler(app):
+    profiler = app.extensions.get('request_profiler')
+    if profiler is not None:
+        profiler.reset()
+
+
+def _check_page(recorder, reply):
+    text = reply.text
+    if 'database is locked' in text:
+        recorder.note('lock_errors')
+    if any(marker in text for marker in ERROR_MARKERS):
+        recorder.note('failed_actions')
+
+
+def _drain_jobs(app, timeout=120):
+    #waits for the background worker to finish what the scenario enqueued
+    started = time.perf_counter()
+    with app.app_context():
+        while time.perf_counter() - started < timeout:
+            stats = jobs.queue_stats()
+            if not stats['queued'] and not stats['running']:
+                break
+            time.sleep(0.05)
+        return {
+            'drain_s': round(time.perf_counter() - started, 3),
+            'queued': stats['queued'],
+            'failed': stats['failed'],
+            'latency_ms': stats['latency_ms'],
+            'run_ms': stats['run_ms'],
+        }
+
+
+def lifecycle(app, driver, users=40, threads=4):
+    #register -> login -> dashboard -> book -> checkout -> pay -> logout for new users
+    recorder = Recorder()
+    with app.app_context():
+        lot_ids = [lot_id for (lot_id,) in ParkingLot.query.with_entities(ParkingLot.id).order_by(ParkingLot.id)]
+    tag = uuid.uuid4().hex[:8]
+
+    def one_user(number):
+        session = driver.session(recorder)
+        try:
+            username = f'bench-{tag}-{number}'
+            email = f'{username}@bench.parksync.com'
+            lot_id = lot_ids[number % len(lot_ids)]
+
+            session.get('GET auth.register', '/auth/register')
+            session.post('POST auth.register', '/auth/register', {
+                'username': username, 'email': email,
+                'password': 'bench123', 'confirm_password': 'bench123',
+            })
+            session.post('POST auth.login', '/auth/login', {'email': email, 'password': 'bench123'})
+            session.get('GET user.dashboard', '/user/dashboard')
+
+            session.get('GET user.book_lot', f'/user/book/{lot_id}')
+            session.post('POST user.book_lot', f'/user/book/{lot_id}',
+                         {'vehicle_number': f'BN{number:02d}X{number % 10000:04d}', 'spot_id': ''})
+            _check_page(recorder, session.get('GET user.dashboard', '/user/dashboard'))
+
+            active = session.get('GET api.active_reservation', '/api/me/reservation')
+            reservation = active.status == 200 and json.loads(active.body)
+            if not reservation or not reservation.get('active'):
+                recorder.note('bookings_missing')
+                return
+
+            checkout = session.get('GET user.checkout', f'/user/checkout/{reservation["id"]}', expect=(302,))
+            if not checkout.location or '/payment_options/' not in checkout.location:
+                recorder.note('checkouts_failed')
+                _check_page(recorder, session.get('GET user.dashboard', '/user/dashboard'))
+                return
+            session.get('GET user.payment_options', checkout.location)
+
+            payment_id = checkout.location.rstrip('/').rsplit('/', 1)[-1]
+            session.get('GET user.pay_now', f'/user/pay_now/{payment_id}', expect=(302,))
+            _check_page(recorder, session.get('GET user.dashboard', '/user/dashboard'))
+            session.get('GET auth.logout', '/auth/logout', expect=(302,))
+            recorder.note('lifecycles')
+        finally:
+            session.close()
+
+    _reset_profiler(app)
+    wall = run_workers(threads, range(users), one_user, recorder)
+    result = recorder.summary(wall)
+    result['lifecycles_per_s'] = round(result['notes'].get('lifecycles', 0) / wall, 2)
+    result['statements'] = _statements(app)
+    result['checks'] = _budget_checks(result['statements'])
+    result['jobs'] = _drain_jobs(app)
+    return result
+
+
+def admin_pages(lot_id):
+    recent = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+    return [
+        ('GET admin.dashboard', '/admin/dashboard'),
+        ('GET admin.view_bookings', '/admin/bookings'),
+        ('GET admin.active_bookings', '/admin/active_bookings'),
+        ('GET admin.due_payments', '/admin/due_payments'),
+        ('GET admin.earnings_report', '/admin/earnings'),
+        ('GET admin.lot_grid', f'/admin/lot_grid/{lot_id}'),
+        ('GET admin.job_queue', '/admin/jobs'),
+        ('GET admin.export_data', f'/admin/export/payments?format=csv&start={recent}'),
+        ('GET api.lots', '/api/lots'),
+        ('GET api.spot_map', f'/api/lots/{lot_id}/spots'),
+    ]
+
+
+def admin_reports(app, driver, iterations=5, threads=2):
+    #every admin report page, iterations times per admin session
+    recorder = Recorder()
+    with app.app_context():
+        lot_id = ParkingLot.query.with_entities(ParkingLot.id).order_by(ParkingLot.id).first()[0]
+    pages = admin_pages(lot_id)
+
+    def one_admin(number):
+        session = driver.session(recorder)
+        try:
+            session.post('POST auth.login', '/auth/login', {'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+            for _ in range(iterations):
+                for label, path in pages:
+                    session.get(label, path)
+            session.get('GET auth.logout', '/auth/logout', expect=(302,))
+        finally:
+            session.close()
+
+    _reset_profiler(app)
+    wall = run_workers(threads, range(threads), one_admin, recorder)
+    result = recorder.summary(wall)
+    result['statements'] = _statements(app)
+    result['checks'] = _budget_checks(result['statements'])
+    return result
+
+
+SCENARIOS = {
+    'lifecycle': lifecycle,
+    'admin': admin_reports,
+}
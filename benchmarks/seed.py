@@ -0,0 +1,189 @@
+import json
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, update
+from app import rollups
+from app.admin import provisioning
+from app.extensions import db
+from app.models import User, ParkingLot, ParkingSpot, Reservation, Payment, Tariff
+from app.passwords import hash_password
+from app.tariffs import compile_snapshot
+
+
+#Synthetic dataset for the benchmarks. Like db_init.seed_database it starts
+#from an empty schema with an admin account, then adds users, lots with their
+#spots, history_days of closed reservations with payments, and a share of
+#spots currently booked. Rows go in with batched executemany INSERTs and every
+#random choice comes from one seeded Random, so the same arguments give the
+#same data. Every user shares one password hash, made once.
+
+ADMIN_EMAIL = 'admin@bench.parksync.com'
+ADMIN_PASSWORD = 'admin123'
+USER_PASSWORD = 'bench123'
+
+INSERT_BATCH = 10000
+
+PRICES = (10.0, 20.0, 25.0, 40.0, 60.0)
+
+#evening and overnight bands with a daily cap, given to every tariff_every-th lot
+TARIFF_BANDS = [
+    {'start': '08:00', 'end': '18:00', 'rate': 50.0},
+    {'start': '18:00', 'end': '23:00', 'rate': 30.0},
+]
+
+
+def user_email(number):
+    return f'user{number}@bench.parksync.com'
+
+
+def _vehicle(rng):
+    return f'BN{rng.randrange(10, 100)}X{rng.randrange(1000, 10000)}'
+
+
+def _flush(table, rows):
+    if rows:
+        db.session.execute(insert(table), rows)
+        rows.clear()
+
+
+def _cost(start, end, price, tariff_snapshot):
+    if tariff_snapshot:
+        return round(compile_snapshot(tariff_snapshot).cost(start, end))
+    return round((end - start).total_seconds() / 3600 * price)
+
+
+def seed_synthetic(users=200, lots=4, spots_per_lot=100, history_days=90, reservations_per_day=20,
+                   occupancy=0.3, paid_ratio=0.9, tariff_every=3, seed=42, progress=print):
+    #reservations_per_day is per lot; returns row counts
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    progress('Re-initializing database...')
+    db.drop_all()
+    db.create_all()
+
+    admin = User(username='admin', email=ADMIN_EMAIL, is_admin=True)
+    admin.set_password(ADMIN_PASSWORD)
+    db.session.add(admin)
+
+    progress(f'Creating {users} users...')
+    password_hash = hash_password(USER_PASSWORD)
+    db.session.execute(insert(User.__table__), [
+        {'username': f'user{number}', 'email': user_email(number), 'password_hash': password_hash, 'is_admin': False}
+        for number in range(1, users + 1)
+    ])
+    user_ids = db.session.execute(select(User.id).where(User.is_admin == False).order_by(User.id)).scalars().all()
+
+    progress(f'Creating {lots} lots of {spots_per_lot} spots...')
+    tariff = Tariff(name='Bench peak', bands=json.dumps(TARIFF_BANDS), daily_cap=400.0, grace_minutes=10)
+    db.session.add(tariff)
+    lot_rows = []
+    for number in range(1, lots + 1):
+        lot = ParkingLot(
+            name=f'Bench Lot {number}',
+            total_spots=spots_per_lot,
+            price_per_hour=rng.choice(PRICES),
+            tariff=tariff if tariff_every and number % tariff_every == 0 else None
+        )
+        db.session.add(lot)
+        db.session.flush()
+        provisioning.create_spots(lot.id, 1, spots_per_lot)
+        lot_rows.append(lot)
+
+    spots = {lot.id: [] for lot in lot_rows}
+    for spot_id, lot_id, number in db.session.execute(
+        select(ParkingSpot.id, ParkingSpot.lot_id, ParkingSpot.spot_number).order_by(ParkingSpot.id)
+    ):
+        spots[lot_id].append((spot_id, number))
+    snapshots = {lot.id: lot.tariff.snapshot(lot.price_per_hour) if lot.tariff else None for lot in lot_rows}
+
+    # Closed history, oldest first, with ids assigned here so payments can point at them
+    total = history_days * reservations_per_day * len(lot_rows)
+    progress(f'Creating {total} closed reservations over {history_days} days...')
+    reservations, payments = [], []
+    reservation_id = 0
+    origin = now - timedelta(days=history_days)
+    for day in range(history_days):
+        day_start = origin + timedelta(days=day)
+        for lot in lot_rows:
+            for _ in range(reservations_per_day):
+                start = day_start + timedelta(seconds=rng.randrange(86400))
+                end = min(start + timedelta(hours=min(max(rng.expovariate(1 / 2.5), 0.1), 24)), now)
+                if end <= start:
+                    continue
+                spot_id, number = rng.choice(spots[lot.id])
+                reservation_id += 1
+                reservations.append({
+                    'id': reservation_id,
+                    'user_id': rng.choice(user_ids),
+                    'spot_id': spot_id,
+                    'vehicle_number': _vehicle(rng),
+                    'start_time': start,
+                    'end_time': end,
+                    'is_active': False,
+                    'lot_name_snapshot': lot.name,
+                    'spot_number_snapshot': number,
+                    'price_per_hour_snapshot': lot.price_per_hour,
+                    'tariff_snapshot': snapshots[lot.id],
+                })
+                paid = rng.random() < paid_ratio
+                payments.append({
+                    'id': reservation_id,
+                    'reservation_id': reservation_id,
+                    'amount': _cost(start, end, lot.price_per_hour, snapshots[lot.id]),
+                    'is_paid': paid,
+                    'payment_date': end + timedelta(minutes=rng.randrange(1, 600)) if paid else None,
+                    'created_at': end,
+                })
+                if len(reservations) >= INSERT_BATCH:
+                    _flush(Reservation.__table__, reservations)
+                    _flush(Payment.__table__, payments)
+    _flush(Reservation.__table__, reservations)
+    _flush(Payment.__table__, payments)
+
+    # Currently parked cars, one per user at most
+    free_users = list(user_ids)
+    rng.shuffle(free_users)
+    active = 0
+    for lot in lot_rows:
+        taken = rng.sample(spots[lot.id], min(int(len(spots[lot.id]) * occupancy), len(free_users)))
+        for spot_id, number in taken:
+            reservation_id += 1
+            reservations.append({
+                'id': reservation_id,
+                'user_id': free_users.pop(),
+                'spot_id': spot_id,
+                'vehicle_number': _vehicle(rng),
+                'start_time': now - timedelta(minutes=rng.randrange(5, 600)),
+                'end_time': None,
+                'is_active': True,
+                'lot_name_snapshot': lot.name,
+                'spot_number_snapshot': number,
+                'price_per_hour_snapshot': lot.price_per_hour,
+                'tariff_snapshot': snapshots[lot.id],
+            })
+        if taken:
+            db.session.execute(
+                update(ParkingSpot)
+                .where(ParkingSpot.id.in_([spot_id for spot_id, _ in taken]))
+                .values(is_booked=True)
+                .execution_options(synchronize_session=False)
+            )
+        active += len(taken)
+    _flush(Reservation.__table__, reservations)
+    progress(f'Booked {active} spots...')
+
+    ParkingLot.reconcile_counters()
+    db.session.commit()
+
+    progress('Building rollups...')
+    rollups.rebuild()
+    db.session.commit()
+
+    return {
+        'users': len(user_ids),
+        'lots': len(lot_rows),
+        'spots': sum(len(lot_spots) for lot_spots in spots.values()),
+        'reservations': reservation_id,
+        'active': active,
+    }
@@ -0,0 +1,33 @@
+"""parking lot occupancy counter
+
+Revision ID: 0002_occupancy
+Revises: 0001_initial
+Create Date: 2026-10-18 07:31:02.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_occupancy'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('booked_spots', sa.Integer(), server_default='0', nullable=False))
+
+    # Seed the counter from the spots that are booked right now
+    op.execute(
+        "UPDATE parking_lot SET booked_spots = ("
+        "SELECT COUNT(*) FROM parking_spot "
+        "WHERE parking_spot.lot_id = parking_lot.id AND parking_spot.is_booked = 1)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('booked_spots')
@@ -0,0 +1,48 @@
+"""indexes for hot reservation, payment and spot lookups
+
+Revision ID: 0003_hot_indexes
+Revises: 0002_occupancy
+Create Date: 2026-10-18 07:33:45.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_indexes'
+down_revision = '0002_occupancy'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.create_index('ix_spot_lot_booked_number', ['lot_id', 'is_booked', 'spot_number'], unique=False)
+        batch_op.create_index('ix_spot_lot_number', ['lot_id', 'spot_number'], unique=False)
+
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.create_index('ix_reservation_active_start', ['is_active', 'start_time'], unique=False)
+        batch_op.create_index('ix_reservation_spot_active', ['spot_id', 'is_active'], unique=False)
+        batch_op.create_index('ix_reservation_start_id', ['start_time', 'id'], unique=False)
+        batch_op.create_index('ix_reservation_user_active_end', ['user_id', 'is_active', 'end_time'], unique=False)
+
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_paid_date', ['is_paid', 'payment_date'], unique=False)
+        batch_op.create_index('ix_payment_reservation', ['reservation_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_reservation')
+        batch_op.drop_index('ix_payment_paid_date')
+
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservation_user_active_end')
+        batch_op.drop_index('ix_reservation_start_id')
+        batch_op.drop_index('ix_reservation_spot_active')
+        batch_op.drop_index('ix_reservation_active_start')
+
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.drop_index('ix_spot_lot_number')
+        batch_op.drop_index('ix_spot_lot_booked_number')
@@ -0,0 +1,45 @@
+"""tariffs with time-of-day bands, daily cap and grace period
+
+Revision ID: 0004_tariffs
+Revises: 0003_hot_indexes
+Create Date: 2026-10-18 07:52:10.330871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_tariffs'
+down_revision = '0003_hot_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tariff',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('bands', sa.Text(), nullable=False),
+    sa.Column('daily_cap', sa.Float(), nullable=True),
+    sa.Column('grace_minutes', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tariff_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_parking_lot_tariff_id', 'tariff', ['tariff_id'], ['id'], ondelete='SET NULL')
+
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tariff_snapshot', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.drop_column('tariff_snapshot')
+
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_parking_lot_tariff_id', type_='foreignkey')
+        batch_op.drop_column('tariff_id')
+
+    op.drop_table('tariff')
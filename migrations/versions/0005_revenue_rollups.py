@@ -0,0 +1,64 @@
+"""daily and hourly revenue rollups
+
+Existing history is rolled up by running app/models/rollup_backfill.py.
+
+Revision ID: 0005_rollups
+Revises: 0004_tariffs
+Create Date: 2026-10-18 07:43:41.079222
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_rollups'
+down_revision = '0004_tariffs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_rollup',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('lot_id', sa.Integer(), nullable=False),
+    sa.Column('lot_name', sa.String(length=100), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('payments', sa.Integer(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('occupancy_hours', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lot_id', 'day', name='uq_daily_rollup_lot_day')
+    )
+    with op.batch_alter_table('daily_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_rollup_day', ['day'], unique=False)
+
+    op.create_table('hourly_rollup',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('lot_id', sa.Integer(), nullable=False),
+    sa.Column('lot_name', sa.String(length=100), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('hour', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('payments', sa.Integer(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('occupancy_hours', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lot_id', 'day', 'hour', name='uq_hourly_rollup_lot_day_hour')
+    )
+    with op.batch_alter_table('hourly_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_hourly_rollup_day', ['day', 'hour'], unique=False)
+
+
+
+def downgrade():
+    with op.batch_alter_table('hourly_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_hourly_rollup_day')
+
+    op.drop_table('hourly_rollup')
+    with op.batch_alter_table('daily_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_rollup_day')
+
+    op.drop_table('daily_rollup')
@@ -0,0 +1,26 @@
+"""per-lot version counter for API ETags
+
+Revision ID: 0006_lot_version
+Revises: 0005_rollups
+Create Date: 2026-10-18 07:47:49.022899
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_lot_version'
+down_revision = '0005_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('version')
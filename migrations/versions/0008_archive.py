@@ -0,0 +1,65 @@
+"""history archive
+
+Revision ID: 0008_archive
+Revises: 0007_jobs
+Create Date: 2026-10-18 08:21:40.451397
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_archive'
+down_revision = '0007_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('archived_reservation',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('spot_id', sa.Integer(), nullable=True),
+    sa.Column('lot_id', sa.Integer(), nullable=True),
+    sa.Column('vehicle_number', sa.String(length=20), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('lot_name_snapshot', sa.String(length=100), nullable=True),
+    sa.Column('spot_number_snapshot', sa.Integer(), nullable=True),
+    sa.Column('price_per_hour_snapshot', sa.Float(), nullable=True),
+    sa.Column('tariff_snapshot', sa.Text(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_reservation', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_reservation_start_id', ['start_time', 'id'], unique=False)
+        batch_op.create_index('ix_archived_reservation_user_end', ['user_id', 'end_time'], unique=False)
+
+    op.create_table('archived_payment',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('reservation_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('is_paid', sa.Boolean(), nullable=False),
+    sa.Column('payment_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['reservation_id'], ['archived_reservation.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_payment', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_payment_created', ['created_at'], unique=False)
+        batch_op.create_index('ix_archived_payment_date', ['payment_date'], unique=False)
+        batch_op.create_index('ix_archived_payment_reservation', ['reservation_id'], unique=False)
+
+def downgrade():
+    with op.batch_alter_table('archived_payment', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_payment_reservation')
+        batch_op.drop_index('ix_archived_payment_date')
+        batch_op.drop_index('ix_archived_payment_created')
+
+    op.drop_table('archived_payment')
+    with op.batch_alter_table('archived_reservation', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_reservation_user_end')
+        batch_op.drop_index('ix_archived_reservation_start_id')
+
+    op.drop_table('archived_reservation')
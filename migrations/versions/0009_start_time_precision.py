@@ -0,0 +1,33 @@
+"""reservation start times stored with microseconds
+
+Revision ID: 0009_start_time_precision
+Revises: 0008_archive
+Create Date: 2026-10-18 14:05:12.618204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_start_time_precision'
+down_revision = '0008_archive'
+branch_labels = None
+depends_on = None
+
+#SQLite keeps DateTime as text. Start times filled in by the CURRENT_TIMESTAMP
+#server default lack the ".ffffff" that SQLAlchemy writes and binds, so a
+#keyset cursor taken from such a row compared above the row itself. New rows
+#get their start time from Python; existing ones are padded to the same form.
+TABLES = ('reservation', 'archived_reservation')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in TABLES:
+        op.execute(f"UPDATE {table} SET start_time = start_time || '.000000' WHERE length(start_time) = 19")
+
+
+def downgrade():
+    pass